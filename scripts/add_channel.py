@@ -3,6 +3,8 @@ import argparse
 import tempfile
 import shutil
 
+from m3u_profile import run_main
+
 def add_channels_to_m3u(input_file, output_file, channels_str, group_name, append_to_end, merge_urls):
     """
     支持格式: "频道1,url1,url2;频道2,urlA"
@@ -87,4 +89,4 @@ def main():
     add_channels_to_m3u(args.input, args.output, args.add, args.group, args.rear, args.merge)
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
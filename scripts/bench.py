@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+脚本基准测试
+用 gen_playlist.py 生成确定性的合成播放列表（默认 1k / 100k / 1M 个频道，按大小和种子缓存），
+对每个脚本的典型用法逐一运行，每次运行都是独立子进程，记录耗时和峰值内存 (maxrss)。
+
+    python bench.py                              # 运行全部用例
+    python bench.py -k merger --sizes 1k,100k    # 只运行名称含 merger 的用例
+    python bench.py --save-baseline              # 保存为基线 (默认 bench_baseline.json)
+    python bench.py --check                      # 与基线比较，退化超过阈值时退出码为 1
+
+另有与规模无关的导入耗时用例 (import:<模块>)：以 python -X importtime 导入各脚本模块，
+记录模块的累计导入耗时和最耗时的直接依赖，用于发现启动变慢（工作流中每一步都是新进程）。
+基线与机器相关，请在同一台机器上保存和比较。
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from m3u_profile import run_main
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = '1k,100k,1m'
+DEFAULT_BASELINE = 'bench_baseline.json'
+
+# (用例名, 脚本, 参数模板, 输入格式)
+# 模板变量: {input} 输入文件, {output} 输出文件, {workdir} 本次运行的临时目录, {scripts} 脚本目录
+CASES = [
+    ('deduplicate', 'deduplicate.py', ['-i', '{input}', '-o', '{output}'], 'm3u'),
+    ('deduplicate_stream', 'deduplicate.py', ['-i', '{input}', '-o', '{output}', '--stream'], 'm3u'),
+    ('extract', 'extract.py', ['--input', '{input}', '--output', '{output}', '--eoru', 'example', '-n'], 'm3u'),
+    ('add_channel', 'add_channel.py', ['-i', '{input}', '-o', '{output}', '-g', '央视频道', '-m',
+                                       '-a', '搜狐剧场,http://a.example.com/live.flv,http://b.example.com/live.flv'], 'm3u'),
+    ('m3u_merger', 'm3u_merger.py', ['-i', '{input}', '-o', '{output}'], 'm3u'),
+    ('m3u_merger_alias_canon', 'm3u_merger.py', ['-i', '{input}', '-o', '{output}', '--alias', '--canon-urls'], 'm3u'),
+    ('m3u_mergerng', 'm3u_mergerng.py', ['-i', '{input}', '-o', '{output}'], 'm3u'),
+    ('url_sorter', 'url_sorter.py', ['-i', '{input}', '-o', '{output}', '-k', 'https'], 'm3u'),
+    ('url_sortergr', 'url_sortergr.py', ['-i', '{input}', '-o', '{output}', '-gr', '央视频道,卫视频道', '-gs'], 'm3u'),
+    ('rename_rules', 'rename_rules.py', ['-i', '{input}', '-o', '{output}', '-R', '{scripts}/rename_rules.json'], 'm3u'),
+    ('m3u_header_tool', 'm3u_header_tool.py', ['-i', '{input}', '-o', '{output}', '-E', 'http://epg.example.com/e.xml'], 'm3u'),
+    ('m3u_diff', 'm3u_diff.py', ['{input}', '{input}', '--canon-urls', '-q'], 'm3u'),
+    ('m3u_shard', 'm3u_shard.py', ['-i', '{input}', '-o', '{workdir}/shards'], 'm3u'),
+    ('m3u_catalog', 'm3u_catalog.py', ['-d', '{workdir}/catalog.db', 'import', '{input}'], 'm3u'),
+    ('near_dup', 'near_dup.py', ['-i', '{input}'], 'm3u'),
+    ('txt2m3u', 'txt2m3u.py', ['-i', '{input}', '-o', '{output}'], 'txt'),
+]
+
+# 导入耗时用例的模块（rdfinurl 需要访问网络，不在上表中，但其启动耗时同样重要）
+IMPORT_MODULES = sorted({script[:-3] for _, script, _, _ in CASES} | {'iptvtool', 'rdfinurl'})
+# 导入耗时以毫秒计，退化判断使用更小的最小增量
+IMPORT_MIN_DELTA = 0.005
+
+def parse_sizes(value):
+    """"1k,100k,1m" -> [1000, 100000, 1000000]"""
+    sizes = []
+    for item in value.split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        factor = {'k': 1000, 'm': 1000000}.get(item[-1], 1)
+        sizes.append(int(float(item.rstrip('km')) * factor))
+    return sizes
+
+def size_label(size):
+    if size % 1000000 == 0:
+        return f"{size // 1000000}m"
+    if size % 1000 == 0:
+        return f"{size // 1000}k"
+    return str(size)
+
+def ensure_input(data_dir, size, fmt, seed):
+    """生成（或复用已缓存的）合成输入文件"""
+    path = os.path.join(data_dir, f"gen_{size}_s{seed}.{fmt}")
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        start = time.perf_counter()
+        # 在子进程中生成：Linux 的 maxrss 会跨 exec 保留，本进程的内存必须保持很小
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'gen_playlist.py'), '-o', path,
+                        '-n', str(size), '--format', fmt, '-s', str(seed)], check=True)
+        print(f"已生成输入 {path} ({time.perf_counter() - start:.1f}s)", file=sys.stderr)
+    return path
+
+def run_case(script, argv, input_path):
+    """
+    在独立子进程中运行一次
+    :return: (耗时秒, 峰值内存 KB, 退出码, stderr 末尾)
+    """
+    workdir = tempfile.mkdtemp(prefix='m3u_bench_')
+    try:
+        values = {'input': input_path, 'output': os.path.join(workdir, 'out.m3u'),
+                  'workdir': workdir, 'scripts': SCRIPTS_DIR}
+        cmd = [sys.executable, os.path.join(SCRIPTS_DIR, script)] + [arg.format(**values) for arg in argv]
+        env = dict(os.environ, M3U_COMPRESS='', M3U_SNAPSHOT='0', M3U_FSYNC='0')
+        with open(os.path.join(workdir, 'stderr.txt'), 'w+b') as err:
+            start = time.perf_counter()
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=err, env=env)
+            _, status, rusage = os.wait4(proc.pid, 0)
+            elapsed = time.perf_counter() - start
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            err.seek(0)
+            tail = err.read()[-500:].decode('utf-8', 'replace')
+        # Linux 的 ru_maxrss 单位为 KB，macOS 为字节
+        maxrss = rusage.ru_maxrss // 1024 if sys.platform == 'darwin' else rusage.ru_maxrss
+        return elapsed, maxrss, proc.returncode, tail
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def parse_importtime(text, module):
+    """
+    解析 -X importtime 输出
+    :return: (模块累计导入耗时秒或 None, [(直接依赖累计耗时秒, 依赖名)] 按耗时降序)
+    """
+    children = []
+    for line in text.splitlines():
+        parts = line.split('|')
+        if not line.startswith('import time:') or len(parts) != 3:
+            continue
+        try:
+            cumulative = int(parts[1]) / 1e6
+        except ValueError:
+            continue  # 表头
+        depth = (len(parts[2]) - len(parts[2].lstrip(' ')) - 1) // 2
+        name = parts[2].strip()
+        if depth == 1:
+            children.append((cumulative, name))
+        elif depth == 0:
+            # 子模块先于父模块输出；遇到其他顶层模块（如 site）时丢弃其子模块
+            if name == module:
+                return cumulative, sorted(children, reverse=True)
+            children = []
+    return None, []
+
+def run_import_case(module):
+    """
+    在独立子进程中以 -X importtime 导入模块
+    :return: (累计导入耗时秒, 峰值内存 KB, 退出码, 最耗时的直接依赖说明或错误信息)
+    """
+    cmd = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(cmd, cwd=SCRIPTS_DIR, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                stderr=err)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        err.seek(0)
+        text = err.read().decode('utf-8', 'replace')
+    code = os.waitstatus_to_exitcode(status)
+    maxrss = rusage.ru_maxrss // 1024 if sys.platform == 'darwin' else rusage.ru_maxrss
+    seconds, children = parse_importtime(text, module)
+    if code != 0 or seconds is None:
+        return 0.0, maxrss, code or 1, text[-500:]
+    heaviest = ', '.join(f"{name} {cumulative * 1000:.0f}ms" for cumulative, name in children[:2])
+    return seconds, maxrss, 0, heaviest
+
+def compare(result, baseline, time_tolerance, mem_tolerance, min_delta):
+    """返回退化说明列表（空表示未退化）"""
+    problems = []
+    if result["seconds"] > baseline["seconds"] * (1 + time_tolerance) and \
+            result["seconds"] - baseline["seconds"] > min_delta:
+        problems.append(f"耗时 {baseline['seconds']:.2f}s -> {result['seconds']:.2f}s")
+    if result["maxrss_kb"] > baseline["maxrss_kb"] * (1 + mem_tolerance):
+        problems.append(f"内存 {baseline['maxrss_kb'] / 1024:.0f}MB -> {result['maxrss_kb'] / 1024:.0f}MB")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="脚本基准测试：合成输入、子进程运行、记录耗时和峰值内存、与基线比较",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"频道数，逗号分隔 (默认: {DEFAULT_SIZES})")
+    parser.add_argument('-k', '--filter', help="只运行名称包含该字符串的用例（逗号分隔多个）")
+    parser.add_argument('-r', '--repeat', type=int, default=1, help="每个用例重复次数，取最短耗时 (默认: 1)")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="生成输入的随机种子 (默认: 0)")
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'm3u_bench_data'),
+                        help="合成输入的缓存目录")
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, metavar='FILE',
+                        help=f"将结果保存为基线 (默认: {DEFAULT_BASELINE})")
+    parser.add_argument('--check', nargs='?', const=DEFAULT_BASELINE, metavar='FILE',
+                        help="与基线比较，有退化时退出码为 1")
+    parser.add_argument('--time-tolerance', type=float, default=0.25, help="允许的耗时增幅 (默认: 0.25)")
+    parser.add_argument('--mem-tolerance', type=float, default=0.25, help="允许的内存增幅 (默认: 0.25)")
+    parser.add_argument('--min-delta', type=float, default=0.05, help="耗时增加少于该秒数不算退化 (默认: 0.05)")
+    parser.add_argument('-l', '--list', action='store_true', help="列出用例")
+    args = parser.parse_args()
+
+    cases = CASES
+    import_modules = IMPORT_MODULES
+    if args.filter:
+        keywords = [k.strip() for k in args.filter.split(',') if k.strip()]
+        cases = [case for case in CASES if any(k in case[0] for k in keywords)]
+        import_modules = [module for module in IMPORT_MODULES if any(k in f"import:{module}" for k in keywords)]
+    if args.list:
+        for name, script, argv, fmt in cases:
+            print(f"{name}\t{script} {' '.join(argv)}")
+        for module in import_modules:
+            print(f"import:{module}\t-X importtime -c 'import {module}'")
+        return
+
+    baseline = {}
+    if args.check:
+        try:
+            with open(args.check, 'r', encoding='utf-8') as f:
+                baseline = json.load(f).get("results", {})
+        except (OSError, ValueError) as e:
+            print(f"错误：无法读取基线 '{args.check}': {e}", file=sys.stderr)
+            sys.exit(1)
+
+    results = {}
+    failures = []
+    regressions = []
+    print(f"{'用例':<24}{'规模':>6}{'耗时(s)':>10}{'内存(MB)':>10}  对比基线")
+    for module in import_modules:
+        key = f"import:{module}"
+        best = None
+        for _ in range(max(1, args.repeat)):
+            seconds, maxrss, code, detail = run_import_case(module)
+            if code != 0:
+                best = None
+                failures.append(key)
+                print(f"{key:<24}{'-':>6}  失败 (退出码 {code})\n    {detail.strip()}")
+                break
+            if best is None or seconds < best["seconds"]:
+                best = {"seconds": round(seconds, 4), "maxrss_kb": maxrss}
+        if best is None:
+            continue
+        results[key] = best
+
+        note = detail
+        if key in baseline:
+            problems = compare(best, baseline[key], args.time_tolerance, args.mem_tolerance, IMPORT_MIN_DELTA)
+            note = (f"退化: {', '.join(problems)}  " if problems else '') + detail
+            if problems:
+                regressions.append(key)
+        print(f"{key:<24}{'-':>6}{best['seconds']:>10.3f}{best['maxrss_kb'] / 1024:>10.1f}  {note}", flush=True)
+
+    for size in parse_sizes(args.sizes):
+        for name, script, argv, fmt in cases:
+            input_path = ensure_input(args.data_dir, size, fmt, args.seed)
+            key = f"{name}@{size_label(size)}"
+            best = None
+            for _ in range(max(1, args.repeat)):
+                elapsed, maxrss, code, tail = run_case(script, argv, input_path)
+                if code != 0:
+                    best = None
+                    failures.append(key)
+                    print(f"{name:<24}{size_label(size):>6}  失败 (退出码 {code})\n    {tail.strip()}")
+                    break
+                if best is None or elapsed < best["seconds"]:
+                    best = {"seconds": round(elapsed, 4), "maxrss_kb": maxrss}
+                else:
+                    best["maxrss_kb"] = max(best["maxrss_kb"], maxrss)
+            if best is None:
+                continue
+            results[key] = best
+
+            note = ''
+            if key in baseline:
+                problems = compare(best, baseline[key], args.time_tolerance, args.mem_tolerance, args.min_delta)
+                ratio = best["seconds"] / baseline[key]["seconds"] if baseline[key]["seconds"] else 0
+                note = f"x{ratio:.2f}" + (f"  退化: {', '.join(problems)}" if problems else '')
+                if problems:
+                    regressions.append(key)
+            elif args.check:
+                note = '(无基线)'
+            print(f"{name:<24}{size_label(size):>6}{best['seconds']:>10.3f}{best['maxrss_kb'] / 1024:>10.1f}  {note}",
+                  flush=True)
+
+    if args.save_baseline:
+        data = {"python": sys.version.split()[0], "seed": args.seed, "results": results}
+        if os.path.exists(args.save_baseline):
+            # 只覆盖本次运行的用例，保留其他用例的基线
+            try:
+                with open(args.save_baseline, 'r', encoding='utf-8') as f:
+                    old = json.load(f).get("results", {})
+                data["results"] = dict(old, **results)
+            except (OSError, ValueError):
+                pass
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"基线已保存到 '{args.save_baseline}'", file=sys.stderr)
+
+    if failures:
+        print(f"失败的用例: {', '.join(failures)}", file=sys.stderr)
+    if regressions:
+        print(f"性能退化: {', '.join(regressions)}", file=sys.stderr)
+    sys.exit(1 if failures or regressions else 0)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+rdfinurl 解析器基准测试
+以 standin_server.py 子进程作为上游，对 1k~100k 个入口地址运行 rdfinurl.resolve_urls_with_retry，
+报告吞吐量、单次解析延迟分位数（每次调用 get_final_url，含全部重定向）、重试开销和替身服务器侧的请求统计。
+修改解析器的并发逻辑时用作回归门槛:
+
+    python bench_resolver.py                               # 1k、10k 个地址
+    python bench_resolver.py --sizes 1k,10k,100k -w 50
+    python bench_resolver.py --save-baseline               # 保存基线 (默认 bench_resolver_baseline.json)
+    python bench_resolver.py --check                       # 与基线比较，退化时退出码为 1
+    python bench_resolver.py --server http://127.0.0.1:8090/   # 使用已启动的替身服务器
+
+替身服务器的行为由种子决定，重试次数在相同参数下可复现；耗时与机器相关。
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from bench import parse_sizes, size_label
+from standin_server import entry_url
+from m3u_profile import run_main
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = '1k,10k'
+DEFAULT_BASELINE = 'bench_resolver_baseline.json'
+
+def start_standin(server_args):
+    """
+    启动替身服务器子进程（随机端口）
+    :return: (进程, 基础地址)
+    """
+    cmd = [sys.executable, os.path.join(SCRIPTS_DIR, 'standin_server.py'), '-p', '0'] + server_args
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    line = proc.stderr.readline().decode('utf-8', 'replace')
+    match = re.search(r'(http://\S+?/)', line)
+    if not match:
+        proc.kill()
+        raise RuntimeError(f"替身服务器启动失败: {line.strip() or proc.stderr.read().decode('utf-8', 'replace')}")
+    # 持续读取 stderr，避免管道写满阻塞服务器
+    threading.Thread(target=proc.stderr.read, daemon=True).start()
+    return proc, match.group(1)
+
+def fetch_stats(base_url, reset=False):
+    with urllib.request.urlopen(base_url + '_stats' + ('?reset=1' if reset else ''), timeout=10) as response:
+        return json.load(response)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+def run_resolver(urls, workers, timeout, retries, retry_delay):
+    """
+    运行 rdfinurl.resolve_urls_with_retry 并记录每次 get_final_url 调用的耗时
+    :return: 指标字典
+    """
+    import rdfinurl
+
+    latencies = []
+    attempts = {}
+    retry_start = [None]
+    lock = threading.Lock()
+    original = rdfinurl.get_final_url
+
+    def timed_get_final_url(url, *args, **kwargs):
+        start = time.perf_counter()
+        with lock:
+            attempt = attempts[url] = attempts.get(url, 0) + 1
+            if attempt > 1 and retry_start[0] is None:
+                retry_start[0] = start
+        try:
+            return original(url, *args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    rdfinurl.get_final_url = timed_get_final_url
+    try:
+        # rdfinurl 每个地址都会打印进度，计时包含这部分开销，但不输出到终端
+        with open(os.devnull, 'w') as devnull:
+            saved_stdout = sys.stdout
+            sys.stdout = devnull
+            try:
+                start = time.perf_counter()
+                resolved = rdfinurl.resolve_urls_with_retry(urls, max_workers=workers, timeout=timeout,
+                                                            max_retries=retries,
+                                                            delay_between_retries=retry_delay)
+                elapsed = time.perf_counter() - start
+            finally:
+                sys.stdout = saved_stdout
+    finally:
+        rdfinurl.get_final_url = original
+
+    latencies.sort()
+    total_attempts = sum(attempts.values())
+    retry_seconds = start + elapsed - retry_start[0] if retry_start[0] is not None else 0.0
+    return {
+        "urls": len(urls),
+        "seconds": round(elapsed, 4),
+        "urls_per_sec": round(len(urls) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round((latencies[-1] if latencies else 0) * 1000, 2),
+        "attempts": total_attempts,
+        "attempts_per_url": round(total_attempts / len(urls), 4) if urls else 0.0,
+        "rounds": max(attempts.values()) if attempts else 0,
+        "retry_seconds": round(retry_seconds, 4),
+        "succeeded": sum(1 for info in resolved.values() if info["success"]),
+        "video": sum(1 for info in resolved.values() if info["is_video_related"]),
+    }
+
+def compare(result, baseline, tolerance, min_delta_ms):
+    """返回退化说明列表（空表示未退化）"""
+    problems = []
+    if result["urls_per_sec"] < baseline["urls_per_sec"] * (1 - tolerance):
+        problems.append(f"吞吐 {baseline['urls_per_sec']:.0f} -> {result['urls_per_sec']:.0f} URL/s")
+    if result["p99_ms"] > baseline["p99_ms"] * (1 + tolerance) and \
+            result["p99_ms"] - baseline["p99_ms"] > min_delta_ms:
+        problems.append(f"P99 {baseline['p99_ms']:.0f} -> {result['p99_ms']:.0f}ms")
+    if result["attempts_per_url"] > baseline["attempts_per_url"] * (1 + tolerance):
+        problems.append(f"每 URL 请求次数 {baseline['attempts_per_url']:.2f} -> {result['attempts_per_url']:.2f}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="rdfinurl 解析器基准测试：本地替身上游、吞吐量、尾延迟、重试开销、与基线比较",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"地址数，逗号分隔 (默认: {DEFAULT_SIZES})")
+    parser.add_argument('-w', '--workers', type=int, default=10, help="解析线程数 (默认: 10)")
+    parser.add_argument('--timeout', type=float, default=2, help="单次请求超时秒数 (默认: 2)")
+    parser.add_argument('--retries', type=int, default=3, help="最大重试轮数 (默认: 3)")
+    parser.add_argument('--retry-delay', type=float, default=0.5, help="重试轮之间的等待秒数 (默认: 0.5)")
+    parser.add_argument('--server', help="使用已启动的替身服务器地址，不再启动子进程")
+    parser.add_argument('--config', help="替身服务器 JSON 配置文件")
+    parser.add_argument('--hosts', type=int, default=20, help="模拟的主机数 (默认: 20)")
+    parser.add_argument('--latency', default='10,100', help="上游延迟中位数和 P99 毫秒 (默认: 10,100)")
+    parser.add_argument('--fail-rate', type=float, help="上游失败概率")
+    parser.add_argument('--timeout-rate', type=float, help="上游挂起概率")
+    parser.add_argument('--throttle-rate', type=float, help="上游 429 概率")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="替身服务器随机种子 (默认: 0)")
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE, metavar='FILE',
+                        help=f"将结果保存为基线 (默认: {DEFAULT_BASELINE})")
+    parser.add_argument('--check', nargs='?', const=DEFAULT_BASELINE, metavar='FILE',
+                        help="与基线比较，有退化时退出码为 1")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="允许的退化幅度 (默认: 0.25)")
+    parser.add_argument('--min-delta', type=float, default=20, help="P99 增加少于该毫秒数不算退化 (默认: 20)")
+    args = parser.parse_args()
+
+    if args.workers <= 0:
+        parser.error("-w/--workers 必须为正整数")
+    try:
+        import requests  # noqa: F401  rdfinurl 在解析时才导入 requests，这里提前检查
+    except ImportError as e:
+        print(f"错误：rdfinurl 依赖 requests: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    baseline = {}
+    if args.check:
+        try:
+            with open(args.check, 'r', encoding='utf-8') as f:
+                baseline = json.load(f).get("results", {})
+        except (OSError, ValueError) as e:
+            print(f"错误：无法读取基线 '{args.check}': {e}", file=sys.stderr)
+            sys.exit(1)
+
+    proc = None
+    if args.server:
+        base_url = args.server.rstrip('/') + '/'
+    else:
+        server_args = ['--hosts', str(args.hosts), '--latency', args.latency, '-s', str(args.seed),
+                       '--hang', str(args.timeout + 1)]
+        for option, value in (('--config', args.config), ('--fail-rate', args.fail_rate),
+                              ('--timeout-rate', args.timeout_rate), ('--throttle-rate', args.throttle_rate)):
+            if value is not None:
+                server_args += [option, str(value)]
+        try:
+            proc, base_url = start_standin(server_args)
+        except (OSError, RuntimeError) as e:
+            print(f"错误: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    results = {}
+    regressions = []
+    try:
+        print(f"{'规模':>6}{'URL/s':>9}{'P50':>8}{'P90':>8}{'P99':>8}{'最大':>9}  {'请求/URL':>8}{'轮次':>5}"
+              f"{'重试(s)':>9}{'成功':>8}  对比基线")
+        for size in parse_sizes(args.sizes):
+            urls = [entry_url(base_url, index, args.hosts) for index in range(size)]
+            fetch_stats(base_url, reset=True)
+            result = run_resolver(urls, args.workers, args.timeout, args.retries, args.retry_delay)
+            result["server"] = fetch_stats(base_url)
+            key = f"resolver@{size_label(size)}"
+            results[key] = result
+
+            note = ''
+            if key in baseline:
+                problems = compare(result, baseline[key], args.tolerance, args.min_delta)
+                ratio = result["urls_per_sec"] / baseline[key]["urls_per_sec"] if baseline[key]["urls_per_sec"] else 0
+                note = f"x{ratio:.2f}" + (f"  退化: {', '.join(problems)}" if problems else '')
+                if problems:
+                    regressions.append(key)
+            elif args.check:
+                note = '(无基线)'
+            print(f"{size_label(size):>6}{result['urls_per_sec']:>9.0f}{result['p50_ms']:>8.0f}{result['p90_ms']:>8.0f}"
+                  f"{result['p99_ms']:>8.0f}{result['max_ms']:>9.0f}  {result['attempts_per_url']:>8.2f}"
+                  f"{result['rounds']:>5}{result['retry_seconds']:>9.2f}{result['succeeded']:>8}  {note}", flush=True)
+            server = result["server"]
+            print(f"{'':>6}上游: {server.get('requests', 0)} 个请求，重定向 {server.get('redirects', 0)}，"
+                  f"429 {server.get('throttled', 0)}，503 {server.get('failed', 0)}，断开 {server.get('reset', 0)}，"
+                  f"挂起 {server.get('hung', 0)}", flush=True)
+    except OSError as e:
+        print(f"错误：无法连接替身服务器: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+    if args.save_baseline:
+        data = {"python": sys.version.split()[0], "workers": args.workers, "seed": args.seed, "results": results}
+        if os.path.exists(args.save_baseline):
+            # 只覆盖本次运行的规模，保留其他规模的基线
+            try:
+                with open(args.save_baseline, 'r', encoding='utf-8') as f:
+                    old = json.load(f).get("results", {})
+                data["results"] = dict(old, **results)
+            except (OSError, ValueError):
+                pass
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"基线已保存到 '{args.save_baseline}'", file=sys.stderr)
+
+    if regressions:
+        print(f"性能退化: {', '.join(regressions)}", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+频道别名索引
+将不同来源的频道名（如 CCTV1综合 / CCTV-1 / cctv1 HD）归一化为同一个规范频道 ID，
+供合并、去重、排序等脚本共用。
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
+from m3u_profile import run_main
+
+DEFAULT_ALIAS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'channel_aliases.json')
+# 归一化结果缓存的条数上限（常驻进程中处理多个列表时内存不无限增长）
+NAME_CACHE_SIZE = 1 << 16
+
+# 画质/清晰度后缀，可叠加出现（如 "HD高清"），从末尾反复剥离
+# 拉丁字母后缀只在前面不是拉丁字母时剥离（"NASD" 中的 SD 是名称的一部分）
+QUALITY_SUFFIXES = (
+    '超高清', '高清', '超清', '标清', '蓝光', '频道',
+    'UHD', 'FHD', 'HDR', 'HD', 'SD', '1080P', '720P', '576P', '50FPS',
+)
+
+# 央视/教育台台号后的通用描述（频道的正式名称），剥离后同一频道得到同一 Key；
+# 其余限定词（欧洲、美洲、4K 等区域/版本）保留在 Key 中，如 CCTV4-欧洲、CCTV16-4K
+CCTV_DESCRIPTORS = (
+    '综合教育', '综合', '财经', '综艺', '中文国际', '体育赛事', '体育', '电影', '国防军事', '军事',
+    '电视剧', '纪录', '科教', '戏曲', '社会与法', '新闻', '少儿', '音乐', '农业农村', '奥林匹克',
+)
+
+_CCTV_PATTERN = re.compile(r'^(CCTV|CETV) ?(\d{1,2}) ?(\+|PLUS)?(.*)$')
+_CCTV_UHD_PATTERN = re.compile(r'^CCTV ?([48]K)(.*)$')
+
+def _strip_quality_suffixes(text, min_length=2):
+    """反复剥离末尾的画质后缀；text 中的空格表示原名称中的分隔符"""
+    stripped = True
+    while stripped:
+        stripped = False
+        text = text.rstrip()
+        for suffix in QUALITY_SUFFIXES:
+            if not text.endswith(suffix) or len(text) - len(suffix) < min_length:
+                continue
+            before = text[-len(suffix) - 1]
+            if suffix.isascii() and before.isascii() and before.isalpha():
+                continue
+            text = text[:-len(suffix)]
+            stripped = True
+            break
+    return text
+
+def _cctv_qualifier(rest):
+    """台号之后的部分：剥离通用描述和画质后缀，返回剩余的限定词（可能为空）"""
+    rest = rest.replace(' ', '')
+    changed = True
+    while changed:
+        changed = False
+        for descriptor in CCTV_DESCRIPTORS:
+            if rest.startswith(descriptor):
+                rest = rest[len(descriptor):]
+                changed = True
+                break
+        stripped = _strip_quality_suffixes(' ' + rest, min_length=1).strip()
+        if stripped != rest:
+            rest = stripped
+            changed = True
+    return rest
+
+# --- 归一化流水线 ---
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def normalize_channel_name(name):
+    """
+    归一化频道名: NFKC -> 大写 -> 标点空白视为分隔符 -> 去画质后缀 -> 去分隔符 -> 去末尾'台'
+    央视/教育台只剥离通用描述（综合、中文国际等），区域和版本限定词保留为 "台号-限定词"
+    结果会被缓存（LRU，最多 NAME_CACHE_SIZE 条），同一名称通常只计算一次
+    """
+    if not name:
+        return ""
+
+    text = unicodedata.normalize('NFKC', name).upper()
+    if '%' in text:
+        # 来自 URL 的名称（如 CCTV-5%2B）
+        from urllib.parse import unquote
+        text = unquote(text)
+    # 标点（P*）和空白（Z*）统一为一个空格，保留 "+" 等有意义的符号
+    text = ''.join(
+        ' ' if unicodedata.category(ch).startswith(('P', 'Z')) or ch.isspace() else ch
+        for ch in text
+    )
+    text = ' '.join(text.split())
+
+    match = _CCTV_UHD_PATTERN.match(text)
+    if match:
+        key, rest = f"CCTV{match.group(1)}", match.group(2)
+    else:
+        match = _CCTV_PATTERN.match(text)
+        if match:
+            key = f"{match.group(1)}{match.group(2)}{'+' if match.group(3) else ''}"
+            rest = match.group(4)
+    if match:
+        qualifier = _cctv_qualifier(rest)
+        return f"{key}-{qualifier}" if qualifier else key
+
+    text = _strip_quality_suffixes(text).replace(' ', '')
+    if text.endswith('台') and len(text) > 2:
+        text = text[:-1]
+    return text
+
+# --- 别名索引 ---
+class ChannelAliasIndex:
+    """
+    规范频道 ID 索引：归一化 Key -> 规范 ID，一次字典查找完成解析。
+    未登记别名的频道以其归一化 Key 作为规范 ID。
+    """
+
+    def __init__(self, aliases=None):
+        self._alias_map = {}
+        if aliases:
+            for canonical_id, names in aliases.items():
+                self.add_alias(canonical_id, *names)
+
+    def add_alias(self, canonical_id, *names):
+        """登记别名，规范 ID 自身的归一化形式也会指向它"""
+        self._alias_map[normalize_channel_name(canonical_id)] = canonical_id
+        for name in names:
+            key = normalize_channel_name(name)
+            if key:
+                self._alias_map[key] = canonical_id
+
+    def resolve(self, name):
+        """将频道名解析为规范频道 ID"""
+        key = normalize_channel_name(name)
+        return self._alias_map.get(key, key)
+
+    def __len__(self):
+        return len(self._alias_map)
+
+def load_alias_index(alias_path=None):
+    """
+    加载别名表 (JSON: {"规范ID": ["别名1", "别名2"]})
+    alias_path 为空时使用脚本目录下的默认别名表（不存在则为空表）
+    """
+    path = alias_path or DEFAULT_ALIAS_FILE
+    if not os.path.exists(path):
+        if alias_path:
+            raise FileNotFoundError(f"别名表 '{alias_path}' 不存在")
+        return ChannelAliasIndex()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        aliases = json.load(f)
+    return ChannelAliasIndex(aliases)
+
+def add_alias_argument(parser):
+    """为各脚本统一添加 --alias 参数：不带值时使用默认别名表"""
+    parser.add_argument('--alias', nargs='?', const='', default=None, metavar='FILE',
+                        help='按频道别名索引归一化频道名（可指定别名表 JSON，缺省使用 channel_aliases.json）')
+
+def main():
+    parser = argparse.ArgumentParser(description="频道别名解析：输出频道名对应的规范频道 ID")
+    parser.add_argument('names', nargs='+', help='频道名')
+    parser.add_argument('-a', '--alias-file', help='别名表 JSON')
+    args = parser.parse_args()
+
+    try:
+        index = load_alias_index(args.alias_file)
+    except Exception as e:
+        print(f"错误：无法加载别名表: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for name in args.names:
+        print(f"{name}\t{index.resolve(name)}")
+
+if __name__ == "__main__":
+    run_main(main)
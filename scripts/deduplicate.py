@@ -1,24 +1,34 @@
 import argparse
+import hashlib
 import os
-import tempfile
-import shutil
 
-def deduplicate_m3u(filepath):
+from channel_alias import add_alias_argument, load_alias_index
+from m3u_snapshot import load_playlist
+from m3u_writer import M3UWriter
+from url_canon import add_canon_argument, load_canonicalizer
+from m3u_profile import run_main
+
+def deduplicate_m3u(filepath, key_func=None, url_key_func=None):
     """
     对M3U文件进行去重处理（基于频道名称）
     兼容多个URL
+    
+    :param key_func: 可选，将频道名映射为去重 Key（如别名索引的 resolve）
+    :param url_key_func: 可选，URL 规范化函数；保留频道内按规范 Key 去重后的 URL，重复时取最后出现的实例
     """
-    with open(filepath, 'r', encoding='utf-8') as f:
-        lines = [line.strip() for line in f if line.strip()]
+    lines = [line.strip() for line in load_playlist(filepath).lines if line.strip()]
     
     seen = set()
     deduped = []
+    channel_url_positions = {}  # 频道 -> {URL Key: 在 deduped 中的位置}
     
     i = 0
     while i < len(lines):
         if lines[i].startswith("#EXTINF"):
             extinf_line = lines[i]
             channel_name = extinf_line.split(',', 1)[1] if ',' in extinf_line else ""
+            if key_func:
+                channel_name = key_func(channel_name)
             
             if channel_name not in seen:
                 seen.add(channel_name)
@@ -26,14 +36,28 @@ def deduplicate_m3u(filepath):
                 
                 # 添加直到下一个EXTINF或文件结束的所有行
                 i += 1
+                url_positions = channel_url_positions.setdefault(channel_name, {}) if url_key_func else None
                 while i < len(lines) and not lines[i].startswith("#EXTINF"):
+                    if url_key_func and not lines[i].startswith('#'):
+                        url_key = url_key_func(lines[i])
+                        if url_key in url_positions:
+                            # 同一路流的新实例，替换旧行
+                            deduped[url_positions[url_key]] = lines[i]
+                            i += 1
+                            continue
+                        url_positions[url_key] = len(deduped)
                     deduped.append(lines[i])
                     i += 1
                 deduped.append("")  # 空行分隔
             else:
-                # 跳过重复频道
+                # 跳过重复频道（其中与已保留频道同一路流的 URL 替换为最新实例）
                 i += 1
+                url_positions = channel_url_positions.get(channel_name) if url_key_func else None
                 while i < len(lines) and not lines[i].startswith("#EXTINF"):
+                    if url_positions and not lines[i].startswith('#'):
+                        position = url_positions.get(url_key_func(lines[i]))
+                        if position is not None:
+                            deduped[position] = lines[i]
                     i += 1
         else:
             # 保留文件头部和其他注释
@@ -43,6 +67,149 @@ def deduplicate_m3u(filepath):
     
     return deduped
 
+# ==================== 流式去重 ====================
+KEY_MODES = ('name', 'url', 'name+url')
+
+def _hash64(key):
+    """64 位哈希，用于代替完整 Key 常驻内存"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def _iter_records(f):
+    """
+    从二进制文件流中逐条读取记录，不整体载入内存
+
+    :yield: (记录起始偏移, EXTINF 行或 None, [记录内其余非空行])
+            EXTINF 为 None 表示首个频道之前的头部行（每行一条记录）
+    """
+    offset = 0
+    record_offset = 0
+    extinf = None
+    rest = []
+    for raw in f:
+        line_offset = offset
+        offset += len(raw)
+        line = raw.decode('utf-8').strip()
+        if not line:
+            continue
+        if line.startswith("#EXTINF"):
+            if extinf is not None:
+                yield record_offset, extinf, rest
+            record_offset = line_offset
+            extinf = line
+            rest = []
+        elif extinf is not None:
+            rest.append(line)
+        else:
+            yield line_offset, None, [line]
+    if extinf is not None:
+        yield record_offset, extinf, rest
+
+def _read_record_at(f, offset):
+    """回读 offset 处的一条记录（用于哈希命中时的精确校验）"""
+    f.seek(offset)
+    for _, extinf, rest in _iter_records(f):
+        return extinf, rest
+    return None, []
+
+class HashedKeySet:
+    """
+    去重 Key 集合：只保存 64 位哈希 -> 首次出现记录的文件偏移。
+    哈希命中时回读该记录重新计算 Key 做精确比较；真正的哈希冲突极少，
+    冲突 Key 才以完整字符串保存。内存与唯一 Key 数量成正比。
+    """
+
+    def __init__(self, verify_f, record_keys):
+        self._verify_f = verify_f
+        self._record_keys = record_keys
+        self._offsets = {}
+        self._collisions = {}
+
+    def add(self, key, offset):
+        """Key 为新出现时登记并返回 True，重复时返回 False"""
+        h = _hash64(key)
+        first_offset = self._offsets.get(h)
+        if first_offset is None:
+            self._offsets[h] = offset
+            return True
+        if key in self._collisions.get(h, ()):
+            return False
+        extinf, rest = _read_record_at(self._verify_f, first_offset)
+        if key in self._record_keys(extinf, rest):
+            return False
+        self._collisions.setdefault(h, set()).add(key)
+        return True
+
+    def __len__(self):
+        return len(self._offsets) + sum(len(keys) for keys in self._collisions.values())
+
+def deduplicate_m3u_stream(input_path, output_path, key_mode='name', key_func=None, url_key_func=None, add_header=True):
+    """
+    流式去重：逐条读取记录，保留的记录立即写出（先写临时文件，完成后原子替换）
+
+    :param key_mode: name 按频道名；url 按 URL；name+url 按 (频道名, 规范化URL)
+                     url/name+url 模式下逐个 URL 去重，URL 全部重复的记录整体丢弃
+                     已写出的记录不会回改，重复时保留首次出现的实例
+    :return: (保留的频道数, 丢弃的频道数, 唯一 Key 数)
+    """
+    if key_mode not in KEY_MODES:
+        raise ValueError(f"未知的去重 Key: {key_mode}")
+
+    def channel_name(extinf):
+        name = extinf.split(',', 1)[1] if ',' in extinf else ""
+        return key_func(name) if key_func else name
+
+    def url_key(name, url):
+        url = url_key_func(url) if url_key_func else url
+        return url if key_mode == 'url' else f"{name}\x00{url}"
+
+    def record_keys(extinf, rest):
+        if extinf is None:
+            return set()
+        name = channel_name(extinf)
+        if key_mode == 'name':
+            return {name}
+        return {url_key(name, line) for line in rest if not line.startswith('#')}
+
+    kept = 0
+    dropped = 0
+
+    with open(input_path, 'rb') as in_f, open(input_path, 'rb') as verify_f, \
+            M3UWriter(output_path) as out_f:
+        seen = HashedKeySet(verify_f, record_keys)
+        if add_header:
+            out_f.write("#EXTM3U\n")
+
+        for offset, extinf, rest in _iter_records(in_f):
+            if extinf is None:
+                # 保留文件头部和其他注释
+                out_f.write(rest[0] + '\n\n')
+                continue
+
+            name = channel_name(extinf)
+            if key_mode == 'name':
+                survivors = rest if seen.add(name, offset) else None
+            else:
+                survivors = []
+                has_url = False
+                for line in rest:
+                    if line.startswith('#'):
+                        survivors.append(line)
+                    elif seen.add(url_key(name, line), offset):
+                        survivors.append(line)
+                        has_url = True
+                if not has_url:
+                    survivors = None
+
+            if survivors is None:
+                dropped += 1
+                continue
+            kept += 1
+            out_f.write_line(extinf)
+            out_f.write_lines(survivors)
+            out_f.write('\n')
+
+    return kept, dropped, len(seen)
+
 def safe_write_output(data, input_path, output_path, add_header=True):
     """
     安全地写入输出文件，支持同文件覆盖
@@ -53,61 +220,18 @@ def safe_write_output(data, input_path, output_path, add_header=True):
     :param add_header: 是否添加#EXTM3U头部
     :return: 成功返回True，失败返回False
     """
-    # 获取绝对路径以判断是否为同一个文件
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
-    is_same_file = input_abs == output_abs
-    
     try:
-        # 如果是同一个文件，先写到临时文件
-        if is_same_file:
-            # 在与输出文件相同目录创建临时文件
-            fd, temp_path = tempfile.mkstemp(
-                dir=os.path.dirname(output_path) or '.',
-                suffix='.m3u',
-                text=True
-            )
-            
-            # 使用文件描述符打开文件
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            # 直接打开输出文件
-            out_f = open(output_path, 'w', encoding='utf-8')
-        
-        # 写入数据
-        with out_f:
+        with M3UWriter(output_path) as writer:
             if add_header:
-                out_f.write("#EXTM3U\n")
-            
-            for line in data:
-                if line == "":  # 处理空行
-                    out_f.write('\n')
-                else:
-                    out_f.write(line + '\n')
-        
-        # 如果是同一个文件，进行原子替换
-        if is_same_file:
-            try:
-                # Python 3.3+ 推荐使用 os.replace 实现原子替换
-                os.replace(temp_path, output_path)
-                print(f"注意：输入和输出为同一文件，已安全覆盖")
-            except Exception as e:
-                # 如果 os.replace 失败，使用 shutil.move 作为备选
-                print(f"警告：os.replace 失败，使用备选方案: {e}")
-                shutil.move(temp_path, output_path)
+                writer.write_line("#EXTM3U")
+            writer.write_lines(data)
         
+        if os.path.abspath(input_path) == os.path.abspath(output_path):
+            print(f"注意：输入和输出为同一文件，已安全覆盖")
         return True
         
     except Exception as e:
         print(f"写入文件失败: {e}")
-        
-        # 清理临时文件（如果存在）
-        if is_same_file and 'temp_path' in locals() and os.path.exists(temp_path):
-            try:
-                os.unlink(temp_path)
-            except:
-                pass
-                
         return False
 
 def parse_arguments():
@@ -141,6 +265,19 @@ def parse_arguments():
         action='store_true',
         help='强制覆盖输出文件（如果已存在且与输入不同）'
     )
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='流式去重：逐条读取并立即写出，内存只与唯一 Key 数量相关'
+    )
+    parser.add_argument(
+        '--key',
+        choices=KEY_MODES,
+        default='name',
+        help='流式去重的 Key：频道名 / URL / (频道名, 规范化URL)'
+    )
+    add_alias_argument(parser)
+    add_canon_argument(parser)
     
     return parser.parse_args()
 
@@ -185,7 +322,7 @@ def validate_arguments(args):
     
     return True
 
-if __name__ == "__main__":
+def main():
     args = parse_arguments()
     
     # 验证参数
@@ -194,7 +331,19 @@ if __name__ == "__main__":
     
     # 执行去重
     try:
-        unique_entries = deduplicate_m3u(args.input)
+        key_func = load_alias_index(args.alias or None).resolve if args.alias is not None else None
+        url_key_func = load_canonicalizer(args.canon_urls or None).canonical if args.canon_urls is not None else None
+        
+        if args.stream:
+            kept, dropped, key_count = deduplicate_m3u_stream(
+                args.input, args.output, args.key, key_func, url_key_func, args.add_header
+            )
+            print(f"已处理: {args.input}")
+            print(f"去重后: {kept} 个频道（丢弃 {dropped} 个重复频道，{key_count} 个唯一 Key）")
+            print(f"输出到: {args.output}")
+            exit(0)
+        
+        unique_entries = deduplicate_m3u(args.input, key_func, url_key_func)
         
         # 计算频道数量（仅统计EXTINF行）
         channel_count = sum(1 for line in unique_entries if line.startswith("#EXTINF"))
@@ -213,3 +362,6 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"处理过程中发生错误: {e}")
         exit(1)
+
+if __name__ == "__main__":
+    run_main(main)
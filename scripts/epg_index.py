@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+XMLTV EPG 流式加载与频道索引
+用 iterparse 逐个读取 <channel>/<programme>，处理完立即从树上摘除，
+内存占用只与频道数有关，与 EPG 文件大小（节目数）无关。
+
+索引内容: 频道 ID -> 显示名列表、节目数、最早开始时间、最晚结束时间
+可保存为 JSON 供重复使用，也可直接检查播放列表的 tvg-id 是否都能在 EPG 中找到。
+支持本地文件、.gz（按文件头自动识别）和 http(s) 地址。
+"""
+
+import argparse
+import calendar
+import gzip
+import json
+import os
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from channel_alias import normalize_channel_name
+from m3u_profile import run_main
+
+_TVG_ID_PATTERN = re.compile(r'tvg-id="([^"]*)"')
+_TVG_NAME_PATTERN = re.compile(r'tvg-name="([^"]*)"')
+_DOCTYPE_PATTERN = re.compile(rb'<!DOCTYPE\s[^\[>]*(?:\[.*?\]\s*)?>', re.DOTALL)
+_PROLOG_LIMIT = 64 * 1024
+
+# --- 读取 ---
+def open_epg(source):
+    """打开 EPG（本地路径或 http(s) 地址），gzip 压缩的内容自动解压，返回二进制流"""
+    if source.startswith(('http://', 'https://')):
+        from urllib.request import urlopen
+        f = urlopen(source, timeout=60)
+    else:
+        f = open(source, 'rb')
+    if f.peek(2)[:2] == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=f)
+    return f
+
+class _PrologRecorder:
+    """包装二进制流，记录开头 limit 字节（iterparse 看不到 <!DOCTYPE>，从原文中提取）"""
+
+    def __init__(self, f, limit=_PROLOG_LIMIT):
+        self._f = f
+        self._limit = limit
+        self.head = bytearray()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        if len(self.head) < self._limit:
+            self.head.extend(data[:self._limit - len(self.head)])
+        return data
+
+def iter_epg_elements(source, root_attrib=None, doctype=None):
+    """
+    流式产出 <tv> 的直接子元素（<channel>、<programme> 等）
+    元素在产出后被清空并从 <tv> 上摘除，调用方不要保留其引用
+    :param root_attrib: 可选 dict，填入 <tv> 元素的属性
+    :param doctype: 可选 list，源文件有 <!DOCTYPE> 声明时在产出第一个元素前追加其原文
+    """
+    with open_epg(source) as f:
+        if doctype is not None:
+            f = _PrologRecorder(f)
+        root = None
+        depth = 0
+        for event, elem in ET.iterparse(f, events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if root is None:
+                    root = elem
+                    if root_attrib is not None:
+                        root_attrib.update(elem.attrib)
+                    if doctype is not None:
+                        match = _DOCTYPE_PATTERN.search(f.head)
+                        if match:
+                            doctype.append(match.group(0).decode('utf-8', 'replace'))
+                continue
+            depth -= 1
+            if depth == 1:
+                yield elem
+                elem.clear()
+                root.remove(elem)
+
+def parse_xmltv_time(value):
+    """
+    解析 XMLTV 时间 "20240101120000 +0800" 为 UTC 时间戳（秒）；无时区时按 UTC
+    格式不符返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    digits = value[:14]
+    if len(digits) < 12 or not digits.isdigit():
+        return None
+    try:
+        timestamp = calendar.timegm((int(digits[0:4]), int(digits[4:6]), int(digits[6:8]),
+                                     int(digits[8:10]), int(digits[10:12]), int(digits[12:14] or 0), 0, 0, 0))
+    except ValueError:
+        return None
+    offset = value[len(digits):].strip()
+    if len(offset) >= 5 and offset[0] in '+-' and offset[1:5].isdigit():
+        seconds = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+        timestamp += -seconds if offset[0] == '+' else seconds
+    return timestamp
+
+# --- 索引 ---
+class EpgChannel:
+    __slots__ = ('names', 'programmes', 'first_start', 'last_stop', 'declared')
+
+    def __init__(self, names=None, programmes=0, first_start=None, last_stop=None, declared=True):
+        self.names = names or []
+        self.programmes = programmes
+        self.first_start = first_start
+        self.last_stop = last_stop
+        self.declared = declared
+
+    def add_programme(self, start, stop):
+        self.programmes += 1
+        if start is not None and (self.first_start is None or start < self.first_start):
+            self.first_start = start
+        stop = stop if stop is not None else start
+        if stop is not None and (self.last_stop is None or stop > self.last_stop):
+            self.last_stop = stop
+
+class EpgIndex:
+    """
+    频道 ID -> EpgChannel
+    只出现在 <programme channel="..."> 中、没有 <channel> 声明的 ID 也会记录（declared=False）
+    """
+
+    def __init__(self, channels=None, source=None):
+        self.channels = channels if channels is not None else {}
+        self.source = source
+        self._name_index = None
+
+    def __contains__(self, channel_id):
+        return channel_id in self.channels
+
+    def get(self, channel_id):
+        return self.channels.get(channel_id)
+
+    @property
+    def programme_count(self):
+        return sum(channel.programmes for channel in self.channels.values())
+
+    def time_range(self):
+        starts = [c.first_start for c in self.channels.values() if c.first_start is not None]
+        stops = [c.last_stop for c in self.channels.values() if c.last_stop is not None]
+        return (min(starts) if starts else None, max(stops) if stops else None)
+
+    def name_index(self):
+        """归一化显示名（含频道 ID 本身）-> [频道 ID]，首次调用时建立"""
+        if self._name_index is None:
+            index = {}
+            for channel_id, channel in self.channels.items():
+                for name in [channel_id] + channel.names:
+                    key = normalize_channel_name(name)
+                    if key:
+                        ids = index.setdefault(key, [])
+                        if channel_id not in ids:
+                            ids.append(channel_id)
+            self._name_index = index
+        return self._name_index
+
+    def find_by_name(self, name):
+        """按归一化名称查找频道 ID 列表"""
+        return self.name_index().get(normalize_channel_name(name), [])
+
+    # --- 持久化 ---
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "channels": {
+                channel_id: {
+                    "names": c.names,
+                    "programmes": c.programmes,
+                    "first_start": c.first_start,
+                    "last_stop": c.last_stop,
+                    "declared": c.declared,
+                }
+                for channel_id, c in self.channels.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        channels = {channel_id: EpgChannel(**fields) for channel_id, fields in data.get("channels", {}).items()}
+        return cls(channels, data.get("source"))
+
+    def save(self, path):
+        from m3u_writer import write_text
+        write_text(path, json.dumps(self.to_dict(), ensure_ascii=False) + '\n', compress=[], snapshot=False)
+
+def build_epg_index(source):
+    """流式读取 EPG 建立索引"""
+    channels = {}
+    for elem in iter_epg_elements(source):
+        if elem.tag == 'channel':
+            channel_id = elem.get('id')
+            if not channel_id:
+                continue
+            names = [(e.text or '').strip() for e in elem.iter('display-name') if (e.text or '').strip()]
+            channel = channels.get(channel_id)
+            if channel is None:
+                channels[channel_id] = EpgChannel(names)
+            else:
+                channel.declared = True
+                channel.names.extend(name for name in names if name not in channel.names)
+        elif elem.tag == 'programme':
+            channel_id = elem.get('channel')
+            if not channel_id:
+                continue
+            channel = channels.get(channel_id)
+            if channel is None:
+                channel = channels[channel_id] = EpgChannel(declared=False)
+            channel.add_programme(parse_xmltv_time(elem.get('start')), parse_xmltv_time(elem.get('stop')))
+    return EpgIndex(channels, source)
+
+def load_epg_index(source):
+    """source 为 .json 时加载已保存的索引，否则流式解析 EPG"""
+    if source.endswith('.json'):
+        with open(source, 'r', encoding='utf-8') as f:
+            return EpgIndex.from_dict(json.load(f))
+    return build_epg_index(source)
+
+# --- 播放列表检查 ---
+def check_playlist(index, m3u_path):
+    """
+    检查播放列表各频道能否在 EPG 中找到
+    :return: (按 tvg-id 命中数, 按名称命中数, 未命中的频道名列表)
+    """
+    by_id = 0
+    by_name = 0
+    missing = []
+    with open(m3u_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith('#EXTINF'):
+                continue
+            tvg_id = _TVG_ID_PATTERN.search(line)
+            if tvg_id and tvg_id.group(1).strip() in index:
+                by_id += 1
+                continue
+            tvg_name = _TVG_NAME_PATTERN.search(line)
+            name = line.rsplit(',', 1)[1].strip() if ',' in line else ''
+            if (tvg_name and index.find_by_name(tvg_name.group(1))) or (name and index.find_by_name(name)):
+                by_name += 1
+            else:
+                missing.append(name or (tvg_id.group(1) if tvg_id else ''))
+    return by_id, by_name, missing
+
+def _format_time(timestamp):
+    return time.strftime('%Y-%m-%d %H:%M', time.gmtime(timestamp)) + ' UTC' if timestamp is not None else '-'
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="XMLTV EPG 流式索引：统计频道/节目，保存索引，检查播放列表 tvg-id",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('source', help="EPG 文件（.xml / .xml.gz / http 地址）或已保存的索引 .json")
+    parser.add_argument('-o', '--output', help="将索引保存为 JSON")
+    parser.add_argument('-c', '--check', nargs='+', metavar='M3U', help="检查播放列表频道能否在 EPG 中找到")
+    parser.add_argument('-l', '--list', action='store_true', help="列出所有频道: ID、节目数、显示名")
+    parser.add_argument('-v', '--verbose', action='store_true', help="--check 时列出未命中的频道")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        index = load_epg_index(args.source)
+    except (OSError, ET.ParseError, ValueError) as e:
+        print(f"错误：无法读取 EPG '{args.source}': {e}", file=sys.stderr)
+        sys.exit(1)
+    first, last = index.time_range()
+    print(f"{len(index.channels)} 个频道，{index.programme_count} 个节目，"
+          f"时间范围 {_format_time(first)} ~ {_format_time(last)}，耗时 {time.perf_counter() - start:.2f}s",
+          file=sys.stderr)
+
+    if args.output:
+        index.save(args.output)
+        print(f"索引已保存到 '{args.output}'", file=sys.stderr)
+
+    if args.list:
+        try:
+            for channel_id, channel in index.channels.items():
+                print(f"{channel_id}\t{channel.programmes}\t{' / '.join(channel.names)}")
+        except BrokenPipeError:
+            # 输出被管道截断（如 | head），不算错误
+            sys.stdout = open(os.devnull, 'w')
+            return
+
+    if args.check:
+        for path in args.check:
+            try:
+                by_id, by_name, missing = check_playlist(index, path)
+            except OSError as e:
+                print(f"错误：无法读取 '{path}': {e}", file=sys.stderr)
+                continue
+            total = by_id + by_name + len(missing)
+            rate = (by_id + by_name) / total * 100 if total else 0
+            print(f"{path}: {total} 个频道，tvg-id 命中 {by_id}，名称命中 {by_name}，"
+                  f"未命中 {len(missing)} ({rate:.1f}% 可匹配)")
+            if args.verbose:
+                for name in missing:
+                    print(f"    {name}")
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+EPG 裁剪
+读取播放列表中的 tvg-id / tvg-name / 频道名，流式读取 XMLTV，
+只保留播放列表用到的频道，以及时间窗口（默认 当前-1天 ~ 当前+2天）内的节目；源文件的 <!DOCTYPE> 声明原样保留。
+
+频道匹配: <channel id> 等于 tvg-id，或频道 ID / display-name 与 tvg-name、频道名归一化后相同。
+按名称匹配依赖 <channel> 出现在其节目之前（XMLTV 的常规顺序）。
+"""
+
+import argparse
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from channel_alias import normalize_channel_name
+from epg_index import iter_epg_elements, parse_xmltv_time
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+_TVG_ID_PATTERN = re.compile(r'tvg-id="([^"]*)"')
+_TVG_NAME_PATTERN = re.compile(r'tvg-name="([^"]*)"')
+_DURATION_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)([dhm]?)$')
+_DURATION_UNITS = {'d': 86400, 'h': 3600, 'm': 60, '': 86400}
+
+def parse_duration(value):
+    """'1d' / '12h' / '30m' / '2'（天）转为秒"""
+    match = _DURATION_PATTERN.match(value.strip().lower())
+    if not match:
+        raise ValueError(f"无效的时长 '{value}'（示例: 1d, 12h, 30m）")
+    return int(float(match.group(1)) * _DURATION_UNITS[match.group(2)])
+
+def read_playlist_keys(m3u_paths):
+    """
+    收集播放列表中的频道标识
+    :return: (tvg-id 集合, 归一化名称集合)
+    """
+    tvg_ids = set()
+    names = set()
+    for path in m3u_paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line.startswith('#EXTINF'):
+                    continue
+                match = _TVG_ID_PATTERN.search(line)
+                if match and match.group(1).strip():
+                    tvg_ids.add(match.group(1).strip())
+                match = _TVG_NAME_PATTERN.search(line)
+                for name in (match.group(1) if match else '', line.rsplit(',', 1)[1] if ',' in line else ''):
+                    key = normalize_channel_name(name.strip())
+                    if key:
+                        names.add(key)
+    return tvg_ids, names
+
+def trim_epg(source, output_path, tvg_ids, names, window_start, window_end, compress=None):
+    """
+    流式裁剪 EPG 并写出
+    :return: 统计 {"channels", "channels_kept", "programmes", "programmes_kept"}
+    """
+    # xml.sax.saxutils 会连带导入 urllib.request，只在裁剪时加载
+    from xml.sax.saxutils import quoteattr
+
+    stats = {"channels": 0, "channels_kept": 0, "programmes": 0, "programmes_kept": 0}
+    kept_ids = set(tvg_ids)
+    root_attrib = {}
+    doctype = []
+
+    with M3UWriter(output_path, compress=compress, snapshot=False) as writer:
+        writer.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        header_written = False
+        for elem in iter_epg_elements(source, root_attrib, doctype):
+            if not header_written:
+                if doctype:
+                    writer.write(doctype[0] + '\n')
+                attrs = ''.join(f' {key}={quoteattr(value)}' for key, value in root_attrib.items())
+                writer.write(f'<tv{attrs}>\n')
+                header_written = True
+
+            if elem.tag == 'channel':
+                stats["channels"] += 1
+                channel_id = elem.get('id') or ''
+                if channel_id not in kept_ids:
+                    candidates = [channel_id] + [e.text or '' for e in elem.iter('display-name')]
+                    if not any(normalize_channel_name(name.strip()) in names for name in candidates):
+                        continue
+                    kept_ids.add(channel_id)
+                stats["channels_kept"] += 1
+            elif elem.tag == 'programme':
+                stats["programmes"] += 1
+                if elem.get('channel') not in kept_ids:
+                    continue
+                start = parse_xmltv_time(elem.get('start'))
+                stop = parse_xmltv_time(elem.get('stop'))
+                stop = stop if stop is not None else start
+                if start is not None and (stop <= window_start or start >= window_end):
+                    continue
+                stats["programmes_kept"] += 1
+            else:
+                continue
+
+            elem.tail = '\n'
+            writer.write(ET.tostring(elem, encoding='unicode'))
+
+        if not header_written:
+            writer.write('<tv>\n')
+        writer.write('</tv>\n')
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="EPG 裁剪：只保留播放列表用到的频道和时间窗口内的节目",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('-e', '--epg', required=True, help="EPG 文件（.xml / .xml.gz / http 地址）")
+    parser.add_argument('-i', '--input', nargs='+', required=True, help="一个或多个 M3U 播放列表")
+    parser.add_argument('-o', '--output', required=True, help="输出 XMLTV 文件")
+    parser.add_argument('--past', default='1d', help="保留当前时间之前多久的节目 (默认: 1d)")
+    parser.add_argument('--future', default='2d', help="保留当前时间之后多久的节目 (默认: 2d)")
+    parser.add_argument('-c', '--compress', default=None,
+                        help="同时生成压缩副本，如 gz 或 gz,br（默认读取 M3U_COMPRESS）")
+    args = parser.parse_args()
+
+    try:
+        now = int(time.time())
+        window_start = now - parse_duration(args.past)
+        window_end = now + parse_duration(args.future)
+        tvg_ids, names = read_playlist_keys(args.input)
+    except (ValueError, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    start = time.perf_counter()
+    try:
+        stats = trim_epg(args.epg, args.output, tvg_ids, names, window_start, window_end, args.compress)
+    except (OSError, ET.ParseError, ValueError) as e:
+        print(f"错误：裁剪 EPG 失败: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"频道 {stats['channels_kept']}/{stats['channels']}，节目 {stats['programmes_kept']}/{stats['programmes']}，"
+          f"耗时 {time.perf_counter() - start:.2f}s -> '{args.output}'", file=sys.stderr)
+
+if __name__ == "__main__":
+    run_main(main)
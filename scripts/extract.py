@@ -1,8 +1,11 @@
 import argparse
 import sys
 import os
-import tempfile
-import shutil
+
+from m3u_snapshot import load_playlist
+from m3u_writer import M3UWriter
+from url_canon import add_canon_argument, load_canonicalizer
+from m3u_profile import run_main
 
 def _check_match(text, keyword_str):
     """
@@ -24,22 +27,32 @@ def _check_match(text, keyword_str):
         return processed_keyword in text
 
 def extract_keyword_lines(filepath, extinf_and_url_keywords=None, extinf_or_url_keywords=None, 
-                          no_config=False, remove_mode=False):
+                          no_config=False, remove_mode=False, url_key_func=None):
     """
     高级 M3U 解析器：支持多行配置、URL 容错及去重。
     :param no_config: 如果为 True，则丢弃 #EXTVLCOPT 等中间配置行。
     :param remove_mode: 如果为 True，则删除匹配的记录，保留不匹配的记录。
+    :param url_key_func: 可选，URL 规范化函数；去重时按规范 Key 比较，重复记录保留最后出现的 URL（位置不变）。
     """
     try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            # 过滤掉纯空行，并去除每行末尾换行符
-            lines = [line.strip() for line in file if line.strip()]
+        # 过滤掉纯空行，并去除每行首尾空白
+        lines = [line.strip() for line in load_playlist(filepath).lines if line.strip()]
     except Exception as e:
         print(f"错误：无法读取文件 {filepath}。原因：{e}")
         return []
 
     ordered_record_pairs = []
-    seen_record_pairs = set()
+    seen_record_pairs = {}  # 记录 Key -> 在 ordered_record_pairs 中的位置
+
+    def add_record(record_block, extinf, url):
+        # 去重逻辑
+        record_key = (extinf, url_key_func(url) if url_key_func else url)
+        if record_key not in seen_record_pairs:
+            seen_record_pairs[record_key] = len(ordered_record_pairs)
+            ordered_record_pairs.append(record_block)
+        elif url_key_func:
+            # 同一路流的新实例（如刷新了时间戳），替换为最新的记录
+            ordered_record_pairs[seen_record_pairs[record_key]] = record_block
 
     # 解析关键字逻辑
     kw1_and_kw2 = None
@@ -107,11 +120,7 @@ def extract_keyword_lines(filepath, extinf_and_url_keywords=None, extinf_or_url_
                         else:
                             record_block = [current_extinf] + current_sub_configs + [current_url]
                         
-                        # 去重逻辑
-                        record_key = (current_extinf, current_url)
-                        if record_key not in seen_record_pairs:
-                            ordered_record_pairs.append(record_block)
-                            seen_record_pairs.add(record_key)
+                        add_record(record_block, current_extinf, current_url)
                 else:
                     # 原始模式：只保留匹配的记录
                     if matched:
@@ -121,11 +130,7 @@ def extract_keyword_lines(filepath, extinf_and_url_keywords=None, extinf_or_url_
                         else:
                             record_block = [current_extinf] + current_sub_configs + [current_url]
                         
-                        # 去重逻辑
-                        record_key = (current_extinf, current_url)
-                        if record_key not in seen_record_pairs:
-                            ordered_record_pairs.append(record_block)
-                            seen_record_pairs.add(record_key)
+                        add_record(record_block, current_extinf, current_url)
                 
                 i = j + 1  # 移动到 URL 之后的一行
             else:
@@ -159,53 +164,14 @@ def safe_write_output(data, input_path, output_path):
     :param output_path: 输出文件路径
     :return: (success, temp_path) 成功返回(True, None)，失败返回(False, temp_path)
     """
-    # 获取绝对路径以判断是否为同一个文件
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
-    is_same_file = input_abs == output_abs
-    
-    temp_path = None
-    
     try:
-        # 如果是同一个文件，先写到临时文件
-        if is_same_file:
-            # 在与输出文件相同目录创建临时文件
-            output_dir = os.path.dirname(output_path) or '.'
-            fd, temp_path = tempfile.mkstemp(
-                dir=output_dir,
-                suffix='.m3u',
-                prefix='.tmp_',
-                text=True
-            )
-            
-            # 使用文件描述符打开文件
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            # 直接打开输出文件
-            out_f = open(output_path, 'w', encoding='utf-8')
-        
-        # 写入数据
-        with out_f:
-            for line in data:
-                out_f.write(line + '\n')
-        
-        # 如果是同一个文件，进行原子替换
-        if is_same_file:
-            try:
-                # Python 3.3+ 推荐使用 os.replace 实现原子替换
-                os.replace(temp_path, output_path)
-                temp_path = None  # 替换成功，清除临时文件引用
-            except Exception as e:
-                # 如果 os.replace 失败，使用 shutil.move 作为备选
-                print(f"警告：原子替换失败，使用备选方案: {e}")
-                shutil.move(temp_path, output_path)
-                temp_path = None  # 移动成功，清除临时文件引用
-        
+        with M3UWriter(output_path) as writer:
+            writer.write_lines(data)
         return True, None
         
     except Exception as e:
         print(f"写入文件失败: {e}")
-        return False, temp_path
+        return False, None
 
 def validate_arguments(args):
     """
@@ -255,6 +221,7 @@ def parse_arguments():
                        help='删除模式：删除匹配的记录，保留不匹配的记录')
     parser.add_argument('--force', action='store_true',
                        help='强制覆盖输出文件（如果已存在且与输入不同）')
+    add_canon_argument(parser)
 
     group = parser.add_mutually_exclusive_group(required=True)
     group.add_argument('--eandu', dest='extinf_and_url_keywords', 
@@ -287,7 +254,7 @@ def cleanup_temp_file(temp_path):
         except Exception as e:
             print(f"警告：无法删除临时文件 {temp_path}: {e}")
 
-if __name__ == "__main__":
+def main():
     args = parse_arguments()
     
     # 验证参数
@@ -304,13 +271,22 @@ if __name__ == "__main__":
             print("使用 --force 参数强制覆盖，或指定不同的输出文件")
             sys.exit(1)
     
+    url_key_func = None
+    if args.canon_urls is not None:
+        try:
+            url_key_func = load_canonicalizer(args.canon_urls or None).canonical
+        except Exception as e:
+            print(f"错误：无法加载URL规范化规则: {e}")
+            sys.exit(1)
+    
     # 根据参数调用函数
     if args.extinf_and_url_keywords:
         extracted_lines = extract_keyword_lines(
             args.input, 
             extinf_and_url_keywords=args.extinf_and_url_keywords,
             no_config=args.no_config,
-            remove_mode=args.remove_mode
+            remove_mode=args.remove_mode,
+            url_key_func=url_key_func
         )
         if args.remove_mode:
             mode_str = "删除EXTINF和URL均匹配(AND)的记录"
@@ -321,7 +297,8 @@ if __name__ == "__main__":
             args.input, 
             extinf_or_url_keywords=args.extinf_or_url_keywords,
             no_config=args.no_config,
-            remove_mode=args.remove_mode
+            remove_mode=args.remove_mode,
+            url_key_func=url_key_func
         )
         if args.remove_mode:
             mode_str = "删除EXTINF或URL匹配(OR)的记录"
@@ -358,3 +335,6 @@ if __name__ == "__main__":
     # 检查是否使用了临时文件（即输入输出相同）
     if os.path.abspath(args.input) == os.path.abspath(args.output):
         print("注意：已安全覆盖原文件")
+
+if __name__ == "__main__":
+    run_main(main)
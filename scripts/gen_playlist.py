@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+合成测试播放列表生成器
+按给定随机种子生成确定性的 M3U（或 txt2m3u 使用的 TXT），用于基准测试和压力测试。
+可配置: 频道数、每频道 URL 数、分组数、属性出现比例、配置行比例、重复比例、主机数。
+相同参数和种子总是生成逐字节相同的文件。
+"""
+
+import argparse
+import random
+import sys
+
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+DEFAULT_ATTRS = 'tvg-id=0.7,tvg-name=0.8,tvg-logo=0.5'
+HEADER = '#EXTM3U x-tvg-url="http://epg.example.com/e.xml"'
+
+_CCTV_VARIANTS = ('CCTV-{n}', 'CCTV{n}', 'CCTV-{n} 综合', 'CCTV{n}高清', 'cctv{n} HD')
+_PROVINCES = ('湖南', '浙江', '江苏', '东方', '北京', '广东', '深圳', '山东', '天津', '重庆', '四川', '安徽')
+_LATIN_WORDS = ('News', 'Movies', 'Sports', 'Kids', 'Music', 'Comedy', 'Classic', 'Nature', 'Travel', 'Cooking')
+_USER_AGENTS = ('okhttp/3.12', 'Mozilla/5.0', 'VLC/3.0.18')
+
+def parse_attrs(value):
+    """"tvg-id=0.7,tvg-logo=0.5" -> {属性名: 出现比例}"""
+    attrs = {}
+    for item in (value or '').split(','):
+        name, _, ratio = item.partition('=')
+        if name.strip():
+            attrs[name.strip()] = float(ratio) if ratio.strip() else 1.0
+    return attrs
+
+def parse_range(value):
+    """"2" -> (2, 2)，"1-3" -> (1, 3)"""
+    low, _, high = str(value).partition('-')
+    low = int(low)
+    high = int(high) if high else low
+    if low < 1 or high < low:
+        raise ValueError(f"无效的范围 '{value}'")
+    return low, high
+
+def _channel_name(rng, index):
+    kind = rng.random()
+    if kind < 0.15:
+        return rng.choice(_CCTV_VARIANTS).format(n=rng.randint(1, 17))
+    if kind < 0.35:
+        return f"{rng.choice(_PROVINCES)}卫视{rng.choice(('', '', '高清', ' HD'))}"
+    if kind < 0.6:
+        return f"{rng.choice(_LATIN_WORDS)} {rng.choice(_LATIN_WORDS)} {index % 997}"
+    return f"频道{index}"
+
+def _url(rng, index, hosts, serial):
+    host = f"h{rng.randrange(hosts)}.example.com"
+    kind = rng.random()
+    if kind < 0.3:
+        # 带易变参数，规范化 URL 时会被忽略
+        return f"http://{host}/live/{index}.m3u8?token={rng.getrandbits(48):012x}&t={1700000000 + serial}"
+    if kind < 0.4:
+        return f"http://{rng.randrange(1, 255)}.{rng.randrange(256)}.{rng.randrange(256)}.1:8080/rtp/{index}"
+    return f"https://{host}/ch/{index}/{serial}/index.m3u8"
+
+def iter_channels(channels, urls_per_channel=(1, 3), groups=20, attrs=None, config_ratio=0.05,
+                  dup_ratio=0.1, hosts=50, seed=0):
+    """
+    产出频道记录 {"name", "group", "attrs": [(属性名, 值)], "configs": [...], "urls": [...]}
+    dup_ratio 比例的频道复用之前出现过的频道名和分组（其中一半同时复用 URL）
+    """
+    rng = random.Random(seed)
+    attrs = parse_attrs(DEFAULT_ATTRS) if attrs is None else attrs
+    group_names = ['央视频道', '卫视频道'] + [f"分组{i}" for i in range(max(0, groups - 2))]
+    group_names = group_names[:max(1, groups)]
+    history = []
+    serial = 0
+
+    for index in range(channels):
+        if history and rng.random() < dup_ratio:
+            name, group, previous_urls = history[rng.randrange(len(history))]
+            reuse_urls = rng.random() < 0.5
+        else:
+            name = _channel_name(rng, index)
+            group = rng.choice(group_names)
+            previous_urls = None
+            reuse_urls = False
+
+        if reuse_urls:
+            urls = list(previous_urls)
+        else:
+            urls = []
+            for _ in range(rng.randint(*urls_per_channel)):
+                serial += 1
+                urls.append(_url(rng, index, hosts, serial))
+
+        channel_attrs = []
+        for attr, ratio in attrs.items():
+            if rng.random() < ratio:
+                if attr == 'tvg-id':
+                    channel_attrs.append((attr, f"{name.replace(' ', '')}.cn"))
+                elif attr == 'tvg-name':
+                    channel_attrs.append((attr, name))
+                elif attr == 'tvg-logo':
+                    channel_attrs.append((attr, f"https://logo.example.com/{index}.png"))
+                else:
+                    channel_attrs.append((attr, f"{attr}-{index}"))
+
+        configs = []
+        if rng.random() < config_ratio:
+            configs.append(f"#EXTVLCOPT:http-user-agent={rng.choice(_USER_AGENTS)}")
+
+        if len(history) < 100000:
+            history.append((name, group, urls))
+        yield {"name": name, "group": group, "attrs": channel_attrs, "configs": configs, "urls": urls}
+
+def iter_m3u_lines(records):
+    yield HEADER
+    for record in records:
+        attrs = ''.join(f' {key}="{value}"' for key, value in record["attrs"])
+        yield f'#EXTINF:-1{attrs} group-title="{record["group"]}",{record["name"]}'
+        yield from record["configs"]
+        yield from record["urls"]
+
+def iter_txt_lines(records):
+    """TXT 格式按分组输出（同一分组的频道连续出现），多个 URL 以 '#' 连接"""
+    by_group = {}
+    for record in records:
+        by_group.setdefault(record["group"], []).append(record)
+    for group, items in by_group.items():
+        yield f"{group},#genre#"
+        for record in items:
+            yield f"{record['name']},{'#'.join(record['urls'])}"
+
+def generate_playlist(output_path, channels, fmt='m3u', **options):
+    """生成播放列表文件，options 同 iter_channels"""
+    records = iter_channels(channels, **options)
+    lines = iter_txt_lines(records) if fmt == 'txt' else iter_m3u_lines(records)
+    with M3UWriter(output_path, compress=[], snapshot=False) as writer:
+        writer.write_lines(lines)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="生成确定性的合成 M3U/TXT 播放列表（用于基准测试）",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('-o', '--output', required=True, help="输出文件")
+    parser.add_argument('-n', '--channels', type=int, default=1000, help="频道数 (默认: 1000)")
+    parser.add_argument('-u', '--urls', default='1-3', help="每个频道的 URL 数，如 2 或 1-3 (默认: 1-3)")
+    parser.add_argument('-g', '--groups', type=int, default=20, help="分组数 (默认: 20)")
+    parser.add_argument('--attrs', default=DEFAULT_ATTRS, help=f"属性及出现比例 (默认: {DEFAULT_ATTRS})")
+    parser.add_argument('--config-ratio', type=float, default=0.05, help="带配置行的频道比例 (默认: 0.05)")
+    parser.add_argument('--dup-ratio', type=float, default=0.1, help="重复频道比例 (默认: 0.1)")
+    parser.add_argument('--hosts', type=int, default=50, help="URL 主机数 (默认: 50)")
+    parser.add_argument('--format', choices=('m3u', 'txt'), default='m3u', help="输出格式 (默认: m3u)")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="随机种子 (默认: 0)")
+    args = parser.parse_args()
+
+    try:
+        generate_playlist(args.output, args.channels, fmt=args.format, urls_per_channel=parse_range(args.urls),
+                          groups=args.groups, attrs=parse_attrs(args.attrs), config_ratio=args.config_ratio,
+                          dup_ratio=args.dup_ratio, hosts=max(1, args.hosts), seed=args.seed)
+    except (ValueError, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"已生成 {args.channels} 个频道 -> '{args.output}'", file=sys.stderr)
+
+if __name__ == "__main__":
+    run_main(main)
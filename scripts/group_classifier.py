@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+规则驱动的频道分组器
+将频道名、tvg-id、原分组、URL 主机和 URL 上的关键字/正则规则编译为
+每个字段一个关键字自动机（Aho-Corasick）加一个合并正则，
+一次求值即可得到频道的最终分组和排序位置。
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from collections import deque
+from urllib.parse import urlsplit
+
+from m3u_profile import run_main
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'group_rules.json')
+
+FIELDS = ('name', 'tvg-id', 'group', 'host', 'url')
+SORT_MODES = ('order', 'number', 'group')
+
+# 规则文件格式 (JSON):
+# {
+#   "rules": [
+#     {"id": "cctv", "field": "name", "keywords": ["CCTV"], "group": "央视", "rank": 0,
+#      "sort": "number", "number_regex": "CCTV-?(\\d+)"},
+#     {"id": "weishi", "field": "name", "keywords": ["卫视"], "group": "卫视", "rank": 1},
+#     {"id": "news", "field": "name", "regex": "新闻|资讯", "group": "新闻", "rank": 2}
+#   ],
+#   "default": {"rank": 9, "sort": "group"}
+# }
+# - field: 匹配字段 name / tvg-id / group（原分组）/ host（任一 URL 的主机）/ url（任一 URL）
+# - keywords: 子串关键字（不区分大小写），regex: 正则（区分大小写，可用 (?i:...)），二选一
+# - group: 命中后的分组；省略或为 null 时保留原分组
+# - rank: 输出时的分组块顺序，越小越靠前
+# - sort: 块内排序 order（原顺序）/ number（按 number_regex 提取的数字）/ group（按原分组名再按原顺序）
+# 多条规则命中时取规则文件中靠前的一条
+
+# --- 关键字自动机 ---
+class KeywordAutomaton:
+    """
+    Aho-Corasick 自动机：一次扫描文本，返回命中关键字中规则编号最小者
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+        self._built = False
+
+    def add(self, keyword, rule_index):
+        node = 0
+        for ch in keyword.casefold():
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = nxt
+        if self._best[node] is None or rule_index < self._best[node]:
+            self._best[node] = rule_index
+        self._built = False
+
+    def build(self):
+        """BFS 计算失败指针，并把后缀节点的命中合并到当前节点"""
+        queue = deque(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                inherited = self._best[self._fail[nxt]]
+                if inherited is not None and (self._best[nxt] is None or inherited < self._best[nxt]):
+                    self._best[nxt] = inherited
+                queue.append(nxt)
+        self._built = True
+
+    def search(self, text):
+        if not self._built:
+            self.build()
+        goto, fail, best_of = self._goto, self._fail, self._best
+        node = 0
+        best = None
+        for ch in text.casefold():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = best_of[node]
+            if hit is not None and (best is None or hit < best):
+                best = hit
+        return best
+
+    def __bool__(self):
+        return len(self._goto) > 1
+
+# --- 分组器 ---
+class GroupClassifier:
+    """
+    编译后的分组规则；classify 返回 (最终分组, 排序 Key)，并累计每条规则的命中次数
+    """
+
+    def __init__(self, rules, default=None):
+        self.rules = []
+        self._automata = {field: KeywordAutomaton() for field in FIELDS}
+        regex_parts = {field: [] for field in FIELDS}
+
+        for index, raw in enumerate(rules):
+            rule = self._parse_rule(raw, index)
+            self.rules.append(rule)
+            if rule["keywords"]:
+                for keyword in rule["keywords"]:
+                    self._automata[rule["field"]].add(keyword, index)
+            else:
+                # 每条正则包在从开头起的前瞻里，按规则顺序交替：第一个成立的分支即规则编号最小者
+                regex_parts[rule["field"]].append(f"(?=[\\s\\S]*?(?:{rule['regex']}))(?P<r{index}>)")
+
+        self._regex = {}
+        for field, parts in regex_parts.items():
+            if parts:
+                self._regex[field] = re.compile('|'.join(parts), re.MULTILINE)
+            if self._automata[field]:
+                self._automata[field].build()
+        self._fields = [field for field in FIELDS if self._automata[field] or field in self._regex]
+
+        default = default or {}
+        self.default = {
+            "id": "default",
+            "group": default.get("group"),
+            "rank": int(default.get("rank", len(self.rules))),
+            "sort": default.get("sort", "group"),
+            "number_regex": re.compile(default.get("number_regex", r'\d+')),
+        }
+        if self.default["sort"] not in SORT_MODES:
+            raise ValueError(f"default 的 sort 必须是 {', '.join(SORT_MODES)} 之一")
+        self.hit_counts = {rule["id"]: 0 for rule in self.rules}
+        self.hit_counts[self.default["id"]] = 0
+
+    @staticmethod
+    def _parse_rule(raw, index):
+        field = raw.get("field", "name")
+        if field not in FIELDS:
+            raise ValueError(f"第 {index + 1} 条规则的 field 必须是 {', '.join(FIELDS)} 之一")
+        keywords = raw.get("keywords") or []
+        if isinstance(keywords, str):
+            keywords = keywords.split(',')
+        keywords = [k.strip() for k in keywords if k and k.strip()]
+        regex = raw.get("regex")
+        if bool(keywords) == bool(regex):
+            raise ValueError(f"第 {index + 1} 条规则需要且只能指定 keywords 或 regex 之一")
+        if regex:
+            re.compile(regex)
+        sort_mode = raw.get("sort", "order")
+        if sort_mode not in SORT_MODES:
+            raise ValueError(f"第 {index + 1} 条规则的 sort 必须是 {', '.join(SORT_MODES)} 之一")
+        return {
+            "id": str(raw.get("id") or f"rules[{index}]"),
+            "field": field,
+            "keywords": keywords,
+            "regex": regex,
+            "group": raw.get("group"),
+            "rank": int(raw.get("rank", index)),
+            "sort": sort_mode,
+            "number_regex": re.compile(raw.get("number_regex", r'\d+')),
+        }
+
+    def match(self, fields):
+        """返回命中的规则（规则编号最小者），未命中返回 default"""
+        best = None
+        for field in self._fields:
+            text = fields.get(field) or ''
+            if not text:
+                continue
+            automaton = self._automata[field]
+            if automaton:
+                hit = automaton.search(text)
+                if hit is not None and (best is None or hit < best):
+                    best = hit
+            regex = self._regex.get(field)
+            if regex:
+                m = regex.match(text)
+                if m:
+                    hit = int(m.lastgroup[1:])
+                    if best is None or hit < best:
+                        best = hit
+        return self.rules[best] if best is not None else self.default
+
+    def classify(self, fields, original_group, order_idx):
+        """
+        :param fields: {"name", "tvg-id", "group", "host", "url"} 多个 URL/主机以换行分隔
+        :return: (最终分组, 排序 Key)
+        """
+        rule = self.match(fields)
+        self.hit_counts[rule["id"]] += 1
+
+        final_group = rule["group"] if rule["group"] else original_group
+        number = 0
+        group_key = ''
+        if rule["sort"] == "number":
+            m = rule["number_regex"].search(fields.get("name") or '')
+            number = int(m.group(1) if m.groups() else m.group(0)) if m else 999
+        elif rule["sort"] == "group":
+            group_key = original_group
+        return final_group, (rule["rank"], number, group_key, order_idx)
+
+def channel_fields(name, info, urls, original_group):
+    """从频道数据提取分组器使用的各字段"""
+    tvg_id = re.search(r'tvg-id="([^"]*)"', info)
+    hosts = []
+    for url in urls:
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            host = None
+        if host:
+            hosts.append(host)
+    return {
+        "name": name,
+        "tvg-id": tvg_id.group(1) if tvg_id else '',
+        "group": original_group,
+        "host": '\n'.join(hosts),
+        "url": '\n'.join(urls),
+    }
+
+def load_classifier(rules_path=None):
+    """加载分组规则，未指定时使用脚本目录下的 group_rules.json"""
+    with open(rules_path or DEFAULT_RULES_FILE, 'r', encoding='utf-8') as f:
+        raw = json.load(f)
+    return GroupClassifier(raw.get("rules", []), raw.get("default"))
+
+def format_hit_counts(classifier):
+    lines = []
+    for rule in classifier.rules + [classifier.default]:
+        target = rule["group"] or "(原分组)"
+        lines.append(f"{rule['id']} -> {target}: 命中 {classifier.hit_counts[rule['id']]} 次")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="频道分组规则测试：输出频道名对应的最终分组")
+    parser.add_argument('names', nargs='+', help='频道名')
+    parser.add_argument('-R', '--rules', help='分组规则 JSON（默认: group_rules.json）')
+    parser.add_argument('-g', '--group', default='', help='原分组名')
+    args = parser.parse_args()
+
+    try:
+        classifier = load_classifier(args.rules)
+    except Exception as e:
+        print(f"错误：无法加载分组规则: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for index, name in enumerate(args.names):
+        final_group, sort_key = classifier.classify(channel_fields(name, '', [], args.group), args.group, index)
+        print(f"{name}\t{final_group}\t{sort_key[0]}")
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+统一命令行入口
+    iptvtool <子命令> [参数...]       等同于 python scripts/<子命令>.py [参数...]
+    iptvtool -h                      列出子命令
+    iptvtool <子命令> -h             子命令帮助
+    iptvtool --server[=套接字] <子命令> [参数...]
+                                     交给常驻 worker（m3u_worker.py）执行；worker 未运行时在本进程内执行
+
+只导入被调用子命令的模块，子命令的重量级依赖（如 rdfinurl 的 requests）也只在实际用到时才加载，
+列出子命令不导入任何子命令模块。子命令名中的 '-' 等同于 '_'（m3u-merger 即 m3u_merger）。
+安装: pip install -e .（各脚本按 __file__ 查找同目录下的默认规则文件，需以可编辑方式安装）
+"""
+
+import sys
+
+# 子命令 -> (模块, 说明)
+COMMANDS = {
+    'add_channel': ('add_channel', "在指定频道前/后插入频道"),
+    'bench': ('bench', "脚本基准测试（耗时、峰值内存、导入耗时）"),
+    'bench_resolver': ('bench_resolver', "rdfinurl 解析器基准测试"),
+    'channel_alias': ('channel_alias', "频道别名解析"),
+    'deduplicate': ('deduplicate', "M3U 去重"),
+    'epg_index': ('epg_index', "XMLTV EPG 索引与 tvg-id 检查"),
+    'epg_trim': ('epg_trim', "按播放列表和时间窗口裁剪 EPG"),
+    'extract': ('extract', "按关键字提取或删除频道"),
+    'gen_playlist': ('gen_playlist', "生成合成测试播放列表"),
+    'group_classifier': ('group_classifier', "频道分组规则测试"),
+    'm3u_catalog': ('m3u_catalog', "M3U 频道目录 (SQLite)"),
+    'm3u_diff': ('m3u_diff', "M3U 语义差异"),
+    'm3u_header_tool': ('m3u_header_tool', "M3U 文件头处理"),
+    'm3u_merger': ('m3u_merger', "合并多个 M3U（多 URL 频道、分组优先排序）"),
+    'm3u_mergerng': ('m3u_mergerng', "单文件频道合并排序"),
+    'm3u_profile': ('m3u_profile', "汇总 --profile=sample 的折叠栈"),
+    'm3u_provenance': ('m3u_provenance', "查询合并结果的来源"),
+    'm3u_server': ('m3u_server', "本地播放列表服务及压测"),
+    'm3u_shard': ('m3u_shard', "按分组或频道数分片"),
+    'm3u_snapshot': ('m3u_snapshot', "生成或检查解析快照"),
+    'm3u_worker': ('m3u_worker', "常驻工作进程（配合 --server 使用）"),
+    'm3u_writer': ('m3u_writer', "为已有 M3U 生成压缩副本"),
+    'near_dup': ('near_dup', "近似重复频道报告"),
+    'rdfinurl': ('rdfinurl', "解析 URL 重定向"),
+    'rename_rules': ('rename_rules', "按规则文件批量重命名"),
+    'standin_server': ('standin_server', "本地上游替身服务器"),
+    'tvg_match': ('tvg_match', "按 EPG 补全 tvg-id"),
+    'txt2m3u': ('txt2m3u', "TXT 转 M3U"),
+    'url_canon': ('url_canon', "URL 规范化"),
+    'url_sorter': ('url_sorter', "复合条件重命名与 URL 排序"),
+    'url_sortergr': ('url_sortergr', "URL 排序与条件重命名（按分组）"),
+}
+
+def print_commands(file=sys.stdout):
+    print("用法: iptvtool [--server[=套接字]] <子命令> [参数...]\n\n子命令:", file=file)
+    width = max(len(name) for name in COMMANDS)
+    for name, (_, summary) in COMMANDS.items():
+        print(f"  {name:<{width}}  {summary}", file=file)
+    print("\n使用 'iptvtool <子命令> -h' 查看子命令帮助", file=file)
+
+def resolve_command(name):
+    """子命令名 -> 模块名，未知时返回 None"""
+    entry = COMMANDS.get(name.replace('-', '_'))
+    return entry[0] if entry else None
+
+def run_command(name, args):
+    """导入子命令模块并以 args 为参数运行其 main()"""
+    import importlib
+    from m3u_profile import run_main
+
+    module = importlib.import_module(resolve_command(name))
+    sys.argv = [f"iptvtool {name}"] + list(args)
+    return run_main(module.main)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    server = None
+    if argv and (argv[0] == '--server' or argv[0].startswith('--server=')):
+        server = argv[0].partition('=')[2]
+        argv = argv[1:]
+    if not argv or argv[0] in ('-h', '--help'):
+        print_commands(sys.stdout if argv else sys.stderr)
+        return 0 if argv else 2
+
+    name = argv[0]
+    if resolve_command(name) is None:
+        print(f"错误：未知的子命令 '{name}'\n", file=sys.stderr)
+        print_commands(sys.stderr)
+        return 2
+    if server is not None:
+        from m3u_worker import run_remote
+
+        code = run_remote(argv, server or None)
+        if code is not None:
+            return code
+    return run_command(name, argv[1:])
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+"""
+M3U 频道目录 (SQLite)
+把一个或多个播放列表批量导入带索引的 SQLite 库，之后按主机、分组、频道名等
+直接查询，无需再对文本做全量扫描；也可以把查询或视图的结果导出为 M3U。
+
+用法:
+    python m3u_catalog.py -d catalog.db import a.m3u b.m3u
+    python m3u_catalog.py -d catalog.db query --host hlszymgsplive.miguvideo.com
+    python m3u_catalog.py -d catalog.db query --groups
+    python m3u_catalog.py -d catalog.db query "SELECT name, url FROM v_urls WHERE domain = 'miguvideo.com'"
+    python m3u_catalog.py -d catalog.db view cctv "SELECT channel_id FROM v_channels WHERE name LIKE 'CCTV%'"
+    python m3u_catalog.py -d catalog.db export -o cctv.m3u --view cctv
+"""
+
+import argparse
+import ipaddress
+import os
+import re
+import sqlite3
+import sys
+import time
+from urllib.parse import urlsplit
+
+from m3u_snapshot import load_playlist
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id          INTEGER PRIMARY KEY,
+    path        TEXT NOT NULL UNIQUE,
+    sha256      TEXT NOT NULL,
+    header      TEXT,
+    imported_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS groups (
+    id   INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS channels (
+    id        INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources(id),
+    position  INTEGER NOT NULL,
+    line      INTEGER NOT NULL,
+    name      TEXT NOT NULL,
+    group_id  INTEGER REFERENCES groups(id),
+    tvg_id    TEXT,
+    extinf    TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    id         INTEGER PRIMARY KEY,
+    channel_id INTEGER NOT NULL REFERENCES channels(id),
+    position   INTEGER NOT NULL,
+    line       INTEGER NOT NULL,
+    url        TEXT NOT NULL,
+    host       TEXT,
+    domain     TEXT
+);
+CREATE TABLE IF NOT EXISTS configs (
+    channel_id INTEGER NOT NULL REFERENCES channels(id),
+    position   INTEGER NOT NULL,
+    line       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attributes (
+    channel_id INTEGER NOT NULL REFERENCES channels(id),
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_channels_source ON channels(source_id, position);
+CREATE INDEX IF NOT EXISTS idx_channels_name ON channels(name);
+CREATE INDEX IF NOT EXISTS idx_channels_group ON channels(group_id);
+CREATE INDEX IF NOT EXISTS idx_channels_tvg_id ON channels(tvg_id);
+CREATE INDEX IF NOT EXISTS idx_urls_channel ON urls(channel_id, position);
+CREATE INDEX IF NOT EXISTS idx_urls_url ON urls(url);
+CREATE INDEX IF NOT EXISTS idx_urls_host ON urls(host);
+CREATE INDEX IF NOT EXISTS idx_urls_domain ON urls(domain);
+CREATE INDEX IF NOT EXISTS idx_configs_channel ON configs(channel_id, position);
+CREATE INDEX IF NOT EXISTS idx_attributes_channel ON attributes(channel_id);
+CREATE INDEX IF NOT EXISTS idx_attributes_key_value ON attributes(key, value);
+
+CREATE VIEW IF NOT EXISTS v_channels AS
+    SELECT c.id AS channel_id, s.path AS source, c.position, c.line, c.name,
+           g.name AS group_title, c.tvg_id, c.extinf
+    FROM channels c
+    JOIN sources s ON s.id = c.source_id
+    LEFT JOIN groups g ON g.id = c.group_id;
+
+CREATE VIEW IF NOT EXISTS v_urls AS
+    SELECT u.id AS url_id, c.id AS channel_id, s.path AS source, c.name,
+           g.name AS group_title, u.url, u.host, u.domain, u.line
+    FROM urls u
+    JOIN channels c ON c.id = u.channel_id
+    JOIN sources s ON s.id = c.source_id
+    LEFT JOIN groups g ON g.id = c.group_id;
+
+CREATE VIEW IF NOT EXISTS v_groups AS
+    SELECT g.name AS group_title, s.path AS source, COUNT(*) AS channels
+    FROM channels c
+    JOIN groups g ON g.id = c.group_id
+    JOIN sources s ON s.id = c.source_id
+    GROUP BY g.id, s.id;
+
+CREATE VIEW IF NOT EXISTS v_hosts AS
+    SELECT host, domain, COUNT(*) AS urls, COUNT(DISTINCT channel_id) AS channels
+    FROM urls
+    GROUP BY host;
+"""
+
+_ATTRIBUTE_PATTERN = re.compile(r'([\w-]+)="([^"]*)"')
+_VIEW_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# --- 连接 ---
+def open_catalog(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=OFF')
+    conn.executescript(SCHEMA)
+    return conn
+
+def url_host(url):
+    """返回 (主机, 域名)；域名取主机的最后两级，如 miguvideo.com，IP 地址的域名即其本身"""
+    try:
+        host = (urlsplit(url).hostname or '').lower()
+    except ValueError:
+        host = ''
+    if not host:
+        return None, None
+    try:
+        ipaddress.ip_address(host)
+        return host, host
+    except ValueError:
+        pass
+    labels = host.split('.')
+    return host, '.'.join(labels[-2:]) if len(labels) >= 2 else host
+
+# --- 导入 ---
+def _next_id(conn, table):
+    return (conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]) + 1
+
+def _remove_source(conn, source_id):
+    channel_ids = 'SELECT id FROM channels WHERE source_id = ?'
+    conn.execute(f'DELETE FROM urls WHERE channel_id IN ({channel_ids})', (source_id,))
+    conn.execute(f'DELETE FROM configs WHERE channel_id IN ({channel_ids})', (source_id,))
+    conn.execute(f'DELETE FROM attributes WHERE channel_id IN ({channel_ids})', (source_id,))
+    conn.execute('DELETE FROM channels WHERE source_id = ?', (source_id,))
+
+def import_playlists(conn, paths):
+    """
+    在同一个事务中批量导入播放列表；已导入过的同路径来源先删除再导入
+    内容哈希未变的来源直接跳过
+
+    :return: [(路径, 频道数, URL 数, 是否跳过)]
+    """
+    results = []
+    with conn:
+        group_ids = dict(conn.execute('SELECT name, id FROM groups'))
+        next_group_id = _next_id(conn, 'groups')
+        next_channel_id = _next_id(conn, 'channels')
+        next_url_id = _next_id(conn, 'urls')
+
+        for path in paths:
+            playlist = load_playlist(path)
+            source_key = os.path.abspath(path)
+            digest = playlist.source_hash.hex()
+
+            row = conn.execute('SELECT id, sha256 FROM sources WHERE path = ?', (source_key,)).fetchone()
+            if row and row[1] == digest:
+                count = conn.execute('SELECT COUNT(*) FROM channels WHERE source_id = ?', (row[0],)).fetchone()[0]
+                results.append((path, count, None, True))
+                continue
+
+            header = next((line.strip() for line in playlist.header_lines() if line.strip().startswith('#EXTM3U')), None)
+            if row:
+                source_id = row[0]
+                _remove_source(conn, source_id)
+                conn.execute('UPDATE sources SET sha256 = ?, header = ?, imported_at = ? WHERE id = ?',
+                             (digest, header, time.time(), source_id))
+            else:
+                source_id = conn.execute('INSERT INTO sources (path, sha256, header, imported_at) VALUES (?, ?, ?, ?)',
+                                         (source_key, digest, header, time.time())).lastrowid
+
+            channel_rows = []
+            url_rows = []
+            config_rows = []
+            attribute_rows = []
+            new_groups = []
+            lines = playlist.lines
+
+            for index, start, end in playlist.channel_ranges():
+                group = playlist.groups[index]
+                group_id = None
+                if group:
+                    group_id = group_ids.get(group)
+                    if group_id is None:
+                        group_id = group_ids[group] = next_group_id
+                        next_group_id += 1
+                        new_groups.append((group_id, group))
+
+                extinf = lines[start].strip()
+                channel_id = next_channel_id
+                next_channel_id += 1
+                channel_rows.append((channel_id, source_id, index, start + 1, playlist.names[index],
+                                     group_id, playlist.tvg_ids[index] or None, extinf))
+                attribute_rows.extend((channel_id, key, value) for key, value in _ATTRIBUTE_PATTERN.findall(extinf))
+
+                url_position = 0
+                config_position = 0
+                for line_index in range(start + 1, end):
+                    line = lines[line_index].strip()
+                    if not line:
+                        continue
+                    if line.startswith('#'):
+                        config_rows.append((channel_id, config_position, line))
+                        config_position += 1
+                    else:
+                        host, domain = url_host(line)
+                        url_rows.append((next_url_id, channel_id, url_position, line_index + 1, line, host, domain))
+                        next_url_id += 1
+                        url_position += 1
+
+            conn.executemany('INSERT INTO groups (id, name) VALUES (?, ?)', new_groups)
+            conn.executemany('INSERT INTO channels (id, source_id, position, line, name, group_id, tvg_id, extinf) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', channel_rows)
+            conn.executemany('INSERT INTO urls (id, channel_id, position, line, url, host, domain) '
+                             'VALUES (?, ?, ?, ?, ?, ?, ?)', url_rows)
+            conn.executemany('INSERT INTO configs (channel_id, position, line) VALUES (?, ?, ?)', config_rows)
+            conn.executemany('INSERT INTO attributes (channel_id, key, value) VALUES (?, ?, ?)', attribute_rows)
+            results.append((path, len(channel_rows), len(url_rows), False))
+
+        # 清理已无频道引用的分组
+        conn.execute('DELETE FROM groups WHERE id NOT IN (SELECT DISTINCT group_id FROM channels WHERE group_id IS NOT NULL)')
+    return results
+
+# --- 导出 ---
+def export_m3u(conn, sql, output_path, params=(), header='#EXTM3U'):
+    """
+    将查询结果导出为 M3U
+    查询结果须包含 channel_id 列；若同时包含 url_id 列，则只导出这些 URL，否则导出频道的全部 URL
+    频道按查询结果中首次出现的顺序输出
+
+    :return: (频道数, URL 数)
+    """
+    cursor = conn.execute(sql, params)
+    columns = [d[0] for d in cursor.description]
+    if 'channel_id' not in columns:
+        raise ValueError("查询结果必须包含 channel_id 列")
+    channel_col = columns.index('channel_id')
+    url_col = columns.index('url_id') if 'url_id' in columns else None
+
+    order = []
+    selected_urls = {}
+    for row in cursor:
+        channel_id = row[channel_col]
+        if channel_id not in selected_urls:
+            order.append(channel_id)
+            selected_urls[channel_id] = [] if url_col is not None else None
+        if url_col is not None and row[url_col] is not None:
+            selected_urls[channel_id].append(row[url_col])
+
+    channel_count = 0
+    url_count = 0
+    with M3UWriter(output_path) as writer:
+        if header:
+            writer.write_line(header)
+        for channel_id in order:
+            extinf = conn.execute('SELECT extinf FROM channels WHERE id = ?', (channel_id,)).fetchone()
+            if not extinf:
+                continue
+            writer.write_line(extinf[0])
+            for (line,) in conn.execute('SELECT line FROM configs WHERE channel_id = ? ORDER BY position', (channel_id,)):
+                writer.write_line(line)
+            wanted = selected_urls[channel_id]
+            for url_id, url in conn.execute('SELECT id, url FROM urls WHERE channel_id = ? ORDER BY position', (channel_id,)):
+                if wanted is None or url_id in wanted:
+                    writer.write_line(url)
+                    url_count += 1
+            channel_count += 1
+    return channel_count, url_count
+
+def save_view(conn, name, sql):
+    """保存（或替换）命名视图，供 export --view 使用"""
+    if not _VIEW_NAME_PATTERN.match(name):
+        raise ValueError(f"视图名 '{name}' 不合法")
+    with conn:
+        conn.execute(f'DROP VIEW IF EXISTS "{name}"')
+        conn.execute(f'CREATE VIEW "{name}" AS {sql}')
+
+# --- 命令行 ---
+def _print_rows(cursor):
+    print('\t'.join(d[0] for d in cursor.description))
+    count = 0
+    for row in cursor:
+        print('\t'.join('' if v is None else str(v) for v in row))
+        count += 1
+    print(f"共 {count} 行", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="M3U 频道目录：导入 SQLite、按索引查询、按查询导出 M3U",
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('-d', '--db', required=True, help="SQLite 目录文件")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_import = sub.add_parser('import', help="导入一个或多个 M3U 文件")
+    p_import.add_argument('files', nargs='+')
+
+    p_query = sub.add_parser('query', help="查询：SQL 语句或快捷选项")
+    p_query.add_argument('sql', nargs='?', help="SQL 语句")
+    p_query.add_argument('--host', help="使用该主机的频道和 URL")
+    p_query.add_argument('--domain', help="使用该域名（如 miguvideo.com）的频道和 URL")
+    p_query.add_argument('--groups', action='store_true', help="各来源的分组及频道数")
+    p_query.add_argument('--hosts', action='store_true', help="各主机的 URL 数和频道数")
+    p_query.add_argument('--name', help="按频道名查询（精确匹配）")
+
+    p_view = sub.add_parser('view', help="保存命名视图")
+    p_view.add_argument('name')
+    p_view.add_argument('sql')
+
+    p_export = sub.add_parser('export', help="按 SQL 或视图导出 M3U（结果须含 channel_id 列）")
+    p_export.add_argument('-o', '--output', required=True)
+    source = p_export.add_mutually_exclusive_group(required=True)
+    source.add_argument('--sql')
+    source.add_argument('--view')
+    p_export.add_argument('--header', default='#EXTM3U', help="文件头 (默认: #EXTM3U)")
+
+    args = parser.parse_args()
+
+    try:
+        conn = open_catalog(args.db)
+    except sqlite3.Error as e:
+        print(f"错误：无法打开目录 '{args.db}': {e}", file=sys.stderr)
+        sys.exit(1)
+
+    try:
+        if args.command == 'import':
+            start = time.perf_counter()
+            for path, channels, urls, skipped in import_playlists(conn, args.files):
+                if skipped:
+                    print(f"未变化，跳过: {path} ({channels} 个频道)", file=sys.stderr)
+                else:
+                    print(f"已导入: {path} ({channels} 个频道, {urls} 个URL)", file=sys.stderr)
+            print(f"耗时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+        elif args.command == 'query':
+            if args.sql:
+                cursor = conn.execute(args.sql)
+            elif args.host:
+                cursor = conn.execute('SELECT source, group_title, name, url FROM v_urls WHERE host = ?', (args.host.lower(),))
+            elif args.domain:
+                cursor = conn.execute('SELECT source, group_title, name, url FROM v_urls WHERE domain = ?', (args.domain.lower(),))
+            elif args.name:
+                cursor = conn.execute('SELECT source, group_title, name, url FROM v_urls WHERE name = ?', (args.name,))
+            elif args.groups:
+                cursor = conn.execute('SELECT * FROM v_groups ORDER BY group_title, source')
+            elif args.hosts:
+                cursor = conn.execute('SELECT * FROM v_hosts ORDER BY urls DESC')
+            else:
+                parser.error("query 需要 SQL 语句或快捷选项")
+            _print_rows(cursor)
+
+        elif args.command == 'view':
+            save_view(conn, args.name, args.sql)
+            print(f"已保存视图: {args.name}", file=sys.stderr)
+
+        elif args.command == 'export':
+            if args.view:
+                if not _VIEW_NAME_PATTERN.match(args.view):
+                    parser.error(f"视图名 '{args.view}' 不合法")
+                sql = f'SELECT * FROM "{args.view}"'
+            else:
+                sql = args.sql
+            channels, urls = export_m3u(conn, sql, args.output, header=args.header)
+            print(f"已导出 {channels} 个频道, {urls} 个URL 到 '{args.output}'", file=sys.stderr)
+
+    except BrokenPipeError:
+        # 输出被管道截断（如 | head），不算错误
+        sys.stdout = open(os.devnull, 'w')
+    except (sqlite3.Error, ValueError, OSError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+M3U 语义差异
+按 (分组, 频道名) 和规范化 URL 建立哈希索引，比较新旧两个播放列表，
+报告新增/删除/变更的频道和 URL 以及 #EXTM3U 文件头属性（如 x-tvg-url）的变化。
+URL 顺序即播放优先级（url_sorter / --url-priority 只改顺序），频道内 URL 顺序、分组顺序和分组内频道顺序
+的变化都算语义变化；只有 URL 中的时间戳/签名等易变参数和配置行（#EXTVLCOPT 等）的顺序不算。
+
+退出码（同 diff）: 0 无语义变化，1 有变化，2 出错
+"""
+
+import argparse
+import re
+import sys
+
+from channel_alias import add_alias_argument, load_alias_index
+from m3u_snapshot import load_playlist, parse_playlist
+from url_canon import add_canon_argument, load_canonicalizer
+from m3u_profile import run_main
+
+_HEADER_ATTR_PATTERN = re.compile(r'([\w-]+)="([^"]*)"')
+# 值为逗号分隔地址列表的文件头属性，比较时忽略空白
+_HEADER_LIST_ATTRS = {'x-tvg-url', 'url-tvg'}
+
+def header_attributes(playlist):
+    """
+    规范化的文件头: { 属性名(小写): 值 }，#EXTM3U 以外的文件头行记为 { (行,): True }
+    没有 #EXTM3U 行时返回空字典
+    """
+    header = {}
+    for line in playlist.header_lines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.upper().startswith('#EXTM3U'):
+            for key, value in _HEADER_ATTR_PATTERN.findall(line):
+                key = key.lower()
+                if key in _HEADER_LIST_ATTRS:
+                    value = ','.join(part.strip() for part in value.split(',') if part.strip())
+                header[key] = value.strip()
+        else:
+            header[(line,)] = True
+    return header
+
+def index_playlist(playlist, key_func=None, url_key_func=None):
+    """
+    建立索引: { (分组, 频道Key): {"info": {EXTINF...}, "urls": {URL Key: URL}, "configs": {配置行...}} }
+    同 Key 的多个条目合并；索引和 "urls" 都按首次出现的顺序排列
+    """
+    index = {}
+    lines = playlist.lines
+    for channel, start, end in playlist.channel_ranges():
+        name = playlist.names[channel]
+        if key_func and name:
+            name = key_func(name)
+        entry = index.setdefault((playlist.groups[channel], name), {"info": set(), "urls": {}, "configs": set()})
+        entry["info"].add(lines[start].strip())
+        for line in lines[start + 1:end]:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('#'):
+                entry["configs"].add(line)
+            else:
+                entry["urls"][url_key_func(line) if url_key_func else line] = line
+    return index
+
+def diff_playlists(old_index, new_index, old_header=None, new_header=None):
+    """
+    :param old_header/new_header: header_attributes() 的结果，不给时不比较文件头
+    :return: {"added": [Key], "removed": [Key],
+              "changed": [(Key, 新增URL列表, 删除URL列表, info是否变化, 配置是否变化, URL顺序是否变化)],
+              "header": [(属性, 旧值, 新值)]（值为 None 表示不存在）,
+              "order": [(分组 或 None, 旧顺序, 新顺序)]}
+             "order" 记录两边都有的分组（分组为 None）或某分组内都有的频道的相对顺序变化
+    """
+    old_header = old_header or {}
+    new_header = new_header or {}
+    header = [(key, old_header.get(key), new_header.get(key))
+              for key in list(old_header) + [k for k in new_header if k not in old_header]
+              if old_header.get(key) != new_header.get(key)]
+    added = [key for key in new_index if key not in old_index]
+    removed = [key for key in old_index if key not in new_index]
+    changed = []
+    for key, new_entry in new_index.items():
+        old_entry = old_index.get(key)
+        if old_entry is None:
+            continue
+        old_urls = old_entry["urls"]
+        new_urls = new_entry["urls"]
+        urls_added = [new_urls[k] for k in new_urls if k not in old_urls]
+        urls_removed = [old_urls[k] for k in old_urls if k not in new_urls]
+        info_changed = old_entry["info"] != new_entry["info"]
+        configs_changed = old_entry["configs"] != new_entry["configs"]
+        order_changed = _common_order(old_urls, new_urls) != _common_order(new_urls, old_urls)
+        if urls_added or urls_removed or info_changed or configs_changed or order_changed:
+            changed.append((key, urls_added, urls_removed, info_changed, configs_changed, order_changed))
+    return {"added": added, "removed": removed, "changed": changed, "header": header,
+            "order": diff_order(old_index, new_index)}
+
+def _common_order(items, other):
+    """items 中同样出现在 other 里的元素，保持 items 的顺序"""
+    return [item for item in items if item in other]
+
+def _group_layout(index):
+    """{分组: [频道 Key]}，分组和频道都按首次出现的顺序"""
+    layout = {}
+    for key in index:
+        layout.setdefault(key[0], []).append(key)
+    return layout
+
+def diff_order(old_index, new_index):
+    """两边共有的分组的顺序、以及每个共有分组内共有频道的顺序是否变化"""
+    old_layout = _group_layout(old_index)
+    new_layout = _group_layout(new_index)
+    changes = []
+    old_groups = _common_order(old_layout, new_layout)
+    new_groups = _common_order(new_layout, old_layout)
+    if old_groups != new_groups:
+        changes.append((None, old_groups, new_groups))
+    for group in new_groups:
+        old_keys = _common_order(old_layout[group], set(new_layout[group]))
+        new_keys = _common_order(new_layout[group], set(old_layout[group]))
+        if old_keys != new_keys:
+            changes.append((group, [key[1] for key in old_keys], [key[1] for key in new_keys]))
+    return changes
+
+def has_changes(result):
+    return bool(result["added"] or result["removed"] or result["changed"]
+                or result.get("header") or result.get("order"))
+
+def format_diff(result, old_index, new_index):
+    def label(key):
+        group, name = key
+        return f"[{group}] {name}" if group else name
+
+    lines = []
+    for key, old_value, new_value in result.get("header", ()):
+        if isinstance(key, tuple):
+            lines.append(f"{'+' if old_value is None else '-'} 文件头 {key[0]}")
+        elif old_value is None:
+            lines.append(f"+ 文件头 {key}=\"{new_value}\"")
+        elif new_value is None:
+            lines.append(f"- 文件头 {key}=\"{old_value}\"")
+        else:
+            lines.append(f"~ 文件头 {key}: \"{old_value}\" -> \"{new_value}\"")
+    for key in result["added"]:
+        lines.append(f"+ {label(key)} ({len(new_index[key]['urls'])} 个URL)")
+    for key in result["removed"]:
+        lines.append(f"- {label(key)} ({len(old_index[key]['urls'])} 个URL)")
+    for group, old_order, new_order in result.get("order", ()):
+        if group is None:
+            lines.append(f"~ 分组顺序: {' / '.join(old_order)} -> {' / '.join(new_order)}")
+        else:
+            lines.append(f"~ [{group}] 频道顺序: {' / '.join(old_order)} -> {' / '.join(new_order)}")
+    for key, urls_added, urls_removed, info_changed, configs_changed, order_changed in result["changed"]:
+        notes = []
+        if info_changed:
+            notes.append("EXTINF 变化")
+        if configs_changed:
+            notes.append("配置行变化")
+        if order_changed:
+            notes.append("URL 顺序变化")
+        lines.append(f"~ {label(key)}" + (f" ({', '.join(notes)})" if notes else ""))
+        lines.extend(f"    + {url}" for url in urls_added)
+        lines.extend(f"    - {url}" for url in urls_removed)
+    return lines
+
+def read_git_revision(rev, path):
+    """读取文件在 git 某个版本中的内容；文件在该版本不存在时返回 None"""
+    import subprocess
+
+    proc = subprocess.run(['git', 'show', f'{rev}:./{path}'], capture_output=True)
+    if proc.returncode != 0:
+        return None
+    return proc.stdout.decode('utf-8')
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="M3U 语义差异：比较频道和URL的增删改、URL/频道/分组顺序和文件头，忽略易变URL参数\n"
+                    "退出码: 0 无语义变化，1 有变化，2 出错",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('files', nargs='+', metavar='FILE',
+                        help="旧文件 新文件；使用 --git-rev 时只给当前文件")
+    parser.add_argument('--git-rev', metavar='REV', help="与 git 中该版本的同一文件比较（如 HEAD）")
+    parser.add_argument('-q', '--quiet', action='store_true', help="不输出差异明细，只返回退出码")
+    add_alias_argument(parser)
+    add_canon_argument(parser)
+    args = parser.parse_args()
+
+    try:
+        key_func = load_alias_index(args.alias or None).resolve if args.alias is not None else None
+        url_key_func = load_canonicalizer(args.canon_urls or None).canonical if args.canon_urls is not None else None
+
+        if args.git_rev:
+            if len(args.files) != 1:
+                parser.error("使用 --git-rev 时只能指定一个文件")
+            new_path = args.files[0]
+            old_text = read_git_revision(args.git_rev, new_path)
+            if old_text is None:
+                if not args.quiet:
+                    print(f"'{new_path}' 在 {args.git_rev} 中不存在，视为新文件")
+                sys.exit(1)
+            old_playlist = parse_playlist(old_text)
+        else:
+            if len(args.files) != 2:
+                parser.error("需要指定 旧文件 新文件")
+            old_playlist = load_playlist(args.files[0])
+            new_path = args.files[1]
+        new_playlist = load_playlist(new_path)
+    except SystemExit:
+        raise
+    except Exception as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(2)
+
+    old_index = index_playlist(old_playlist, key_func, url_key_func)
+    new_index = index_playlist(new_playlist, key_func, url_key_func)
+    result = diff_playlists(old_index, new_index, header_attributes(old_playlist), header_attributes(new_playlist))
+
+    if not args.quiet:
+        for line in format_diff(result, old_index, new_index):
+            print(line)
+        print(f"新增 {len(result['added'])} 个频道，删除 {len(result['removed'])} 个频道，"
+              f"变更 {len(result['changed'])} 个频道"
+              + (f"，文件头 {len(result['header'])} 处变化" if result["header"] else "")
+              + (f"，顺序 {len(result['order'])} 处变化" if result["order"] else ""), file=sys.stderr)
+
+    sys.exit(1 if has_changes(result) else 0)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -8,75 +8,9 @@ import argparse
 import os
 import sys
 import re
-import tempfile
-import shutil
 
-def safe_write_output(content, input_path, output_path):
-    """
-    安全地写入输出文件，支持同文件覆盖
-    
-    :param content: 要写入的内容字符串
-    :param input_path: 输入文件路径
-    :param output_path: 输出文件路径
-    :return: (success, temp_path) 成功返回(True, None)，失败返回(False, temp_path)
-    """
-    # 获取绝对路径以判断是否为同一个文件
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
-    is_same_file = input_abs == output_abs
-    
-    temp_path = None
-    
-    try:
-        # 如果是同一个文件，先写到临时文件
-        if is_same_file:
-            # 在与输出文件相同目录创建临时文件
-            output_dir = os.path.dirname(output_path) or '.'
-            fd, temp_path = tempfile.mkstemp(
-                dir=output_dir,
-                suffix='.m3u',
-                prefix='.tmp_',
-                text=True
-            )
-            
-            # 使用文件描述符打开文件
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            # 直接打开输出文件
-            out_f = open(output_path, 'w', encoding='utf-8')
-        
-        # 写入数据
-        with out_f:
-            out_f.write(content)
-        
-        # 如果是同一个文件，进行原子替换
-        if is_same_file:
-            try:
-                # Python 3.3+ 推荐使用 os.replace 实现原子替换
-                os.replace(temp_path, output_path)
-                temp_path = None  # 替换成功，清除临时文件引用
-            except Exception as e:
-                # 如果 os.replace 失败，使用 shutil.move 作为备选
-                print(f"警告：原子替换失败，使用备选方案: {e}")
-                shutil.move(temp_path, output_path)
-                temp_path = None  # 移动成功，清除临时文件引用
-        
-        return True, None
-        
-    except Exception as e:
-        print(f"写入文件失败: {e}")
-        return False, temp_path
-
-def cleanup_temp_file(temp_path):
-    """
-    清理临时文件
-    """
-    if temp_path and os.path.exists(temp_path):
-        try:
-            os.unlink(temp_path)
-            print(f"已清理临时文件: {temp_path}")
-        except Exception as e:
-            print(f"警告：无法删除临时文件 {temp_path}: {e}")
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
 
 def validate_arguments(input_path, output_path=None):
     """
@@ -114,17 +48,16 @@ def validate_arguments(input_path, output_path=None):
     
     return True
 
-def process_m3u_header(file_content, replace_value=None, force_value=None, delete_extm3u=False):
+def process_m3u_header_lines(lines, replace_value=None, force_value=None, delete_extm3u=False):
     """
-    处理M3U文件内容
-    
-    :param file_content: 文件内容字符串
+    逐行处理M3U内容
+
+    :param lines: 行列表（不含换行符）
     :param replace_value: -e 参数的值，替换现有的非空x-tvg-url
     :param force_value: -E 参数的值，强制设置x-tvg-url
     :param delete_extm3u: -c 参数，删除#EXTM3U行
-    :return: 处理后的文件内容
+    :return: 处理后的行列表
     """
-    lines = file_content.splitlines()
     processed_lines = []
     
     # x-tvg-url 正则表达式
@@ -179,31 +112,45 @@ def process_m3u_header(file_content, replace_value=None, force_value=None, delet
         # 如果没有 #EXTM3U 行且没有删除它，添加默认的 #EXTM3U 行
         processed_lines.insert(0, '#EXTM3U')
     
-    return '\n'.join(processed_lines)
+    return processed_lines
+
+def split_header(f):
+    """
+    从二进制流中读出文件头（第一个 #EXTINF 之前的行），流停在第一个 #EXTINF 行之后
+
+    :return: (文件头行列表（已解码，不含换行符）, 第一个 #EXTINF 行的原始字节；没有频道时为 None)
+    """
+    header = []
+    for raw in iter(f.readline, b''):
+        if raw.lstrip().startswith(b'#EXTINF'):
+            return header, raw
+        header.append(raw.decode('utf-8').rstrip('\r\n'))
+    return header, None
 
 def process_single_file(input_file, output_file, replace_value, force_value, delete_extm3u):
     """
-    处理单个文件
+    处理单个文件：只解析和改写文件头，其余内容按大块原样复制，耗时与文件头大小相关而非文件大小
+    第一个 #EXTINF 之后的 #EXTM3U 行不做处理
     
     :return: 成功返回True，失败返回False
     """
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        processed_content = process_m3u_header(
-            content, 
-            replace_value=replace_value,
-            force_value=force_value,
-            delete_extm3u=delete_extm3u
-        )
-        
-        # 安全写入输出文件
-        success, temp_path = safe_write_output(processed_content, input_file, output_file)
-        
-        if not success:
-            cleanup_temp_file(temp_path)
-            return False
+        with open(input_file, 'rb') as f:
+            header, first_channel = split_header(f)
+            header = process_m3u_header_lines(
+                header,
+                replace_value=replace_value,
+                force_value=force_value,
+                delete_extm3u=delete_extm3u
+            )
+            
+            with M3UWriter(output_file) as writer:
+                if first_channel is None:
+                    writer.write('\n'.join(header))
+                else:
+                    writer.write_lines(header)
+                    writer.write_bytes(first_channel)
+                    writer.copy_from(f)
         
         return True
         
@@ -223,6 +170,9 @@ def main():
   # 单个文件输出到新文件
   python m3u_header.py -i input.m3u -o output.m3u -E "http://new-epg.com/epg.xml"
   
+  # 批量原地修改，8 个文件并发处理
+  python m3u_header.py -i *.m3u -E "http://epg.com/epg.xml" -j 8
+  
   # 强制设置x-tvg-url并删除#EXTM3U行（矛盾操作，会先删除再添加）
   python m3u_header.py -i playlist.m3u -E "http://epg.com/epg.xml" -c
         """
@@ -262,6 +212,13 @@ def main():
         help='强制覆盖输出文件（如果已存在且与输入不同）'
     )
     
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='多个文件原地修改时的并发数（默认: 1）'
+    )
+    
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -320,24 +277,28 @@ def main():
                 print(f"  失败")
     
     else:
-        # 多个文件原地修改模式
-        for input_file in args.input:
-            output_file = input_file  # 原地修改
-            
-            if not validate_arguments(input_file):
-                continue
-            
-            if args.verbose:
-                print(f"处理文件: {input_file}")
-            
-            if process_single_file(input_file, output_file, args.replace, args.force, args.clean):
-                success_count += 1
-                if args.verbose:
-                    print(f"  成功")
-            else:
-                failed_count += 1
+        # 多个文件原地修改模式，-j 大于 1 时并发处理
+        from concurrent.futures import ThreadPoolExecutor
+
+        input_files = [input_file for input_file in args.input if validate_arguments(input_file)]
+        
+        def process_in_place(input_file):
+            return process_single_file(input_file, input_file, args.replace, args.force, args.clean)
+        
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+            results = executor.map(process_in_place, input_files)
+            for input_file, ok in zip(input_files, results):
                 if args.verbose:
-                    print(f"  失败")
+                    print(f"处理文件: {input_file}")
+                
+                if ok:
+                    success_count += 1
+                    if args.verbose:
+                        print(f"  成功")
+                else:
+                    failed_count += 1
+                    if args.verbose:
+                        print(f"  失败")
     
     # 输出统计信息
     print(f"\n处理完成!")
@@ -364,4 +325,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
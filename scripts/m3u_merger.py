@@ -1,9 +1,18 @@
 import re
 import argparse
+import hashlib
+import json
 import sys
 import os
 import tempfile
-import shutil
+
+from channel_alias import DEFAULT_ALIAS_FILE, add_alias_argument, load_alias_index
+from m3u_provenance import ProvenanceWriter, default_provenance_path
+from m3u_snapshot import ParsedPlaylist, build_playlist, load_playlist, parse_playlist
+from m3u_writer import M3UWriter
+from near_dup import DEFAULT_THRESHOLD, find_near_duplicates
+from url_canon import add_canon_argument, load_canonicalizer
+from m3u_profile import run_main
 
 # --- 辅助函数：提取 Group-Title ---
 def extract_group_title(info_line):
@@ -13,19 +22,42 @@ def extract_group_title(info_line):
         return match.group(1).strip()
     return ""
 
+def extinf_name_and_group(extinf_fields, line_number, info_line):
+    """取 EXTINF 行的 (频道名, 分组)，优先使用解析模型中的结果"""
+    fields = extinf_fields.get(line_number)
+    if fields is not None:
+        return fields[0] or None, fields[1]
+    name_match = re.search(r',(.+)$', info_line)
+    return (name_match.group(1).strip() if name_match else None), extract_group_title(info_line)
+
 # --- 辅助函数：解析单个 M3U 内容 (支持多URL) ---
-def parse_single_m3u(m3u_content):
+def parse_single_m3u(m3u_content, key_func=None, url_key_func=None):
+    """
+    :param m3u_content: M3U 文本，或 load_playlist 得到的解析模型（频道名/分组直接取自模型）
+    :param key_func: 可选，将频道名映射为合并用的 Key（如别名索引的 resolve）
+    :param url_key_func: 可选，将 URL 映射为去重用的 Key（如 URL 规范化），同 Key 保留最后出现的 URL
+    """
     if not m3u_content:
         return [], {}, ""
+    
+    playlist = m3u_content if isinstance(m3u_content, ParsedPlaylist) else parse_playlist(m3u_content)
+    # EXTINF 行号 -> (频道名, 分组)
+    extinf_fields = {start + 1: (playlist.names[index], playlist.groups[index])
+                     for index, start in enumerate(playlist.channel_starts)}
         
-    lines = [line.strip() for line in m3u_content.strip().split('\n') if line.strip()]
+    # 保留原始行号（从 1 开始），供来源索引使用
+    numbered = [(n, line.strip()) for n, line in enumerate(playlist.lines, 1) if line.strip()]
+    lines = [line for _, line in numbered]
+    line_numbers = [n for n, _ in numbered]
     
-    # channels_map 结构: { ("频道名称", "Group-Title"): {"info": "#EXTINF...", "urls": set()} }
+    # channels_map 结构: { ("频道名称", "Group-Title"): {"info": "#EXTINF...", "urls": {URL Key: URL},
+    #                      "info_line": EXTINF 行号, "url_lines": {URL Key: 行号}} }
     channels_map = {}
     order_list = [] # 包含 ("频道名称", "Group-Title") 复合键
     header = ""
     
     current_info_line = None
+    current_info_lineno = 0
     current_channel_name = None
     current_group_title = None
     current_config_lines = []  # 存储配置行
@@ -48,20 +80,24 @@ def parse_single_m3u(m3u_content):
                 if channel_key not in channels_map:
                     channels_map[channel_key] = {
                         "info": current_info_line, 
-                        "urls": set(),
-                        "configs": list(current_config_lines)  # 保存配置行
+                        "urls": {},
+                        "configs": list(current_config_lines),  # 保存配置行
+                        "info_line": current_info_lineno,
+                        "url_lines": {}
                     }
                     order_list.append(channel_key)
                 else:
                     # 合并到已存在的频道
                     channels_map[channel_key]["info"] = current_info_line
+                    channels_map[channel_key]["info_line"] = current_info_lineno
                     channels_map[channel_key]["configs"].extend(current_config_lines)
             
             # 开始新频道
             current_info_line = line
-            name_match = re.search(r',(.+)$', line)
-            current_channel_name = name_match.group(1).strip() if name_match else None
-            current_group_title = extract_group_title(current_info_line)
+            current_info_lineno = line_numbers[i]
+            current_channel_name, current_group_title = extinf_name_and_group(extinf_fields, current_info_lineno, line)
+            if current_channel_name and key_func:
+                current_channel_name = key_func(current_channel_name)
             current_config_lines = []  # 重置配置行
             i += 1
             
@@ -78,11 +114,15 @@ def parse_single_m3u(m3u_content):
                     # 如果还没有创建频道实体，先创建
                     channels_map[channel_key] = {
                         "info": current_info_line, 
-                        "urls": set(),
-                        "configs": list(current_config_lines)
+                        "urls": {},
+                        "configs": list(current_config_lines),
+                        "info_line": current_info_lineno,
+                        "url_lines": {}
                     }
                     order_list.append(channel_key)
-                channels_map[channel_key]["urls"].add(line)
+                url_key = url_key_func(line) if url_key_func else line
+                channels_map[channel_key]["urls"][url_key] = line
+                channels_map[channel_key]["url_lines"][url_key] = line_numbers[i]
             i += 1
             
         else:
@@ -96,58 +136,306 @@ def parse_single_m3u(m3u_content):
         if channel_key not in channels_map:
             channels_map[channel_key] = {
                 "info": current_info_line, 
-                "urls": set(),
-                "configs": list(current_config_lines)
+                "urls": {},
+                "configs": list(current_config_lines),
+                "info_line": current_info_lineno,
+                "url_lines": {}
             }
             order_list.append(channel_key)
         else:
             channels_map[channel_key]["info"] = current_info_line
+            channels_map[channel_key]["info_line"] = current_info_lineno
             channels_map[channel_key]["configs"].extend(current_config_lines)
 
     return order_list, channels_map, header
 
-# --- 安全文件写入函数 ---
-def safe_write_output(content, input_files, output_path):
+# --- 合并状态：记录每个频道的贡献来源，支持按输入撤回/重新应用 ---
+# state 结构:
+# {
+#   "groups": { 组名: {"order_list": [频道Key...], "channels": { 频道Key: {"sources": { 输入: {"info", "urls", "configs", "info_line", "url_lines"} }}}} },
+#   "group_order": [组名...],
+#   "sources": { 输入: {"hash": 内容哈希, "header": "#EXTM3U...", "channels": [[组名, 频道Key]...]} },
+#   "input_order": [输入...],
+#   "output": 该状态对应的输出文件（绝对路径）
+# }
+# group_order / order_list 每次由 rebuild_merge_order 从各输入的 channels 重建
+STATE_VERSION = 2
+
+def new_merge_state(output=None):
+    return {"version": STATE_VERSION, "options": {}, "groups": {}, "group_order": [], "sources": {}, "input_order": [],
+            "output": output}
+
+def apply_source(state, source_id, order_list, channels_map):
     """
-    安全地写入输出文件，支持输入文件包含输出文件的情况
+    将一个输入的解析结果并入合并状态（频道的来源数据；输出顺序由 rebuild_merge_order 统一重建）
+
+    :return: 该输入贡献的 [[组名, 频道Key]...]，按分组出现顺序、组内按频道顺序排列
     """
-    # 检查输出文件是否在输入文件中
-    output_abs = os.path.abspath(output_path)
-    input_abs_list = [os.path.abspath(f) for f in input_files if os.path.exists(f)]
+    contributed = []
+    current_groups = {}
+    for channel_key in order_list:
+        _, group = channel_key
+        current_groups.setdefault(group, []).append((channel_key, channels_map[channel_key]))
+
+    for group_title, current_group_items in current_groups.items():
+        if group_title not in state["groups"]:
+            state["groups"][group_title] = {"channels": {}, "order_list": []}
+        group_channels = state["groups"][group_title]["channels"]
+
+        for channel_key, current_channel_data in current_group_items:
+            channel_name, _ = channel_key
+            if channel_name not in group_channels:
+                group_channels[channel_name] = {"sources": {}}
+            group_channels[channel_name]["sources"][source_id] = {
+                "info": current_channel_data["info"],
+                "urls": current_channel_data["urls"],
+                "configs": current_channel_data.get("configs", []),
+                "info_line": current_channel_data.get("info_line", 0),
+                "url_lines": current_channel_data.get("url_lines", {})
+            }
+            contributed.append([group_title, channel_name])
+
+    return contributed
+
+def retract_source(state, source_id):
+    """撤回一个输入此前的全部贡献，没有其他来源的频道和空分组随之删除"""
+    source = state["sources"].pop(source_id, None)
+    if not source:
+        return
+    
+    for group_title, channel_name in source["channels"]:
+        group_data = state["groups"].get(group_title)
+        if not group_data or channel_name not in group_data["channels"]:
+            continue
+        entry = group_data["channels"][channel_name]
+        entry["sources"].pop(source_id, None)
+        if not entry["sources"]:
+            del group_data["channels"][channel_name]
+            if not group_data["channels"]:
+                del state["groups"][group_title]
+
+def rebuild_merge_order(state):
+    """
+    按 input_order 依次重放各输入记录的 channels 列表，重建 group_order 和各分组的 order_list:
+    Group-Title 优先的相对插入排序 —— 新分组追加在末尾；分组内的新频道插在本输入中
+    上一个已知频道之后。只依赖各输入当前的内容和顺序，增量合并与全量合并的输出顺序因此完全一致
+    """
+    group_order = []
+    order_lists = {}
+    for source_id in state["input_order"]:
+        source = state["sources"].get(source_id)
+        if not source:
+            continue
+        current_group = None
+        last_known_channel_index = -1
+        for group_title, channel_name in source["channels"]:
+            order = order_lists.get(group_title)
+            if order is None:
+                order = order_lists[group_title] = []
+                group_order.append(group_title)
+            if group_title != current_group:
+                current_group = group_title
+                last_known_channel_index = -1
+            if channel_name in order:
+                last_known_channel_index = order.index(channel_name)
+            else:
+                last_known_channel_index += 1
+                order.insert(last_known_channel_index, channel_name)
+
+    state["group_order"] = [group for group in group_order if group in state["groups"]]
+    for group_title, group_data in state["groups"].items():
+        group_data["order_list"] = [name for name in order_lists.get(group_title, ())
+                                    if name in group_data["channels"]]
+
+def resolve_channel(entry, input_order):
+    """
+    按输入顺序合成频道: info 取最后一个来源，URL 按 Key 合并（后来者为准），配置行有序去重
+    url_sources 记录每个 URL Key 由哪些输入提供，用于按来源优先级排序
+    info_origin / url_origin 记录输出行实际取自的 (输入, 行号)，用于来源索引
+    """
+    info = None
+    info_origin = None
+    urls = {}
+    url_sources = {}
+    url_origin = {}
+    configs = []
+    for source_id in input_order:
+        contribution = entry["sources"].get(source_id)
+        if contribution is None:
+            continue
+        info = contribution["info"]
+        info_origin = (source_id, contribution.get("info_line", 0))
+        urls.update(contribution["urls"])
+        url_lines = contribution.get("url_lines", {})
+        for url_key in contribution["urls"]:
+            url_sources.setdefault(url_key, []).append(source_id)
+            url_origin[url_key] = (source_id, url_lines.get(url_key, 0))
+        for config in contribution["configs"]:
+            if config not in configs:
+                configs.append(config)
+    return {"info": info, "urls": urls, "url_sources": url_sources, "configs": configs,
+            "info_origin": info_origin, "url_origin": url_origin}
+
+def resolve_merge_state(state):
+    """将合并状态展开为 (final_channels_data, group_global_order, final_header)"""
+    rebuild_merge_order(state)
+    input_order = state["input_order"]
+    final_channels_data = {}
+    for group_title in state["group_order"]:
+        group_data = state["groups"][group_title]
+        final_channels_data[group_title] = {
+            "channels": {name: resolve_channel(group_data["channels"][name], input_order)
+                         for name in group_data["order_list"]},
+            "order_list": list(group_data["order_list"])
+        }
     
-    is_output_in_inputs = output_abs in input_abs_list
-    temp_path = None
+    final_header = ""
+    for source_id in input_order:
+        header = state["sources"].get(source_id, {}).get("header")
+        if header:
+            final_header = header
+            break
     
+    return final_channels_data, list(state["group_order"]), final_header
+
+def file_digest(path):
+    """文件内容的 SHA-256（分块读取）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_merge_state(state_path, options):
+    """
+    读取状态文件；不存在、版本或合并选项不一致时返回空状态（即全量重建），
+    选项不一致时空状态仍保留原状态的 "output"
+    """
+    if not state_path or not os.path.exists(state_path):
+        return new_merge_state(), False
     try:
-        if is_output_in_inputs:
-            output_dir = os.path.dirname(output_path) or '.'
-            fd, temp_path = tempfile.mkstemp(
-                dir=output_dir,
-                suffix='.m3u',
-                prefix='.tmp_',
-                text=True
-            )
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            out_f = open(output_path, 'w', encoding='utf-8')
+        with open(state_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except Exception as e:
+        print(f"警告: 无法读取状态文件 '{state_path}'，将全量合并: {e}", file=sys.stderr)
+        return new_merge_state(), False
+    if state.get("version") != STATE_VERSION or state.get("options") != options:
+        print(f"信息: 合并选项已变化，将全量合并", file=sys.stderr)
+        return new_merge_state(state.get("output")), False
+    return state, True
+
+def save_merge_state(state, state_path):
+    """原子写入状态文件"""
+    state_dir = os.path.dirname(os.path.abspath(state_path))
+    fd, temp_path = tempfile.mkstemp(dir=state_dir, suffix='.json', prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temp_path, state_path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+# --- URL 排序：按来源优先级和关键字优先级 ---
+def make_url_sort_key(priority_keywords=None, demote_keywords=None, source_priority=None):
+    """
+    生成频道内 URL 的排序 Key: (降级关键字, 来源优先级, 关键字优先级, URL)
+
+    - demote_keywords: 命中的 URL 排到后面，越靠前的关键字越靠后（同 url_sorter.py -r）
+    - source_priority: { 输入: 优先级 }，数值越小越靠前；URL 由多个输入提供时取最优者
+    - priority_keywords: 命中的 URL 排到前面，越靠前的关键字越靠前（同 url_sorter.py -k）
+    都未指定时等价于按 URL 字母序排序
+    """
+    priority_keywords = priority_keywords or []
+    demote_keywords = demote_keywords or []
+    source_priority = source_priority or {}
+
+    def keyword_rank(url, keywords, unmatched):
+        for index, keyword in enumerate(keywords):
+            if keyword in url:
+                return index
+        return unmatched
+
+    def sort_key(url, sources):
+        demote_rank = keyword_rank(url, demote_keywords, -1) + 1
+        source_rank = min((source_priority.get(s, 0) for s in sources), default=0)
+        return (demote_rank, source_rank, keyword_rank(url, priority_keywords, len(priority_keywords)), url)
+
+    return sort_key
+
+def ordered_channel_urls(data, sort_key):
+    """按排序 Key 输出频道的 [(URL Key, URL)...]"""
+    url_sources = data.get("url_sources", {})
+    items = [(sort_key(url, url_sources.get(url_key, ())), url_key, url) for url_key, url in data["urls"].items()]
+    items.sort()
+    return [(url_key, url) for _, url_key, url in items]
+
+def split_keywords(keywords_str):
+    return [k.strip() for k in keywords_str.split(',') if k.strip()] if keywords_str else []
+
+# --- 近似重复频道：报告或合并 ---
+def merge_near_duplicates(final_channels_data, group_global_order, threshold, merge=False):
+    """
+    在每个分组内查找命名不一致的同一频道（见 near_dup.py）
+
+    :param merge: True 时将成员频道的 URL 和配置行并入代表频道，并删除成员
+    :return: [(分组, 代表名, 成员名, 相似度)]
+    """
+    report = []
+    for group_title in group_global_order:
+        group_data = final_channels_data[group_title]
+        order = group_data["order_list"]
+        channels = group_data["channels"]
         
-        with out_f:
-            out_f.write(content)
+        names = []
+        for key in order:
+            name_match = re.search(r',(.+)$', channels[key]["info"])
+            names.append(name_match.group(1).strip() if name_match else key)
         
-        if is_output_in_inputs:
-            try:
-                os.replace(temp_path, output_path)
-                temp_path = None
-            except Exception as e:
-                print(f"警告：原子替换失败，使用备选方案: {e}")
-                shutil.move(temp_path, output_path)
-                temp_path = None
+        pairs = find_near_duplicates(names, threshold)
+        if not pairs:
+            continue
+        
+        removed = set()
+        for root, member, score in pairs:
+            report.append((group_title, names[root], names[member], score))
+            if merge:
+                target = channels[order[root]]
+                source = channels[order[member]]
+                target["urls"].update(source["urls"])
+                target.setdefault("url_origin", {}).update(source.get("url_origin", {}))
+                for url_key, url_sources in source.get("url_sources", {}).items():
+                    merged = target.setdefault("url_sources", {}).setdefault(url_key, [])
+                    merged.extend(s for s in url_sources if s not in merged)
+                target["configs"] = target["configs"] + [c for c in source["configs"] if c not in target["configs"]]
+                removed.add(order[member])
         
+        if removed:
+            for key in removed:
+                del channels[key]
+            group_data["order_list"] = [key for key in order if key not in removed]
+    
+    return report
+
+# --- 安全文件写入函数 ---
+def safe_write_output(lines, input_files, output_path, channel_starts=None):
+    """
+    安全地写入输出文件，支持输入文件包含输出文件的情况
+    行之间以换行分隔，末行不追加换行；
+    给出 channel_starts（#EXTINF 行下标）且启用快照时，直接用已有的行保存解析快照
+    """
+    try:
+        with M3UWriter(output_path) as writer:
+            for index, line in enumerate(lines):
+                writer.write(line if index == 0 else '\n' + line)
+        if channel_starts is not None and writer.snapshot:
+            writer.save_snapshot(build_playlist(list(lines) or [''], False, channel_starts))
         return True, None
         
     except Exception as e:
         print(f"写入文件失败: {e}")
-        return False, temp_path
+        return False, None
 
 # --- 验证参数函数 ---
 def validate_arguments(input_files, output_path):
@@ -202,6 +490,27 @@ def main():
                        help="强制操作，即使输出文件已存在且不是输入文件")
     parser.add_argument('--no-config', action='store_true',
                        help="不保留配置行（如#EXTVLCOPT）")
+    add_alias_argument(parser)
+    add_canon_argument(parser)
+    parser.add_argument('--fuzzy-report', action='store_true',
+                       help="报告分组内的近似重复频道（如 凤凰卫视中文台 / 凤凰中文）")
+    parser.add_argument('--fuzzy-merge', action='store_true',
+                       help="自动合并分组内的近似重复频道")
+    parser.add_argument('--fuzzy-threshold', type=float, default=DEFAULT_THRESHOLD,
+                       help=f"近似重复相似度阈值 (默认: {DEFAULT_THRESHOLD})")
+    parser.add_argument('--source-priority', type=int, nargs='+', metavar='N',
+                       help="每个输入的URL优先级（与 -i 一一对应，数值越小越靠前）")
+    parser.add_argument('--url-priority', metavar='KEYWORDS',
+                       help="包含这些关键字的URL排到前面，逗号分隔，越靠前越优先\n"
+                            "例如: \"catvod,luuc,miguvideo\"")
+    parser.add_argument('--url-demote', metavar='KEYWORDS',
+                       help="包含这些关键字的URL排到后面，逗号分隔\n"
+                            "例如: \"CCTV-\"")
+    parser.add_argument('--provenance', nargs='?', const='', default=None, metavar='FILE',
+                       help="写入来源索引（默认为 输出文件.prov），记录每个输出行取自哪个输入的哪一行")
+    parser.add_argument('--incremental', nargs='?', const='', default=None, metavar='STATE',
+                       help="增量合并：保存合并状态（默认为 输出文件.state.json），\n"
+                            "再次运行时只重新解析内容有变化的输入")
     
     args = parser.parse_args()
     
@@ -212,93 +521,126 @@ def main():
     if not validate_arguments(args.input, args.output):
         sys.exit(1)
     
+    if args.source_priority and len(args.source_priority) != len(args.input):
+        print(f"错误: --source-priority 需要 {len(args.input)} 个值（与输入文件一一对应）", file=sys.stderr)
+        sys.exit(1)
+    
+    key_func = None
+    if args.alias is not None:
+        try:
+            key_func = load_alias_index(args.alias or None).resolve
+        except Exception as e:
+            print(f"错误: 无法加载别名表: {e}", file=sys.stderr)
+            sys.exit(1)
+    
+    url_key_func = None
+    if args.canon_urls is not None:
+        try:
+            url_key_func = load_canonicalizer(args.canon_urls or None).canonical
+        except Exception as e:
+            print(f"错误: 无法加载URL规范化规则: {e}", file=sys.stderr)
+            sys.exit(1)
+    
+    # 合并选项影响解析结果，选项（含规则文件内容）变化时增量状态作废
+    options = {"alias": args.alias, "canon_urls": args.canon_urls}
+    for option_name in ("alias", "canon_urls"):
+        option_path = getattr(args, option_name)
+        if option_name == "alias" and option_path == "":
+            option_path = DEFAULT_ALIAS_FILE
+        if option_path and os.path.exists(option_path):
+            options[option_name + "_hash"] = file_digest(option_path)
+    
+    state_path = None
+    if args.incremental is not None:
+        state_path = args.incremental or args.output + '.state.json'
+    state, resumed = load_merge_state(state_path, options)
+    state["options"] = options
+    
     output_abs = os.path.abspath(args.output)
     input_abs_list = [os.path.abspath(f) for f in args.input if os.path.exists(f)]
     
-    if os.path.exists(args.output) and output_abs not in input_abs_list:
+    # 输出文件是增量状态自己的目标时（上次 --incremental 写出的），不需要 --force
+    if os.path.exists(args.output) and output_abs not in input_abs_list and state.get("output") != output_abs:
         if not args.force:
             print(f"错误: 输出文件 '{args.output}' 已存在且不是输入文件", file=sys.stderr)
             print("      使用 --force 参数强制覆盖，或指定不同的输出文件", file=sys.stderr)
             sys.exit(1)
-    
-    final_channels_data = {}
-    group_global_order = [] 
-    final_header = ""
+    state["output"] = output_abs
     
     valid_input_files = []
     for input_file in args.input:
         if not os.path.exists(input_file):
             print(f"警告: 输入文件 '{input_file}' 不存在。跳过。", file=sys.stderr)
             continue
-            
         valid_input_files.append(input_file)
-        
+    
+    # 来源以绝对路径标识，重复给出的输入只处理一次
+    sources = {}
+    for input_file in valid_input_files:
+        sources.setdefault(os.path.abspath(input_file), input_file)
+    input_order = list(sources)
+    
+    source_priority = {}
+    if args.source_priority:
+        for input_file, priority in zip(args.input, args.source_priority):
+            source_priority.setdefault(os.path.abspath(input_file), priority)
+    url_sort_key = make_url_sort_key(split_keywords(args.url_priority), split_keywords(args.url_demote), source_priority)
+    
+    # 撤回已不在输入列表中的来源
+    for source_id in list(state["sources"]):
+        if source_id not in input_order:
+            retract_source(state, source_id)
+    
+    reparsed_count = 0
+    for source_id, input_file in sources.items():
         try:
-            with open(input_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            current_order_list, current_map, header = parse_single_m3u(content)
-            
-            if not final_header and header:
-                final_header = header
+            content_hash = file_digest(input_file) if state_path else None
+            previous = state["sources"].get(source_id)
+            if previous and content_hash and previous["hash"] == content_hash:
+                continue
             
-            current_groups = {}
-            for channel_key in current_order_list:
-                _, group = channel_key
-                data = current_map[channel_key]
-                
-                if group not in current_groups:
-                    current_groups[group] = []
-                current_groups[group].append((channel_key, data)) 
-
-            for group_title, current_group_items in current_groups.items():
-                if group_title not in final_channels_data:
-                    final_channels_data[group_title] = {"channels": {}, "order_list": []}
-                    group_global_order.append(group_title)
-                
-                final_group_data = final_channels_data[group_title]
-                final_group_channels = final_group_data["channels"]
-                final_group_order = final_group_data["order_list"]
+            # 有有效快照时直接加载解析模型
+            playlist = load_playlist(input_file)
                 
-                last_known_channel_index = -1
-
-                for channel_key, current_channel_data in current_group_items:
-                    channel_name, _ = channel_key
-                    
-                    if channel_name in final_group_channels:
-                        # 合并：更新info，合并URL和配置行
-                        final_group_channels[channel_name]["info"] = current_channel_data["info"]
-                        final_group_channels[channel_name]["urls"].update(current_channel_data["urls"])
-                        
-                        # 合并配置行（去重）
-                        existing_configs = final_group_channels[channel_name].get("configs", [])
-                        new_configs = current_channel_data.get("configs", [])
-                        all_configs = list(set(existing_configs + new_configs))
-                        final_group_channels[channel_name]["configs"] = all_configs
-                        
-                        try:
-                            last_known_channel_index = final_group_order.index(channel_name)
-                        except ValueError:
-                            pass
-                            
-                    else:
-                        # 新频道：添加
-                        final_group_channels[channel_name] = {
-                            "info": current_channel_data["info"], 
-                            "urls": current_channel_data["urls"],
-                            "configs": current_channel_data.get("configs", [])
-                        }
-                        
-                        insert_index = last_known_channel_index + 1
-                        final_group_order.insert(insert_index, channel_name)
-                        last_known_channel_index = insert_index
+            current_order_list, current_map, header = parse_single_m3u(playlist, key_func, url_key_func)
+            
+            # 先撤回旧贡献，再应用新内容
+            retract_source(state, source_id)
+            contributed = apply_source(state, source_id, current_order_list, current_map)
+            state["sources"][source_id] = {"hash": content_hash, "header": header, "channels": contributed}
+            reparsed_count += 1
                         
         except Exception as e:
             print(f"处理文件 '{input_file}' 时发生错误: {e}", file=sys.stderr)
             sys.exit(1)
+    
+    state["input_order"] = input_order
+    final_channels_data, group_global_order, final_header = resolve_merge_state(state)
 
+    # 近似重复频道
+    fuzzy_report = []
+    if args.fuzzy_report or args.fuzzy_merge:
+        fuzzy_report = merge_near_duplicates(
+            final_channels_data, group_global_order, args.fuzzy_threshold, merge=args.fuzzy_merge
+        )
+        if args.fuzzy_report:
+            for group_title, root_name, member_name, score in fuzzy_report:
+                print(f"近似重复 [{group_title}] {root_name} <= {member_name} ({score:.2f})", file=sys.stderr)
+    
     # 生成最终内容
     output_lines = [final_header] if final_header else []
+    channel_starts = []
+    
+    # 来源索引与 output_lines 逐行对应
+    provenance = None
+    if args.provenance is not None:
+        provenance = ProvenanceWriter()
+        for _ in output_lines:
+            provenance.add(None)
+    
+    def origin_of(origin):
+        # 状态中的来源为绝对路径，索引中记录命令行给出的路径
+        return (sources.get(origin[0], origin[0]), origin[1]) if origin else None
     
     for group_title in group_global_order:
         if group_title in final_channels_data:
@@ -308,21 +650,27 @@ def main():
                 if name in group_data["channels"]:
                     data = group_data["channels"][name]
                     
+                    channel_starts.append(len(output_lines))
                     output_lines.append(data["info"])
+                    if provenance:
+                        provenance.add(origin_of(data.get("info_origin")))
                     
                     # 写入配置行（如果启用）
                     if not args.no_config and data.get("configs"):
                         for config in data["configs"]:
                             output_lines.append(config)
+                            if provenance:
+                                provenance.add(None)
                     
-                    # 写入URL行（排序后）
-                    for url in sorted(list(data["urls"])):
+                    # 写入URL行（按优先级排序）
+                    url_origin = data.get("url_origin", {})
+                    for url_key, url in ordered_channel_urls(data, url_sort_key):
                         output_lines.append(url)
+                        if provenance:
+                            provenance.add(origin_of(url_origin.get(url_key)), url=url)
                 
-    modified_m3u = '\n'.join(output_lines)
-
     # 安全写入
-    success, temp_path = safe_write_output(modified_m3u, valid_input_files, args.output)
+    success, temp_path = safe_write_output(output_lines, valid_input_files, args.output, channel_starts)
     
     if not success:
         if temp_path and os.path.exists(temp_path):
@@ -333,6 +681,21 @@ def main():
         print("处理失败！", file=sys.stderr)
         sys.exit(1)
     
+    provenance_path = None
+    if provenance:
+        provenance_path = args.provenance or default_provenance_path(args.output)
+        try:
+            provenance.save(provenance_path)
+        except Exception as e:
+            print(f"警告: 无法写入来源索引 '{provenance_path}': {e}", file=sys.stderr)
+            provenance_path = None
+    
+    if state_path:
+        try:
+            save_merge_state(state, state_path)
+        except Exception as e:
+            print(f"警告: 无法保存合并状态 '{state_path}': {e}", file=sys.stderr)
+    
     # 统计信息
     total_channels = 0
     total_groups = len(group_global_order)
@@ -354,6 +717,16 @@ def main():
     if args.no_config:
         print(f"      已过滤所有配置行", file=sys.stderr)
     
+    if key_func:
+        print(f"      已按频道别名索引归并同名频道", file=sys.stderr)
+    
+    if url_key_func:
+        print(f"      已按规范化URL去重（忽略易变参数）", file=sys.stderr)
+    
+    if fuzzy_report:
+        action = "已合并" if args.fuzzy_merge else "发现"
+        print(f"      {action} {len(fuzzy_report)} 个近似重复频道", file=sys.stderr)
+    
     # 显示多URL频道统计
     multi_url_channels = 0
     for group_title in group_global_order:
@@ -370,8 +743,15 @@ def main():
     
     print(f"      结果已写入 '{args.output}'", file=sys.stderr)
     
+    if provenance_path:
+        print(f"      来源索引已写入 '{provenance_path}'（查询: m3u_provenance.py -m {args.output}）", file=sys.stderr)
+    
+    if state_path:
+        mode = "增量" if resumed else "全量"
+        print(f"      {mode}合并：重新解析 {reparsed_count}/{len(input_order)} 个输入，状态已保存到 '{state_path}'", file=sys.stderr)
+    
     if output_abs in [os.path.abspath(f) for f in valid_input_files]:
         print(f"注意: 已安全覆盖输入文件 '{args.output}'", file=sys.stderr)
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
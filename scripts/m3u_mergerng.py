@@ -2,8 +2,12 @@ import re
 import argparse
 import os
 import sys
-import tempfile
-import shutil
+
+from channel_alias import add_alias_argument, load_alias_index
+from group_classifier import channel_fields, format_hit_counts, load_classifier
+from m3u_snapshot import load_playlist
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
 
 #频道组‘混乱’的m3u专用脚本，如将CCTV各频道按照体育、新闻、影视等分在了不同频道组
 # --- 1. 辅助函数：提取归一化 Key ---
@@ -20,14 +24,10 @@ def is_preferred(name):
     """判断名字是否含有横杠或'台'"""
     return '-' in name or name.endswith('台')
 
-# --- 3. 辅助函数：提取 CCTV 数字 ---
-def extract_cctv_num(name):
-    """提取 CCTV 后的数字，用于排序。如果没有数字则排在最后。"""
-    match = re.search(r'(?i)CCTV-?(\d+)', name)
-    return int(match.group(1)) if match else 999
-
-# --- 4. 辅助函数：解析 M3U (支持多URL) ---
-def parse_m3u(file_path):
+# --- 3. 辅助函数：解析 M3U (支持多URL) ---
+def parse_m3u(file_path, key_func=None):
+    """key_func: 可选，替代 get_norm_key 的频道归一化函数（如别名索引的 resolve）"""
+    key_func = key_func or get_norm_key
     if not os.path.exists(file_path):
         return None, [], []
         
@@ -35,8 +35,7 @@ def parse_m3u(file_path):
     order = []    # 记录第一次发现该频道的顺序
     header = "#EXTM3U"
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        lines = [line.strip() for line in f.readlines()]
+    lines = [line.strip() for line in load_playlist(file_path).lines]
         
     current_info = None
     current_name = None
@@ -55,7 +54,7 @@ def parse_m3u(file_path):
         if line.startswith('#EXTINF:'):
             # 如果之前有频道数据，先保存
             if current_info and current_name:
-                norm_key = get_norm_key(current_name)
+                norm_key = key_func(current_name)
                 
                 # 提取原有的 group-title
                 group_match = re.search(r'group-title="([^"]*)"', current_info)
@@ -106,7 +105,7 @@ def parse_m3u(file_path):
     
     # 处理最后一个频道
     if current_info and current_name:
-        norm_key = get_norm_key(current_name)
+        norm_key = key_func(current_name)
         
         group_match = re.search(r'group-title="([^"]*)"', current_info)
         original_group = group_match.group(1) if group_match else "其他"
@@ -131,7 +130,7 @@ def parse_m3u(file_path):
                     
     return header, channels, order
 
-# --- 5. 安全文件写入函数 ---
+# --- 4. 安全文件写入函数 ---
 def safe_write_output(header, final_list, input_path, output_path, no_config=False):
     """
     安全地写入输出文件，支持同文件覆盖
@@ -143,34 +142,9 @@ def safe_write_output(header, final_list, input_path, output_path, no_config=Fal
     :param no_config: 是否过滤配置行
     :return: (success, temp_path) 成功返回(True, None)，失败返回(False, temp_path)
     """
-    # 获取绝对路径以判断是否为同一个文件
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
-    is_same_file = input_abs == output_abs
-    
-    temp_path = None
-    
     try:
-        # 如果是同一个文件，先写到临时文件
-        if is_same_file:
-            # 在与输出文件相同目录创建临时文件
-            output_dir = os.path.dirname(output_path) or '.'
-            fd, temp_path = tempfile.mkstemp(
-                dir=output_dir,
-                suffix='.m3u',
-                prefix='.tmp_',
-                text=True
-            )
-            
-            # 使用文件描述符打开文件
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            # 直接打开输出文件
-            out_f = open(output_path, 'w', encoding='utf-8')
-        
-        # 写入数据
-        with out_f:
-            out_f.write(header + '\n')
+        with M3UWriter(output_path) as writer:
+            writer.write_line(header)
             for item in final_list:
                 # 替换或更新 info 行中的 group-title
                 info = item["info"]
@@ -180,36 +154,22 @@ def safe_write_output(header, final_list, input_path, output_path, no_config=Fal
                 else:
                     info = info.replace('#EXTINF:', f'#EXTINF: group-title="{new_group}",')
                 
-                out_f.write(info + '\n')
+                writer.write_line(info)
                 
                 # 写入配置行（如果不过滤）
                 if not no_config and item.get("configs"):
-                    for config_line in item["configs"]:
-                        out_f.write(config_line + '\n')
+                    writer.write_lines(item["configs"])
                 
                 # 写入 URL 行 (排序后，保持稳定)
-                for url in sorted(list(item["urls"])):
-                    out_f.write(url + '\n')
-        
-        # 如果是同一个文件，进行原子替换
-        if is_same_file:
-            try:
-                # Python 3.3+ 推荐使用 os.replace 实现原子替换
-                os.replace(temp_path, output_path)
-                temp_path = None  # 替换成功，清除临时文件引用
-            except Exception as e:
-                # 如果 os.replace 失败，使用 shutil.move 作为备选
-                print(f"警告：原子替换失败，使用备选方案: {e}", file=sys.stderr)
-                shutil.move(temp_path, output_path)
-                temp_path = None  # 移动成功，清除临时文件引用
+                writer.write_lines(sorted(list(item["urls"])))
         
         return True, None
         
     except Exception as e:
         print(f"写入文件失败: {e}", file=sys.stderr)
-        return False, temp_path
+        return False, None
 
-# --- 6. 验证参数函数 ---
+# --- 5. 验证参数函数 ---
 def validate_arguments(input_path, output_path):
     """
     验证命令行参数的合理性
@@ -252,7 +212,7 @@ def validate_arguments(input_path, output_path):
     
     return True
 
-# --- 7. 清理临时文件函数 ---
+# --- 6. 清理临时文件函数 ---
 def cleanup_temp_file(temp_path):
     """
     清理临时文件
@@ -264,7 +224,7 @@ def cleanup_temp_file(temp_path):
         except Exception as e:
             print(f"警告：无法删除临时文件 {temp_path}: {e}", file=sys.stderr)
 
-# --- 8. 主逻辑 ---
+# --- 7. 主逻辑 ---
 def main():
     parser = argparse.ArgumentParser(
         description="单文件M3U频道合并排序脚本 - 支持多URL频道，安全处理同文件覆盖",
@@ -280,6 +240,9 @@ def main():
                        help='保持URL原始顺序（不排序）')
     parser.add_argument('--stats', action='store_true',
                        help='显示详细统计信息')
+    parser.add_argument('-R', '--rules',
+                       help='分组规则 JSON（默认: group_rules.json，即 央视/卫视/其他 三类）')
+    add_alias_argument(parser)
     
     args = parser.parse_args()
 
@@ -298,7 +261,12 @@ def main():
             sys.exit(1)
     
     # 解析M3U文件
-    result = parse_m3u(args.input)
+    try:
+        key_func = load_alias_index(args.alias or None).resolve if args.alias is not None else None
+    except Exception as e:
+        print(f"错误：无法加载别名表: {e}", file=sys.stderr)
+        sys.exit(1)
+    result = parse_m3u(args.input, key_func)
     if result[0] is None:
         print("未发现有效频道数据。", file=sys.stderr)
         sys.exit(1)
@@ -309,20 +277,18 @@ def main():
         print("未发现有效频道数据。", file=sys.stderr)
         sys.exit(1)
 
-    # 分类桶
-    cctv_bucket = []
-    weishee_bucket = []
-    other_bucket = []
+    try:
+        classifier = load_classifier(args.rules)
+    except Exception as e:
+        print(f"错误：无法加载分组规则: {e}", file=sys.stderr)
+        sys.exit(1)
     
     # 统计信息
     stats = {
         'total_channels': len(channels),
         'total_urls': 0,
         'multi_url_channels': 0,
-        'has_config_channels': 0,
-        'cctv_channels': 0,
-        'weishee_channels': 0,
-        'other_channels': 0
+        'has_config_channels': 0
     }
 
     for key, data in channels.items():
@@ -335,29 +301,12 @@ def main():
         if data.get("configs"):
             stats['has_config_channels'] += 1
         
-        if "CCTV" in name.upper():
-            data["final_group"] = "央视"
-            cctv_bucket.append(data)
-            stats['cctv_channels'] += 1
-        elif "卫视" in name:
-            data["final_group"] = "卫视"
-            weishee_bucket.append(data)
-            stats['weishee_channels'] += 1
-        else:
-            data["final_group"] = data["original_group"]
-            other_bucket.append(data)
-            stats['other_channels'] += 1
-
-    # 排序：
-    # 央视：按数字排
-    cctv_bucket.sort(key=lambda x: extract_cctv_num(x["name"]))
-    # 卫视：按原顺序排
-    weishee_bucket.sort(key=lambda x: x["order_idx"])
-    # 其他：按原频道组名，组内按原顺序
-    other_bucket.sort(key=lambda x: (x["original_group"], x["order_idx"]))
+        # 按规则一次求值得到最终分组和排序位置
+        fields = channel_fields(name, data["info"], data["urls"], data["original_group"])
+        data["final_group"], data["sort_key"] = classifier.classify(fields, data["original_group"], data["order_idx"])
 
-    # 生成最终列表
-    final_list = cctv_bucket + weishee_bucket + other_bucket
+    # 生成最终列表：按规则的 rank 分块，块内按规则指定的方式排序
+    final_list = sorted(channels.values(), key=lambda x: x["sort_key"])
 
     # 安全写入输出文件
     success, temp_path = safe_write_output(header, final_list, args.input, args.output, args.no_config)
@@ -373,9 +322,8 @@ def main():
     print(f"- 输入文件: {args.input}", file=sys.stderr)
     print(f"- 输出文件: {args.output}", file=sys.stderr)
     print(f"- 频道统计: {len(final_list)} 个频道", file=sys.stderr)
-    print(f"  - 央视：{len(cctv_bucket)} 个", file=sys.stderr)
-    print(f"  - 卫视：{len(weishee_bucket)} 个", file=sys.stderr)
-    print(f"  - 其他：{len(other_bucket)} 个", file=sys.stderr)
+    for line in format_hit_counts(classifier):
+        print(f"  - {line}", file=sys.stderr)
     
     if args.no_config:
         print(f"- 已过滤所有配置行", file=sys.stderr)
@@ -396,4 +344,4 @@ def main():
         print(f"- 注意: 已安全覆盖原文件", file=sys.stderr)
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+各脚本共用的性能分析入口
+脚本以 run_main(main) 启动后，命令行加 --profile 或设置环境变量 M3U_PROFILE 即可开启:
+
+    --profile / --profile=full   cProfile（保存 .prof，可用 pstats/snakeviz 查看）+ tracemalloc 峰值内存报告
+    --profile=sample             采样分析：后台线程定时抓取所有线程的调用栈，开销很小，可在定时任务中常开；
+                                 额外保存折叠栈文件（.stacks，可直接生成火焰图）
+
+环境变量:
+    M3U_PROFILE           full / sample（1、true 等同 full），命令行参数优先
+    M3U_PROFILE_DIR       输出目录（默认当前目录）
+    M3U_PROFILE_TOP       报告中列出的条目数（默认 20）
+    M3U_PROFILE_INTERVAL  采样间隔秒数（默认 0.005）
+
+报告输出到 stderr，不影响脚本的标准输出。
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+PROFILE_MODES = ('full', 'sample')
+DEFAULT_TOP = 20
+DEFAULT_INTERVAL = 0.005
+
+def _normalize_mode(value):
+    value = (value or '').strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return None
+    if value in ('1', 'true', 'yes', 'on', 'cprofile'):
+        return 'full'
+    if value not in PROFILE_MODES:
+        raise ValueError(f"未知的分析模式 '{value}'（可选: {', '.join(PROFILE_MODES)}）")
+    return value
+
+def pop_profile_argument(argv):
+    """
+    从 argv 中取出 --profile[=MODE]，返回 (模式或 None, 剩余参数)
+    脚本自身的 argparse 不会看到该参数
+    """
+    mode = None
+    rest = []
+    for arg in argv:
+        if arg == '--profile':
+            mode = 'full'
+        elif arg.startswith('--profile='):
+            mode = _normalize_mode(arg.split('=', 1)[1]) or None
+        else:
+            rest.append(arg)
+    return mode, rest
+
+def _output_base(script_name):
+    directory = os.environ.get('M3U_PROFILE_DIR') or '.'
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return os.path.join(directory, f"{script_name}-{stamp}-{os.getpid()}")
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+# --- full: cProfile + tracemalloc ---
+class _PeakSnapshotter(threading.Thread):
+    """后台轮询 tracemalloc，已分配内存比上次快照时增长 10% 以上就重新快照，最终得到接近峰值时的分配分布"""
+
+    def __init__(self, interval=0.05):
+        super().__init__(name='m3u-profile-tracemalloc', daemon=True)
+        self.interval = interval
+        self.snapshot = None
+        self.snapshot_size = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        import tracemalloc
+        while not self._stop_event.wait(self.interval):
+            current, _ = tracemalloc.get_traced_memory()
+            if current > self.snapshot_size * 1.1:
+                self.snapshot = tracemalloc.take_snapshot()
+                self.snapshot_size = current
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def _run_full(main, script_name, top):
+    import cProfile
+    import pstats
+    import tracemalloc
+
+    tracemalloc.start()
+    watcher = _PeakSnapshotter()
+    watcher.start()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    try:
+        return profiler.runcall(main)
+    finally:
+        elapsed = time.perf_counter() - start
+        watcher.stop()
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = watcher.snapshot
+        tracemalloc.stop()
+
+        base = _output_base(script_name)
+        profiler.dump_stats(base + '.prof')
+        out = sys.stderr
+        print(f"\n=== 性能分析 ({script_name}, 耗时 {elapsed:.2f}s) ===", file=out)
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(top)
+        rss = _peak_rss_mb()
+        print(f"=== 内存: Python 分配峰值 {peak / 1024 / 1024:.1f}MB"
+              + (f"，进程峰值 RSS {rss:.1f}MB" if rss is not None else '') + " ===", file=out)
+        if snapshot is not None:
+            print(f"接近峰值时（{watcher.snapshot_size / 1024 / 1024:.1f}MB）的前 {top} 个分配位置:", file=out)
+            for stat in snapshot.statistics('lineno')[:top]:
+                print(f"  {stat}", file=out)
+        print(f"cProfile 数据已保存到 '{base}.prof'", file=out)
+
+# --- sample: 采样分析 ---
+class _Sampler(threading.Thread):
+    """定时抓取所有线程的调用栈，统计函数自身/累计出现次数和折叠栈"""
+
+    def __init__(self, interval):
+        super().__init__(name='m3u-profile-sampler', daemon=True)
+        self.interval = interval
+        self.samples = 0
+        self.self_counts = {}
+        self.total_counts = {}
+        self.stacks = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                self.samples += 1
+                self.self_counts[stack[0]] = self.self_counts.get(stack[0], 0) + 1
+                for name in set(stack):
+                    self.total_counts[name] = self.total_counts.get(name, 0) + 1
+                folded = ';'.join(reversed(stack))
+                self.stacks[folded] = self.stacks.get(folded, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def _run_sample(main, script_name, top, interval):
+    sampler = _Sampler(interval)
+    sampler.start()
+    start = time.perf_counter()
+    try:
+        return main()
+    finally:
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+
+        base = _output_base(script_name)
+        with open(base + '.stacks', 'w', encoding='utf-8') as f:
+            for folded, count in sorted(sampler.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{folded} {count}\n")
+
+        out = sys.stderr
+        total = sampler.samples or 1
+        rss = _peak_rss_mb()
+        print(f"\n=== 采样分析 ({script_name}, 耗时 {elapsed:.2f}s, {sampler.samples} 个样本, 间隔 {interval * 1000:.0f}ms"
+              + (f", 峰值 RSS {rss:.1f}MB" if rss is not None else '') + ") ===", file=out)
+        for title, counts in (("自身", sampler.self_counts), ("累计", sampler.total_counts)):
+            print(f"按{title}样本数:", file=out)
+            for name, count in sorted(counts.items(), key=lambda item: -item[1])[:top]:
+                print(f"  {count / total * 100:6.1f}%  {count:>7}  {name}", file=out)
+        print(f"折叠栈已保存到 '{base}.stacks'", file=out)
+
+# --- 入口 ---
+def run_main(main, argv=None):
+    """
+    脚本入口：处理 --profile 参数和 M3U_PROFILE 环境变量后调用 main()
+    未开启分析时只多一次参数扫描
+    """
+    argv = sys.argv if argv is None else argv
+    try:
+        mode, rest = pop_profile_argument(argv[1:])
+        if mode is None:
+            mode = _normalize_mode(os.environ.get('M3U_PROFILE'))
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(2)
+    sys.argv[1:] = rest
+
+    if mode is None:
+        return main()
+
+    # 经 iptvtool 调用时 argv[0] 为 'iptvtool <子命令>'
+    script_name = os.path.splitext(os.path.basename(argv[0] or 'script'))[0].replace(' ', '-')
+    top = int(os.environ.get('M3U_PROFILE_TOP') or DEFAULT_TOP)
+    if mode == 'sample':
+        interval = float(os.environ.get('M3U_PROFILE_INTERVAL') or DEFAULT_INTERVAL)
+        return _run_sample(main, script_name, top, interval)
+    return _run_full(main, script_name, top)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="汇总 --profile=sample 保存的折叠栈文件（可合并多次运行）",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('files', nargs='+', help=".stacks 文件")
+    parser.add_argument('-n', '--top', type=int, default=DEFAULT_TOP, help=f"列出条目数 (默认: {DEFAULT_TOP})")
+    args = parser.parse_args()
+
+    self_counts = {}
+    total = 0
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                folded, _, count = line.rstrip('\n').rpartition(' ')
+                if not folded:
+                    continue
+                count = int(count)
+                total += count
+                leaf = folded.rsplit(';', 1)[-1]
+                self_counts[leaf] = self_counts.get(leaf, 0) + count
+    for name, count in sorted(self_counts.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{count / (total or 1) * 100:6.1f}%  {count:>7}  {name}")
+
+if __name__ == "__main__":
+    run_main(main)
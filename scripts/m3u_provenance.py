@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+合并结果的来源索引（.prov 旁路文件）
+按输出行号记录该行取自哪个输入文件的第几行，定长记录，按行号 O(1) 定位；
+另有按 URL 哈希排序的 URL 索引，按 URL 查询时二分查找 O(log n)，不必扫描 M3U 文件。
+
+文件格式（小端）:
+    头部     : 魔数 b'M3UPROV2' | 来源数 uint32 | 记录数 uint32 | 记录区偏移 uint32
+               | URL 条目数 uint32 | URL 索引偏移 uint32
+    来源表   : 每个来源 长度 uint16 + UTF-8 路径
+    记录区   : 每个输出行一条 (来源编号 uint16, 来源行号 uint32)，第 N 条对应输出第 N+1 行
+               来源编号 0xFFFF 表示该行没有来源（如 #EXTM3U 头、配置行）
+    URL 索引 : 每个 URL 行一条 (URL 哈希 uint64, 输出行号 uint32)，按 (哈希, 行号) 排序
+               哈希为去掉首尾空白后 UTF-8 的 BLAKE2b-64，不同 URL 冲突的概率可忽略
+"""
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from m3u_profile import run_main
+
+MAGIC = b'M3UPROV2'
+NO_SOURCE = 0xFFFF
+
+_HEADER = struct.Struct('<8sIIIII')
+_SOURCE_LEN = struct.Struct('<H')
+_RECORD = struct.Struct('<HI')
+_URL_ENTRY = struct.Struct('<QI')
+
+def url_hash(url):
+    """URL 索引用的 64 位哈希"""
+    return int.from_bytes(hashlib.blake2b(url.strip().encode('utf-8'), digest_size=8).digest(), 'little')
+
+class ProvenanceWriter:
+    """
+    合并时逐行登记来源，按输出行顺序追加记录
+    """
+
+    def __init__(self):
+        self.sources = []
+        self._source_ids = {}
+        self._records = bytearray()
+        self._url_entries = []  # [(URL 哈希, 输出行号)]
+
+    def source_id(self, source):
+        sid = self._source_ids.get(source)
+        if sid is None:
+            sid = len(self.sources)
+            if sid >= NO_SOURCE:
+                raise ValueError("来源数量超过上限")
+            self._source_ids[source] = sid
+            self.sources.append(source)
+        return sid
+
+    def add(self, origin=None, url=None):
+        """登记下一输出行的来源；origin 为 (来源, 行号) 或 None，url 为该行的 URL（URL 行才给出）"""
+        if url is not None:
+            self._url_entries.append((url_hash(url), len(self) + 1))
+        if origin is None:
+            self._records += _RECORD.pack(NO_SOURCE, 0)
+        else:
+            source, line_no = origin
+            self._records += _RECORD.pack(self.source_id(source), line_no)
+
+    def __len__(self):
+        return len(self._records) // _RECORD.size
+
+    def save(self, path):
+        """原子写入 .prov 文件"""
+        source_table = bytearray()
+        for source in self.sources:
+            encoded = source.encode('utf-8')
+            source_table += _SOURCE_LEN.pack(len(encoded)) + encoded
+        records_offset = _HEADER.size + len(source_table)
+        urls_offset = records_offset + len(self._records)
+        url_index = bytearray()
+        for entry in sorted(self._url_entries):
+            url_index += _URL_ENTRY.pack(*entry)
+
+        path_dir = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=path_dir, suffix='.prov', prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(_HEADER.pack(MAGIC, len(self.sources), len(self), records_offset,
+                                     len(self._url_entries), urls_offset))
+                f.write(source_table)
+                f.write(self._records)
+                f.write(url_index)
+            os.replace(temp_path, path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+class ProvenanceIndex:
+    """
+    只读访问 .prov 文件（mmap），lookup 按行号直接计算偏移，lookup_url 在 URL 索引中二分查找
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"'{path}' 不是有效的来源索引文件")
+
+        if len(self._map) < _HEADER.size:
+            self.close()
+            raise ValueError(f"'{path}' 不是有效的来源索引文件")
+        (magic, source_count, self.record_count, self._records_offset,
+         self.url_count, self._urls_offset) = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) < self._urls_offset + self.url_count * _URL_ENTRY.size:
+            self.close()
+            raise ValueError(f"'{path}' 不是有效的来源索引文件")
+
+        self.sources = []
+        pos = _HEADER.size
+        for _ in range(source_count):
+            (length,) = _SOURCE_LEN.unpack_from(self._map, pos)
+            pos += _SOURCE_LEN.size
+            self.sources.append(self._map[pos:pos + length].decode('utf-8'))
+            pos += length
+
+    def lookup(self, line_no):
+        """返回输出第 line_no 行（从 1 开始）的 (来源路径, 来源行号)，无来源时返回 None"""
+        if line_no < 1 or line_no > self.record_count:
+            return None
+        sid, source_line = _RECORD.unpack_from(self._map, self._records_offset + (line_no - 1) * _RECORD.size)
+        if sid == NO_SOURCE:
+            return None
+        return self.sources[sid], source_line
+
+    def lookup_url(self, url):
+        """返回 URL 所在的输出行号列表（升序），未找到时为空"""
+        target = url_hash(url)
+        lo, hi = 0, self.url_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._url_entry(mid)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        line_numbers = []
+        while lo < self.url_count:
+            entry_hash, line_no = self._url_entry(lo)
+            if entry_hash != target:
+                break
+            line_numbers.append(line_no)
+            lo += 1
+        return line_numbers
+
+    def _url_entry(self, index):
+        return _URL_ENTRY.unpack_from(self._map, self._urls_offset + index * _URL_ENTRY.size)
+
+    def iter_records(self):
+        """按输出行顺序产出 (输出行号, 来源编号, 来源行号)"""
+        for index, (sid, source_line) in enumerate(
+                _RECORD.iter_unpack(self._map[self._records_offset:self._records_offset + self.record_count * _RECORD.size]), 1):
+            yield index, sid, source_line
+
+    def close(self):
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def default_provenance_path(output_path):
+    return output_path + '.prov'
+
+def main():
+    parser = argparse.ArgumentParser(description="查询合并结果的来源：输出行/URL 取自哪个输入文件的哪一行")
+    parser.add_argument('-p', '--prov', help="来源索引文件（默认: M3U文件.prov）")
+    parser.add_argument('-m', '--m3u', help="合并输出的 M3U 文件（未指定 -p 时使用 M3U文件.prov）")
+    parser.add_argument('-l', '--line', type=int, nargs='+', help="按输出行号查询")
+    parser.add_argument('-u', '--url', nargs='+', help="按 URL 查询")
+    parser.add_argument('-s', '--summary', action='store_true', help="统计各来源贡献的行数")
+    args = parser.parse_args()
+
+    prov_path = args.prov or (default_provenance_path(args.m3u) if args.m3u else None)
+    if not prov_path:
+        parser.error("需要 -p 或 -m")
+
+    try:
+        index = ProvenanceIndex(prov_path)
+    except Exception as e:
+        print(f"错误：无法读取来源索引: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    with index:
+        def report(label, line_no):
+            origin = index.lookup(line_no)
+            if origin:
+                print(f"{label}\t{line_no}\t{origin[0]}:{origin[1]}")
+            else:
+                print(f"{label}\t{line_no}\t-")
+
+        for line_no in args.line or []:
+            report('line', line_no)
+
+        if args.url:
+            for url in args.url:
+                url = url.strip()
+                line_numbers = index.lookup_url(url)
+                if not line_numbers:
+                    print(f"{url}\t-\t未找到", file=sys.stderr)
+                for line_no in line_numbers:
+                    report(url, line_no)
+
+        if args.summary:
+            counts = [0] * len(index.sources)
+            for _, sid, _ in index.iter_records():
+                if sid != NO_SOURCE:
+                    counts[sid] += 1
+            for source, count in zip(index.sources, counts):
+                print(f"{count}\t{source}")
+            print(f"共 {index.record_count} 行，{len(index.sources)} 个来源", file=sys.stderr)
+
+if __name__ == "__main__":
+    run_main(main)
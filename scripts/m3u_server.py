@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+本地 M3U 播放列表服务
+    serve  提供目录下的 *.m3u，支持 ETag/If-None-Match (304)、gzip 和按分组/主机过滤:
+               /plutotv_merged.m3u?group=Movies,Kids
+               /iptv_merged.m3u?group=央视&host=example.com
+               /iptv_merged.m3u?domain=miguvideo.com
+    bench  本地压测客户端，输出每秒请求数
+
+已解析的播放列表和分组/主机索引常驻内存；文件 mtime 或大小变化时重新读取，
+内容哈希未变则沿用原索引，请求时不会重新解析文件。
+不是合法 UTF-8 的文件照常提供：无法解码的字节原样保留在输出中（包括过滤结果）。
+"""
+
+import argparse
+import gzip
+import hashlib
+import http.client
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from m3u_catalog import url_host
+from m3u_snapshot import parse_playlist
+from m3u_profile import run_main
+
+GZIP_MIN_SIZE = 1024
+FILTER_CACHE_SIZE = 256
+
+# --- 播放列表缓存 ---
+class PlaylistEntry:
+    """一个文件的缓存：原始内容、gzip 内容、ETag，以及分组/主机/域名索引"""
+
+    def __init__(self, path, raw, stat):
+        self.path = path
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.digest = hashlib.sha256(raw).hexdigest()
+        self.etag = f'"{self.digest[:32]}"'
+        self.body = raw
+        self.body_gzip = gzip.compress(raw, mtime=0) if len(raw) >= GZIP_MIN_SIZE else None
+        # surrogateescape: 非 UTF-8 字节在编码回 bytes 时原样还原
+        self.playlist = parse_playlist(raw.decode('utf-8', 'surrogateescape'))
+        self._build_indexes()
+        self._filtered = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _build_indexes(self):
+        """
+        group_index:  分组 -> [频道编号]
+        host_index:   主机 -> {频道编号: [URL 行下标]}；domain_index 同理
+        """
+        self.group_index = {}
+        self.host_index = {}
+        self.domain_index = {}
+        lines = self.playlist.lines
+        for channel, start, end in self.playlist.channel_ranges():
+            self.group_index.setdefault(self.playlist.groups[channel], []).append(channel)
+            for index in range(start + 1, end):
+                line = lines[index].strip()
+                if not line or line.startswith('#'):
+                    continue
+                host, domain = url_host(line)
+                if host:
+                    self.host_index.setdefault(host, {}).setdefault(channel, []).append(index)
+                    self.domain_index.setdefault(domain, {}).setdefault(channel, []).append(index)
+
+    def filtered(self, groups=None, hosts=None, domains=None):
+        """
+        返回 (内容 bytes, gzip bytes 或 None, ETag)
+        分组过滤保留整个频道；主机/域名过滤只保留匹配的 URL，没有匹配 URL 的频道被去掉
+        """
+        key = (tuple(groups or ()), tuple(hosts or ()), tuple(domains or ()))
+        with self._lock:
+            cached = self._filtered.get(key)
+            if cached is not None:
+                self._filtered.move_to_end(key)
+                return cached
+
+        channels = None
+        if groups:
+            channels = set()
+            for group in groups:
+                channels.update(self.group_index.get(group, ()))
+
+        url_lines = None
+        for index, values in ((self.host_index, hosts), (self.domain_index, domains)):
+            if not values:
+                continue
+            matched = {}
+            for value in values:
+                for channel, indexes in index.get(value.lower(), {}).items():
+                    matched.setdefault(channel, []).extend(indexes)
+            if url_lines is None:
+                url_lines = matched
+            else:
+                url_lines = {ch: [i for i in idx if i in set(matched[ch])]
+                             for ch, idx in url_lines.items() if ch in matched}
+            channels = set(matched) if channels is None else channels & set(matched)
+
+        lines = self.playlist.lines
+        out = list(self.playlist.header_lines())
+        for channel, start, end in self.playlist.channel_ranges():
+            if channels is not None and channel not in channels:
+                continue
+            if url_lines is None:
+                out.extend(lines[start:end])
+                continue
+            keep = set(url_lines.get(channel, ()))
+            if not keep:
+                continue
+            out.extend(line for index, line in enumerate(lines[start:end], start)
+                       if index == start or index in keep or line.strip().startswith('#'))
+
+        body = ('\n'.join(out) + '\n').encode('utf-8', 'surrogateescape')
+        digest = hashlib.sha256(self.digest.encode('ascii') + repr(key).encode('utf-8')).hexdigest()
+        result = (body, gzip.compress(body, mtime=0) if len(body) >= GZIP_MIN_SIZE else None, f'"{digest[:32]}"')
+        with self._lock:
+            self._filtered[key] = result
+            while len(self._filtered) > FILTER_CACHE_SIZE:
+                self._filtered.popitem(last=False)
+        return result
+
+class PlaylistCache:
+    """目录下播放列表的内存缓存，按 mtime/大小/内容哈希判断是否需要重建"""
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, name):
+        """URL 路径 -> 目录内的 .m3u 文件路径；越界或非 .m3u 返回 None"""
+        name = unquote(name).lstrip('/')
+        if not name.endswith('.m3u'):
+            return None
+        path = os.path.abspath(os.path.join(self.root, name))
+        if not path.startswith(self.root + os.sep):
+            return None
+        return path
+
+    def get(self, path):
+        """返回最新的 PlaylistEntry；文件不存在时返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry.mtime_ns == stat.st_mtime_ns and entry.size == stat.st_size:
+            return entry
+
+        with open(path, 'rb') as f:
+            raw = f.read()
+        if entry is not None and hashlib.sha256(raw).hexdigest() == entry.digest:
+            # 只是被 touch 过，内容未变，沿用原索引
+            entry.mtime_ns = stat.st_mtime_ns
+            return entry
+
+        entry = PlaylistEntry(path, raw, stat)
+        with self._lock:
+            self._entries[path] = entry
+        return entry
+
+    def list_files(self):
+        return sorted(name for name in os.listdir(self.root) if name.endswith('.m3u'))
+
+# --- HTTP 服务 ---
+def accepts_gzip(accept_encoding):
+    """按 Accept-Encoding（含 q 值）判断客户端是否接受 gzip；gzip;q=0 表示拒绝，未列出时看 *"""
+    star = None
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        if coding in ('gzip', 'x-gzip'):
+            return quality > 0
+        if coding == '*':
+            star = quality > 0
+    return bool(star)
+
+def gzip_etag(etag):
+    """gzip 编码变体的 ETag：与原始内容区分，避免缓存把两种编码的响应当作同一实体"""
+    return etag[:-1] + '-gz"'
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 判断（弱比较）：W/ 前缀不参与比较，"*" 匹配任何已存在的资源"""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*':
+            return True
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def _split_param(query, name):
+    values = []
+    for value in query.get(name, ()):
+        values.extend(v.strip() for v in value.split(',') if v.strip())
+    return values
+
+class PlaylistHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'm3u_server'
+    # 响应头和响应体分两次写出，不关 Nagle 时 keep-alive 连接会被延迟 ACK 拖慢
+    disable_nagle_algorithm = True
+    cache = None
+    quiet = False
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        parts = urlsplit(self.path)
+        if parts.path in ('', '/'):
+            body = ('\n'.join(self.cache.list_files()) + '\n').encode('utf-8')
+            return self._respond(200, body, 'text/plain; charset=utf-8', send_body=send_body)
+
+        path = self.cache.resolve(parts.path)
+        entry = self.cache.get(path) if path else None
+        if entry is None:
+            return self._respond(404, '未找到\n'.encode('utf-8'), 'text/plain; charset=utf-8', send_body=send_body)
+
+        query = parse_qs(parts.query)
+        groups = _split_param(query, 'group')
+        hosts = _split_param(query, 'host')
+        domains = _split_param(query, 'domain')
+        if groups or hosts or domains:
+            body, body_gzip, etag = entry.filtered(groups, hosts, domains)
+        else:
+            body, body_gzip, etag = entry.body, entry.body_gzip, entry.etag
+
+        use_gzip = body_gzip is not None and accepts_gzip(self.headers.get('Accept-Encoding', ''))
+        if use_gzip:
+            etag = gzip_etag(etag)
+        if etag_matches(self.headers.get('If-None-Match', ''), etag):
+            return self._respond(304, b'', None, etag=etag, send_body=False)
+
+        self._respond(200, body_gzip if use_gzip else body, 'audio/x-mpegurl; charset=utf-8',
+                      etag=etag, gzip_encoded=use_gzip, send_body=send_body)
+
+    def _respond(self, status, body, content_type, etag=None, gzip_encoded=False, send_body=True):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        if etag:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Vary', 'Accept-Encoding')
+        if gzip_encoded:
+            self.send_header('Content-Encoding', 'gzip')
+        if status != 304:
+            # 304 不带 Content-Length：它指的是完整响应的长度，写 0 会让部分客户端和缓存误判
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def serve(root, host, port, quiet=False):
+    handler = type('Handler', (PlaylistHandler,), {'cache': PlaylistCache(root), 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"服务目录 '{root}'，地址 http://{host}:{server.server_port}/", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+# --- 压测客户端 ---
+def bench(url, requests_total, concurrency, use_gzip=False, conditional=False):
+    """
+    用 keep-alive 连接并发请求同一 URL
+    :param conditional: 每个连接在首次响应后带 If-None-Match 请求（测 304 路径）
+    :return: (请求数, 耗时秒, 状态码计数, 接收字节数)
+    """
+    parts = urlsplit(url)
+    target = parts.path or '/'
+    if parts.query:
+        target += '?' + parts.query
+    per_worker = [requests_total // concurrency + (1 if i < requests_total % concurrency else 0)
+                  for i in range(concurrency)]
+    statuses = {}
+    received = [0]
+    lock = threading.Lock()
+
+    def worker(count):
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        headers = {'Accept-Encoding': 'gzip'} if use_gzip else {}
+        local_status = {}
+        local_bytes = 0
+        for _ in range(count):
+            conn.request('GET', target, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+            local_bytes += len(data)
+            local_status[response.status] = local_status.get(response.status, 0) + 1
+            etag = response.getheader('ETag')
+            if conditional and etag:
+                headers = dict(headers, **{'If-None-Match': etag})
+        conn.close()
+        with lock:
+            for status, n in local_status.items():
+                statuses[status] = statuses.get(status, 0) + n
+            received[0] += local_bytes
+
+    threads = [threading.Thread(target=worker, args=(count,)) for count in per_worker if count]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return sum(statuses.values()), elapsed, statuses, received[0]
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 M3U 播放列表服务（ETag/304、gzip、分组/主机过滤）及压测客户端",
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_serve = sub.add_parser('serve', help="提供目录下的 *.m3u")
+    p_serve.add_argument('-d', '--dir', default='.', help="播放列表目录 (默认: 当前目录)")
+    p_serve.add_argument('--host', default='127.0.0.1', help="监听地址 (默认: 127.0.0.1)")
+    p_serve.add_argument('-p', '--port', type=int, default=8080, help="端口 (默认: 8080)")
+    p_serve.add_argument('-q', '--quiet', action='store_true', help="不输出访问日志")
+
+    p_bench = sub.add_parser('bench', help="压测：输出每秒请求数")
+    p_bench.add_argument('url', help="如 http://127.0.0.1:8080/iptv_merged.m3u?group=央视")
+    p_bench.add_argument('-n', '--requests', type=int, default=1000, help="请求总数 (默认: 1000)")
+    p_bench.add_argument('-c', '--concurrency', type=int, default=4, help="并发连接数 (默认: 4)")
+    p_bench.add_argument('--gzip', action='store_true', help="请求 gzip 压缩")
+    p_bench.add_argument('--conditional', action='store_true', help="首次响应后带 If-None-Match（测 304）")
+
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        if not os.path.isdir(args.dir):
+            print(f"错误：目录 '{args.dir}' 不存在", file=sys.stderr)
+            sys.exit(1)
+        serve(args.dir, args.host, args.port, args.quiet)
+    else:
+        if args.requests <= 0 or args.concurrency <= 0:
+            parser.error("-n 和 -c 必须为正整数")
+        try:
+            total, elapsed, statuses, received = bench(args.url, args.requests, args.concurrency,
+                                                       args.gzip, args.conditional)
+        except (OSError, http.client.HTTPException) as e:
+            print(f"错误：请求失败: {e}", file=sys.stderr)
+            sys.exit(1)
+        status_text = ', '.join(f"{status}: {n}" for status, n in sorted(statuses.items()))
+        print(f"{total} 个请求，耗时 {elapsed:.2f}s，{total / elapsed:.0f} 请求/秒，"
+              f"接收 {received / 1024:.0f} KiB ({status_text})")
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+M3U 分片输出
+一次流式读取，把频道按分组（或每 N 个频道）写入各自的分片文件，并生成:
+    index.m3u      主索引，每个分片一个条目（M3U 的 M3U），播放器可按需只拉取打开的分组
+    manifest.json  分片清单：文件名、频道数、URL 数、字节数、SHA-256
+每个分片都带原文件的文件头（#EXTM3U 及其属性），可单独播放。
+按分组分片时文件名由分组名决定（与分组出现的顺序无关），重复运行时未变的分组文件名和内容都不变；
+分组再多也不会同时打开所有分片：频道先缓冲在内存，超过 SPILL_BYTES 时追加到各分片的临时溢出文件，
+结束时逐个写出。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+INDEX_NAME = 'index.m3u'
+MANIFEST_NAME = 'manifest.json'
+UNGROUPED = '未分组'
+SPILL_BYTES = 8 * 1024 * 1024  # 所有分片缓冲的总字节数超过该值时溢出到临时文件
+
+_GROUP_PATTERN = re.compile(r'group-title="([^"]*)"')
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+def safe_filename(name):
+    """分组名转为可用的文件名（保留中文）"""
+    return _UNSAFE_CHARS.sub('_', name).strip('._') or 'shard'
+
+def group_filename(group):
+    """
+    分组的分片文件名，只由分组名决定
+    分组名不能原样作为文件名时（含特殊字符、与 index.m3u 同名）追加分组名哈希，避免不同分组撞名
+    """
+    stem = safe_filename(group)
+    if stem != group or f"{stem}.m3u" == INDEX_NAME:
+        stem = f"{stem}_{hashlib.sha1(group.encode('utf-8')).hexdigest()[:8]}"
+    return f"{stem}.m3u"
+
+class Shard:
+    """
+    单个分片：边写边计算哈希和计数
+    内容先缓冲在内存，spill() 时追加到临时溢出文件（只在追加期间打开），commit() 时一次写出到目标文件
+    """
+
+    def __init__(self, name, filename, path, header_lines):
+        self.name = name
+        self.filename = filename
+        self.path = path
+        self.channels = 0
+        self.urls = 0
+        self.size = 0
+        self.pending = 0
+        self._hash = hashlib.sha256()
+        self._pieces = []
+        self._spill_path = None
+        self._committed = False
+        for line in header_lines:
+            self.write_line(line)
+
+    def write_line(self, line):
+        """:return: 写入的字节数"""
+        encoded = (line + '\n').encode('utf-8')
+        self._hash.update(encoded)
+        self.size += len(encoded)
+        self.pending += len(encoded)
+        self._pieces.append(encoded)
+        return len(encoded)
+
+    def write_channel(self, block):
+        """:return: 写入的字节数"""
+        self.channels += 1
+        written = 0
+        for line in block:
+            if line and not line.startswith('#'):
+                self.urls += 1
+            written += self.write_line(line)
+        return written
+
+    def spill(self):
+        """把缓冲的内容追加到临时溢出文件"""
+        if not self._pieces:
+            return
+        if self._spill_path is None:
+            fd, self._spill_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)),
+                                                    prefix='.tmp_', suffix='.spill')
+            os.close(fd)
+        with open(self._spill_path, 'ab') as f:
+            f.writelines(self._pieces)
+        self._pieces = []
+        self.pending = 0
+
+    def commit(self):
+        if self._committed:
+            return
+        with M3UWriter(self.path) as writer:
+            if self._spill_path is not None:
+                with open(self._spill_path, 'rb') as f:
+                    writer.copy_from(f)
+            for data in self._pieces:
+                writer.write_bytes(data)
+        self._committed = True
+        self.abort()
+
+    def abort(self):
+        """删除溢出文件"""
+        self._pieces = []
+        self.pending = 0
+        if self._spill_path is not None:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+            self._spill_path = None
+
+    def manifest_entry(self):
+        return {
+            "name": self.name,
+            "file": self.filename,
+            "channels": self.channels,
+            "urls": self.urls,
+            "bytes": self.size,
+            "sha256": self._hash.hexdigest(),
+        }
+
+def iter_channel_blocks(lines):
+    """
+    流式切分 M3U: 先产出 ('header', [文件头行])，再逐个产出 ('channel', [EXTINF 行, 配置/URL 行...])
+    空行被丢弃
+    """
+    header = []
+    block = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('#EXTINF'):
+            if block is None:
+                yield 'header', header
+            else:
+                yield 'channel', block
+            block = [line]
+        elif block is None:
+            header.append(line)
+        else:
+            block.append(line)
+    if block is None:
+        yield 'header', header
+    else:
+        yield 'channel', block
+
+def shard_playlist(input_path, output_dir, per=None, base_url=''):
+    """
+    流式分片
+    :param per: 每个分片的频道数；None 时按分组分片
+    :param base_url: index.m3u 中分片地址的前缀（如发布地址）；为空时用相对文件名
+    :return: manifest 字典
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    shards = []
+    by_group = {}
+    used_names = set()
+    header_lines = ['#EXTM3U']
+    current = None
+    buffered = 0
+
+    def open_shard(name, filename):
+        used_names.add(filename)
+        shard = Shard(name, filename, os.path.join(output_dir, filename), header_lines)
+        shards.append(shard)
+        return shard
+
+
+    try:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            for kind, block in iter_channel_blocks(f):
+                if kind == 'header':
+                    header_lines = [line for line in block if line.startswith('#EXTM3U')] or ['#EXTM3U']
+                    continue
+                if per:
+                    if current is None or current.channels >= per:
+                        if current is not None:
+                            current.commit()
+                        index = len(shards) + 1
+                        current = open_shard(f"第 {index} 部分", f"{index:03d}_part{index}.m3u")
+                    buffered += current.write_channel(block)
+                else:
+                    match = _GROUP_PATTERN.search(block[0])
+                    group = (match.group(1).strip() if match else '') or UNGROUPED
+                    shard = by_group.get(group)
+                    if shard is None:
+                        shard = by_group[group] = open_shard(group, group_filename(group))
+                    buffered += shard.write_channel(block)
+                if buffered >= SPILL_BYTES:
+                    for shard in shards:
+                        shard.spill()
+                    buffered = 0
+        for shard in shards:
+            shard.commit()
+    except Exception:
+        for shard in shards:
+            shard.abort()
+        raise
+
+    manifest = {
+        "source": os.path.basename(input_path),
+        "mode": f"per:{per}" if per else "group",
+        "channels": sum(shard.channels for shard in shards),
+        "urls": sum(shard.urls for shard in shards),
+        "shards": [shard.manifest_entry() for shard in shards],
+    }
+
+    index_lines = [header_lines[0]]
+    for shard in shards:
+        title = shard.name.replace('"', "'")
+        index_lines.append(f'#EXTINF:-1 group-title="{title}",{title} ({shard.channels})')
+        index_lines.append(base_url + shard.filename)
+    with M3UWriter(os.path.join(output_dir, INDEX_NAME)) as writer:
+        writer.write_lines(index_lines)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    remove_stale_shards(manifest_path, output_dir, used_names)
+    with M3UWriter(manifest_path, compress=[], snapshot=False) as writer:
+        writer.write(json.dumps(manifest, ensure_ascii=False, indent=2) + '\n')
+    return manifest
+
+def remove_stale_shards(manifest_path, output_dir, keep):
+    """删除上一次 manifest 中列出、本次不再生成的分片"""
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            old_files = [entry["file"] for entry in json.load(f).get("shards", [])]
+    except (OSError, ValueError, KeyError, TypeError):
+        return
+    for filename in old_files:
+        if filename in keep or os.path.basename(filename) != filename:
+            continue
+        try:
+            os.remove(os.path.join(output_dir, filename))
+        except OSError:
+            pass
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="M3U 分片：按分组或每 N 个频道拆分，生成主索引 index.m3u 和 manifest.json",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('-i', '--input', required=True, help="输入 M3U 文件")
+    parser.add_argument('-o', '--output-dir', required=True, help="分片输出目录")
+    parser.add_argument('-n', '--per', type=int, metavar='N', help="每个分片 N 个频道（默认按分组分片）")
+    parser.add_argument('--base-url', default='', help="index.m3u 中分片地址的前缀，如 https://example.com/shards/")
+    args = parser.parse_args()
+
+    if args.per is not None and args.per <= 0:
+        parser.error("-n/--per 必须为正整数")
+
+    try:
+        manifest = shard_playlist(args.input, args.output_dir, args.per, args.base_url)
+    except Exception as e:
+        print(f"错误：分片失败: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"已写入 {len(manifest['shards'])} 个分片，共 {manifest['channels']} 个频道 -> '{args.output_dir}'",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+M3U 解析结果的二进制快照（.snap 旁路文件）
+保存逐行内容、频道起始行以及每个频道的名称/分组/tvg-id，
+字符串全部驻留在一张字符串表里，其余部分都是 uint32 数组。
+快照记录源文件内容的 SHA-256，哈希一致时直接加载，不再逐行解析。
+
+文件格式（小端）:
+    头部     : 魔数 b'M3USNAP1' | 源 SHA-256 (32 字节) | 末尾换行 uint32
+               | 字符串数 uint32 | 行数 uint32 | 频道数 uint32 | 字符串区字节数 uint32
+    字符串表 : 偏移数组 uint32[字符串数 + 1] | UTF-8 字节区
+    行       : 字符串编号 uint32[行数]
+    频道     : 起始行 uint32[频道数] | 名称 uint32[频道数] | 分组 uint32[频道数] | tvg-id uint32[频道数]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import struct
+import sys
+from array import array
+from collections import OrderedDict
+
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+MAGIC = b'M3USNAP1'
+SNAPSHOT_SUFFIX = '.snap'
+
+_HEADER = struct.Struct('<8s32sIIIII')
+_NAME_PATTERN = re.compile(r',(.+)$')
+_GROUP_PATTERN = re.compile(r'group-title="([^"]*)"')
+_TVG_ID_PATTERN = re.compile(r'tvg-id="([^"]*)"')
+
+def _uint32_array(values=()):
+    arr = array('I', values)
+    if arr.itemsize != 4:
+        arr = array('L', values)
+    return arr
+
+def _to_le_bytes(arr):
+    if sys.byteorder == 'big':
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr.tobytes()
+
+def _from_le_bytes(data):
+    arr = _uint32_array()
+    arr.frombytes(data)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+# --- 解析模型 ---
+class ParsedPlaylist:
+    """
+    解析后的播放列表
+
+    - lines: 原始行（已统一换行符，不含换行），行号 = 下标 + 1
+    - channel_starts: 每个频道 #EXTINF 行的下标
+    - names / groups / tvg_ids: 每个频道的显示名、group-title、tvg-id（已 strip）
+    """
+
+    def __init__(self, lines, trailing_newline, channel_starts, names, groups, tvg_ids, source_hash=None):
+        self.lines = lines
+        self.trailing_newline = trailing_newline
+        self.channel_starts = channel_starts
+        self.names = names
+        self.groups = groups
+        self.tvg_ids = tvg_ids
+        self.source_hash = source_hash
+
+    def header_lines(self):
+        """第一个 #EXTINF 之前的行"""
+        end = self.channel_starts[0] if self.channel_starts else len(self.lines)
+        return self.lines[:end]
+
+    def channel_ranges(self):
+        """产出 (频道编号, #EXTINF 行下标, 频道结束下标)，结束下标不含"""
+        starts = self.channel_starts
+        for index, start in enumerate(starts):
+            end = starts[index + 1] if index + 1 < len(starts) else len(self.lines)
+            yield index, start, end
+
+    def text(self):
+        """还原文本（换行符统一为 \\n）"""
+        text = '\n'.join(self.lines)
+        return text + '\n' if self.trailing_newline else text
+
+def parse_playlist(text, source_hash=None):
+    """从文本解析播放列表模型"""
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    trailing_newline = text.endswith('\n')
+    lines = text.split('\n')
+    if trailing_newline:
+        lines.pop()
+
+    channel_starts = [index for index, line in enumerate(lines) if line.strip().startswith('#EXTINF')]
+    return build_playlist(lines, trailing_newline, channel_starts, source_hash)
+
+def build_playlist(lines, trailing_newline, channel_starts, source_hash=None):
+    """由已知的行与频道起始行构建模型（只提取 #EXTINF 行的字段，不再逐行扫描）"""
+    names = []
+    groups = []
+    tvg_ids = []
+    for index in channel_starts:
+        stripped = lines[index].strip()
+        name_match = _NAME_PATTERN.search(stripped)
+        group_match = _GROUP_PATTERN.search(stripped)
+        tvg_match = _TVG_ID_PATTERN.search(stripped)
+        names.append(name_match.group(1).strip() if name_match else '')
+        groups.append(group_match.group(1).strip() if group_match else '')
+        tvg_ids.append(tvg_match.group(1).strip() if tvg_match else '')
+
+    return ParsedPlaylist(lines, trailing_newline, channel_starts, names, groups, tvg_ids, source_hash)
+
+# --- 快照读写 ---
+def snapshot_path(m3u_path):
+    return m3u_path + SNAPSHOT_SUFFIX
+
+def save_snapshot(playlist, path):
+    """写入快照；playlist.source_hash 必须是源文件内容的 SHA-256 (bytes)"""
+    strings = []
+    string_ids = {}
+
+    def intern(value):
+        sid = string_ids.get(value)
+        if sid is None:
+            sid = len(strings)
+            string_ids[value] = sid
+            strings.append(value)
+        return sid
+
+    line_ids = _uint32_array(intern(line) for line in playlist.lines)
+    name_ids = _uint32_array(intern(v) for v in playlist.names)
+    group_ids = _uint32_array(intern(v) for v in playlist.groups)
+    tvg_ids = _uint32_array(intern(v) for v in playlist.tvg_ids)
+
+    offsets = _uint32_array([0])
+    blob = bytearray()
+    for value in strings:
+        blob += value.encode('utf-8')
+        offsets.append(len(blob))
+
+    with M3UWriter(path, compress=[], snapshot=False) as writer:
+        writer.write_bytes(_HEADER.pack(
+            MAGIC, playlist.source_hash, int(playlist.trailing_newline),
+            len(strings), len(playlist.lines), len(playlist.channel_starts), len(blob)
+        ))
+        writer.write_bytes(_to_le_bytes(offsets))
+        writer.write_bytes(bytes(blob))
+        writer.write_bytes(_to_le_bytes(line_ids))
+        for arr in (_uint32_array(playlist.channel_starts), name_ids, group_ids, tvg_ids):
+            writer.write_bytes(_to_le_bytes(arr))
+
+def read_snapshot(path, expected_hash=None):
+    """读取快照；格式不符或源哈希不一致时返回 None"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+
+    magic, source_hash, trailing, n_strings, n_lines, n_channels, blob_size = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or (expected_hash is not None and source_hash != expected_hash):
+        return None
+    expected_size = _HEADER.size + 4 * (n_strings + 1) + blob_size + 4 * n_lines + 16 * n_channels
+    if len(data) != expected_size:
+        return None
+
+    pos = _HEADER.size
+    offsets = _from_le_bytes(data[pos:pos + 4 * (n_strings + 1)])
+    pos += 4 * (n_strings + 1)
+    blob = data[pos:pos + blob_size]
+    pos += blob_size
+    strings = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(n_strings)]
+
+    def take(count):
+        nonlocal pos
+        arr = _from_le_bytes(data[pos:pos + 4 * count])
+        pos += 4 * count
+        return arr
+
+    lines = [strings[i] for i in take(n_lines)]
+    channel_starts = list(take(n_channels))
+    names = [strings[i] for i in take(n_channels)]
+    groups = [strings[i] for i in take(n_channels)]
+    tvg_ids = [strings[i] for i in take(n_channels)]
+    return ParsedPlaylist(lines, bool(trailing), channel_starts, names, groups, tvg_ids, source_hash)
+
+# 进程内解析缓存：绝对路径 -> (文件状态, 源哈希, 解析模型)，文件状态见 _stat_key
+# 默认关闭；常驻进程（m3u_worker）开启后，多个命令读取同一文件只解析一次
+_memory_cache = None
+_memory_cache_limit = 0
+
+def enable_memory_cache(max_entries=8):
+    """开启进程内解析缓存，最多保留 max_entries 个文件（LRU）；max_entries 为 0 时关闭"""
+    global _memory_cache, _memory_cache_limit
+    _memory_cache = OrderedDict() if max_entries > 0 else None
+    _memory_cache_limit = max_entries
+
+def _stat_key(stat):
+    """
+    判断文件未变的状态: (inode, mtime_ns, ctime_ns, 大小)
+    原子替换（os.replace）会换 inode；ctime 随任何写入或元数据修改更新，且不能由 os.utime 回拨
+    """
+    return stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns, stat.st_size
+
+def memory_cache_info():
+    """[(路径, 行数, 频道数)]，缓存未开启时为空"""
+    if _memory_cache is None:
+        return []
+    return [(path, len(entry[2].lines), len(entry[2].channel_starts)) for path, entry in _memory_cache.items()]
+
+def load_playlist(m3u_path, use_snapshot=True):
+    """
+    加载播放列表：旁路快照存在且源哈希一致时直接使用，否则解析文本
+    哈希需要读一遍源文件，但不做逐行解析
+    开启进程内缓存时: inode、mtime、ctime 和大小都未变直接返回缓存；变了但内容哈希相同时沿用原解析模型。
+    返回的模型可能被后续调用共享，调用方不得修改
+    """
+    if _memory_cache is not None:
+        key = os.path.abspath(m3u_path)
+        stat_key = _stat_key(os.stat(m3u_path))
+        entry = _memory_cache.get(key)
+        if entry is not None and entry[0] == stat_key:
+            _memory_cache.move_to_end(key)
+            return entry[2]
+
+    with open(m3u_path, 'rb') as f:
+        raw = f.read()
+    source_hash = hashlib.sha256(raw).digest()
+
+    playlist = None
+    if _memory_cache is not None and entry is not None and entry[1] == source_hash:
+        playlist = entry[2]
+    if playlist is None and use_snapshot:
+        playlist = read_snapshot(snapshot_path(m3u_path), source_hash)
+    if playlist is None:
+        playlist = parse_playlist(raw.decode('utf-8'), source_hash)
+
+    if _memory_cache is not None:
+        _memory_cache[key] = (stat_key, source_hash, playlist)
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > _memory_cache_limit:
+            _memory_cache.popitem(last=False)
+    return playlist
+
+def write_snapshot_for(m3u_path):
+    """为 M3U 文件生成（或刷新）旁路快照"""
+    playlist = load_playlist(m3u_path, use_snapshot=False)
+    save_snapshot(playlist, snapshot_path(m3u_path))
+    return playlist
+
+def main():
+    parser = argparse.ArgumentParser(description="为 M3U 文件生成二进制解析快照（文件名.snap），或检查快照状态")
+    parser.add_argument('files', nargs='+', help='M3U 文件')
+    parser.add_argument('--check', action='store_true', help='只检查快照是否与源文件一致')
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.files:
+        try:
+            if args.check:
+                with open(path, 'rb') as f:
+                    source_hash = hashlib.sha256(f.read()).digest()
+                valid = read_snapshot(snapshot_path(path), source_hash) is not None
+                print(f"{'有效' if valid else '无效'}\t{path}")
+                failed += 0 if valid else 1
+            else:
+                playlist = write_snapshot_for(path)
+                print(f"已生成 {snapshot_path(path)}: {len(playlist.lines)} 行，{len(playlist.channel_starts)} 个频道",
+                      file=sys.stderr)
+        except Exception as e:
+            print(f"处理 '{path}' 失败: {e}", file=sys.stderr)
+            failed += 1
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+常驻工作进程
+在 Unix 套接字上接收与 iptvtool 相同的子命令并在进程内执行，省去每一步的解释器启动和模块导入；
+已解析的播放列表按 路径 + 文件状态 + 内容哈希 缓存在内存中（m3u_snapshot.load_playlist），
+经 load_playlist 读取输入的命令（m3u_merger、url_sorter、url_sortergr、extract、deduplicate、
+m3u_mergerng、rename_rules、m3u_diff、m3u_catalog 等）读取同一文件时只解析一次；
+deduplicate --stream、add_channel、m3u_header_tool 只流式读取或原样复制，不经过该缓存。
+
+    python m3u_worker.py &                       # 启动（默认套接字见 default_socket_path）
+    iptvtool --server extract --input a.m3u ...  # 由 worker 执行；worker 未运行时在本进程内执行
+    python m3u_worker.py --status / --stop
+
+命令逐个串行执行；客户端的工作目录、环境变量和 umask 在执行期间生效，标准输出/错误转发回客户端，
+退出码与直接运行相同。不转发标准输入。
+子命令模块中被命令重新赋值的模块级变量（如 url_sortergr 的 --debug / -v 设置的 DEBUG_MODE、LOG_LEVEL）
+在命令结束后恢复，不影响后续命令；原地修改的可变对象不在此列。
+注意：在模块导入时读取的环境变量以 worker 首次导入该模块时为准，需要按命令生效的应在 main() 中读取
+（url_sortergr 的 DEBUG / LOG_LEVEL 即如此）。
+"""
+
+import argparse
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+
+from m3u_profile import run_main
+from m3u_writer import read_umask
+
+ENV_SOCKET = 'M3U_WORKER_SOCKET'
+DEFAULT_CACHE_ENTRIES = 8
+# 需要长期运行或自身就是服务的子命令，始终在客户端本地执行
+LOCAL_ONLY_COMMANDS = {'m3u_worker', 'm3u_server', 'standin_server'}
+
+# 帧: 通道 1 字节 + 长度 uint32 + 数据；通道 b'1' 标准输出，b'2' 标准错误，b'x' 退出码
+_FRAME = struct.Struct('>cI')
+_FLUSH_SIZE = 64 * 1024
+
+def default_socket_path():
+    """$M3U_WORKER_SOCKET，默认为临时目录下按用户区分的 iptvtool-<uid>.sock"""
+    path = os.environ.get(ENV_SOCKET)
+    if path:
+        return path
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(os.environ.get('TMPDIR') or '/tmp', f"iptvtool-{uid}.sock")
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("连接已断开")
+        data.extend(chunk)
+    return bytes(data)
+
+def _recv_line(sock, limit=16 * 1024 * 1024):
+    data = bytearray()
+    while not data.endswith(b'\n'):
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("连接已断开")
+        data.extend(chunk)
+        if len(data) > limit:
+            raise ValueError("请求过大")
+    return bytes(data)
+
+class _FrameSink:
+    """把标准输出/错误的写入合并成帧发给客户端，保持两者的先后顺序（命令的工作线程也会输出，需加锁）"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.channel = None
+        self.parts = []
+        self.size = 0
+        self._lock = threading.Lock()
+
+    def write(self, channel, data):
+        with self._lock:
+            if channel != self.channel:
+                self._flush()
+                self.channel = channel
+            self.parts.append(data)
+            self.size += len(data)
+            if self.size >= _FLUSH_SIZE:
+                self._flush()
+
+    def _flush(self):
+        if self.parts:
+            data = b''.join(self.parts)
+            self.parts = []
+            self.size = 0
+            self.sock.sendall(_FRAME.pack(self.channel, len(data)) + data)
+
+    def finish(self, code):
+        data = str(code).encode('ascii')
+        with self._lock:
+            self._flush()
+            self.sock.sendall(_FRAME.pack(b'x', len(data)) + data)
+
+class _SinkStream:
+    """替换 sys.stdout / sys.stderr 的文本流"""
+
+    encoding = 'utf-8'
+    errors = 'replace'
+
+    def __init__(self, sink, channel):
+        self._sink = sink
+        self._channel = channel
+
+    def write(self, text):
+        self._sink.write(self._channel, text.encode('utf-8', 'replace'))
+        return len(text)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def _request_error(request):
+    """检查运行请求的格式，返回错误说明；格式正确时返回 None"""
+    from iptvtool import resolve_command
+
+    argv = request.get("argv")
+    if not isinstance(argv, list) or not argv or not all(isinstance(arg, str) for arg in argv):
+        return "argv 必须是非空的字符串列表"
+    if resolve_command(argv[0]) is None:
+        return f"未知的子命令 '{argv[0]}'"
+    if argv[0].replace('-', '_') in LOCAL_ONLY_COMMANDS:
+        return f"子命令 '{argv[0]}' 只能在本地执行"
+    if not isinstance(request.get("cwd") or '', str):
+        return "cwd 必须是字符串"
+    env = request.get("env")
+    if env is not None and not (isinstance(env, dict) and
+                                all(isinstance(k, str) and isinstance(v, str) for k, v in env.items())):
+        return "env 必须是字符串到字符串的映射"
+    umask = request.get("umask")
+    if umask is not None and not (type(umask) is int and 0 <= umask <= 0o777):
+        return "umask 必须是 0 到 0o777 之间的整数"
+    return None
+
+def _reply_error(conn, message):
+    """以标准错误 + 退出码 2 回复无效的请求"""
+    data = f"错误：无效的 worker 请求: {message}\n".encode('utf-8')
+    try:
+        conn.sendall(_FRAME.pack(b'2', len(data)) + data + _FRAME.pack(b'x', 1) + b'2')
+    except OSError:
+        pass
+
+def _restore_globals(module, saved):
+    """恢复命令执行期间被重新赋值的模块级变量；命令中新增的名称（如延迟导入的模块）保留"""
+    namespace = vars(module)
+    for name, value in saved.items():
+        if namespace.get(name, saved) is not value:
+            namespace[name] = value
+
+def _exit_code(exc):
+    if exc.code is None:
+        return 0
+    if isinstance(exc.code, int):
+        return exc.code
+    print(exc.code, file=sys.stderr)
+    return 1
+
+# --- 服务端 ---
+class Worker:
+    def __init__(self, socket_path, cache_entries=DEFAULT_CACHE_ENTRIES):
+        import m3u_snapshot
+
+        self.socket_path = socket_path
+        self.commands = 0
+        m3u_snapshot.enable_memory_cache(cache_entries)
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            if _ping(self.socket_path):
+                raise OSError(f"worker 已在运行: {self.socket_path}")
+            os.unlink(self.socket_path)  # 上次异常退出留下的套接字文件
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)  # 只允许当前用户连接
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(old_umask)
+        server.listen(16)
+        print(f"worker 已启动: {self.socket_path} (pid {os.getpid()})", file=sys.stderr, flush=True)
+        try:
+            while True:
+                conn, _ = server.accept()
+                with conn:
+                    if not self.handle(conn):
+                        break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def handle(self, conn):
+        """处理一个请求，返回 False 表示停止服务"""
+        try:
+            request = json.loads(_recv_line(conn))
+        except (ConnectionError, ValueError):
+            return True
+        if not isinstance(request, dict):
+            _reply_error(conn, "请求必须是 JSON 对象")
+            return True
+        action = request.get("action", "run")
+        if action in ('ping', 'status', 'stop'):
+            from m3u_snapshot import memory_cache_info
+
+            status = {"pid": os.getpid(), "commands": self.commands, "cache": memory_cache_info()}
+            data = (json.dumps(status, ensure_ascii=False) + '\n').encode('utf-8')
+            try:
+                conn.sendall(_FRAME.pack(b'1', len(data)) + data + _FRAME.pack(b'x', 1) + b'0')
+            except OSError:
+                pass
+            return action != 'stop'
+        if action != 'run':
+            _reply_error(conn, f"未知的 action '{action}'")
+            return True
+        error = _request_error(request)
+        if error:
+            _reply_error(conn, error)
+            return True
+
+        sink = _FrameSink(conn)
+        try:
+            code = self.run(request, sink)
+            sink.finish(code)
+        except OSError:
+            pass  # 客户端已断开
+        return True
+
+    def run(self, request, sink):
+        """在客户端的工作目录和环境下执行一条命令，返回退出码"""
+        import importlib
+        from iptvtool import resolve_command, run_command
+        from m3u_writer import set_umask
+
+        argv = request["argv"]
+        module = importlib.import_module(resolve_command(argv[0]))
+        saved_globals = dict(vars(module))
+        saved_cwd = os.getcwd()
+        saved_env = dict(os.environ)
+        saved_argv = list(sys.argv)
+        saved_streams = sys.stdout, sys.stderr
+        saved_umask = None
+        self.commands += 1
+        try:
+            sys.stdout = _SinkStream(sink, b'1')
+            sys.stderr = _SinkStream(sink, b'2')
+            try:
+                os.chdir(request.get("cwd") or saved_cwd)
+            except OSError as e:
+                print(f"错误：无法进入工作目录: {e}", file=sys.stderr)
+                return 2
+            if request.get("env") is not None:
+                os.environ.clear()
+                os.environ.update(request["env"])
+            if request.get("umask") is not None:
+                saved_umask = set_umask(request["umask"])
+            try:
+                run_command(argv[0], argv[1:])
+                return 0
+            except SystemExit as e:
+                return _exit_code(e)
+            except Exception:
+                import traceback
+                traceback.print_exc()
+                return 1
+        finally:
+            if saved_umask is not None:
+                set_umask(saved_umask)
+            _restore_globals(module, saved_globals)
+            sys.stdout, sys.stderr = saved_streams
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_env)
+            os.chdir(saved_cwd)
+
+# --- 客户端 ---
+def _connect(socket_path, timeout=None):
+    if not hasattr(socket, 'AF_UNIX'):
+        raise OSError("当前平台不支持 Unix 套接字")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def _send_request(sock, request, stdout, stderr):
+    """发送请求并转发输出帧，返回退出码"""
+    sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+    outputs = {b'1': stdout, b'2': stderr}
+    while True:
+        channel, size = _FRAME.unpack(_recv_exact(sock, _FRAME.size))
+        data = _recv_exact(sock, size)
+        if channel == b'x':
+            return int(data)
+        outputs[channel].write(data)
+        outputs[channel].flush()
+
+def _ping(socket_path):
+    try:
+        with _connect(socket_path, timeout=2) as sock:
+            sock.sendall(b'{"action": "ping"}\n')
+            sock.recv(1)
+        return True
+    except OSError:
+        return False
+
+def run_remote(argv, socket_path=None):
+    """
+    交给 worker 执行 argv（[子命令, 参数...]）
+    :return: 退出码；worker 未运行（无法连接）时返回 None，由调用方在本地执行
+    """
+    if argv and argv[0].replace('-', '_') in LOCAL_ONLY_COMMANDS:
+        return None
+    try:
+        sock = _connect(socket_path or default_socket_path())
+    except OSError:
+        return None
+    with sock:
+        request = {"argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ), "umask": read_umask()}
+        try:
+            return _send_request(sock, request, sys.stdout.buffer, sys.stderr.buffer)
+        except (OSError, ConnectionError, struct.error) as e:
+            # 命令可能已部分执行，不在本地重试
+            print(f"错误：与 worker 的连接中断: {e}", file=sys.stderr)
+            return 1
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="常驻工作进程：在 Unix 套接字上执行 iptvtool 子命令，并在内存中缓存已解析的播放列表",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('-s', '--socket', help=f"套接字路径（默认: ${ENV_SOCKET} 或 {default_socket_path()}）")
+    parser.add_argument('--cache', type=int, default=DEFAULT_CACHE_ENTRIES,
+                        help=f"缓存的播放列表数 (默认: {DEFAULT_CACHE_ENTRIES})")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help="查看运行中的 worker 状态")
+    group.add_argument('--stop', action='store_true', help="停止运行中的 worker")
+    args = parser.parse_args()
+
+    socket_path = args.socket or default_socket_path()
+    if not hasattr(socket, 'AF_UNIX'):
+        print("错误：当前平台不支持 Unix 套接字", file=sys.stderr)
+        sys.exit(1)
+
+    if args.status or args.stop:
+        try:
+            with _connect(socket_path, timeout=10) as sock:
+                request = {"action": 'stop' if args.stop else 'status'}
+                sys.exit(_send_request(sock, request, sys.stdout.buffer, sys.stderr.buffer))
+        except (OSError, ConnectionError) as e:
+            print(f"错误：无法连接 worker '{socket_path}': {e}", file=sys.stderr)
+            sys.exit(1)
+
+    try:
+        Worker(socket_path, args.cache).serve_forever()
+    except OSError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run_main(main)
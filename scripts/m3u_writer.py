@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+共用的 M3U 输出写入器
+大块缓冲写入，先写临时文件再 os.replace 原子替换；
+可在同一次写入中同时生成 .gz / .zst / .br 压缩副本。
+
+环境变量（未通过参数指定时生效）:
+    M3U_COMPRESS        压缩副本格式，逗号分隔，如 "gz,zst"
+    M3U_COMPRESS_LEVEL  压缩级别，一个整数作用于所有格式，或 "gz=9,zst=19"
+    M3U_FSYNC           为 1/true/yes 时替换前 fsync 文件和目录
+    M3U_SNAPSHOT        为 1/true/yes 时，由持有解析模型的调用方（如 m3u_merger）
+                        通过 save_snapshot() 在输出旁保存解析快照（见 m3u_snapshot.py）
+"""
+
+import argparse
+import gzip
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+
+from m3u_profile import run_main
+
+DEFAULT_BUFFER_SIZE = 1 << 20
+COMPRESS_FORMATS = ('gz', 'zst', 'br')
+DEFAULT_LEVELS = {'gz': 9, 'zst': 19, 'br': 11}
+
+def read_umask():
+    """读取进程 umask（只能先改再改回，不要在多线程写入期间调用）"""
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# 新文件权限用的 umask，导入时读取一次：os.umask 只能先改再改回，是进程级操作，
+# 在多个线程同时提交时（如 m3u_header_tool 的线程池）调用会互相干扰
+_UMASK = read_umask()
+
+def set_umask(mask):
+    """设置进程 umask 并同步新文件权限所用的值，返回原 umask（m3u_worker 按命令应用客户端的 umask）"""
+    global _UMASK
+    previous = os.umask(mask)
+    _UMASK = mask
+    return previous
+
+# --- 压缩副本 ---
+class _GzipSink:
+    def __init__(self, f, level):
+        # mtime=0 使相同内容得到相同的压缩文件
+        self._gz = gzip.GzipFile(filename='', mode='wb', fileobj=f, compresslevel=level, mtime=0)
+
+    def write(self, data):
+        self._gz.write(data)
+
+    def close(self):
+        self._gz.close()
+
+class _ZstdSink:
+    def __init__(self, f, level):
+        import zstandard
+        self._zstd = zstandard
+        self._writer = zstandard.ZstdCompressor(level=level).stream_writer(f, closefd=False)
+
+    def write(self, data):
+        self._writer.write(data)
+
+    def close(self):
+        self._writer.flush(self._zstd.FLUSH_FRAME)
+        self._writer.close()
+
+class _BrotliSink:
+    def __init__(self, f, level):
+        import brotli
+        self._f = f
+        self._compressor = brotli.Compressor(quality=level)
+
+    def write(self, data):
+        self._f.write(self._compressor.process(data))
+
+    def close(self):
+        self._f.write(self._compressor.finish())
+
+_SINKS = {'gz': _GzipSink, 'zst': _ZstdSink, 'br': _BrotliSink}
+
+# --- 配置解析 ---
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+def parse_compress(value):
+    """解析压缩格式列表，如 "gz,zst" / ["gz"]；未知格式报错"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    formats = []
+    for fmt in value:
+        fmt = fmt.strip().lower().lstrip('.')
+        if not fmt:
+            continue
+        if fmt not in COMPRESS_FORMATS:
+            raise ValueError(f"不支持的压缩格式 '{fmt}'（可选: {', '.join(COMPRESS_FORMATS)}）")
+        if fmt not in formats:
+            formats.append(fmt)
+    return formats
+
+def parse_levels(value):
+    """解析压缩级别: 整数（作用于所有格式）或 "gz=9,zst=19"，返回 {格式: 级别}"""
+    levels = dict(DEFAULT_LEVELS)
+    if value is None or value == '':
+        return levels
+    if isinstance(value, int):
+        return {fmt: value for fmt in COMPRESS_FORMATS}
+    if isinstance(value, dict):
+        levels.update(value)
+        return levels
+    value = str(value).strip()
+    if '=' not in value:
+        return {fmt: int(value) for fmt in COMPRESS_FORMATS}
+    for item in value.split(','):
+        fmt, _, level = item.partition('=')
+        levels[fmt.strip().lower()] = int(level)
+    return levels
+
+def _fsync_dir(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# --- 写入器 ---
+class M3UWriter:
+    """
+    缓冲写入 + 原子替换；输出文件与输入文件相同也安全
+
+    用法:
+        with M3UWriter(path) as w:
+            w.write_line('#EXTM3U')
+            ...
+    正常退出时提交（替换目标文件），异常时删除临时文件、保留原文件
+
+    启用快照时边写边计算内容的 SHA-256，提交后调用方可用 save_snapshot()
+    把手中已有的模型存为快照，提交时不会回读、重新解析刚写出的文件
+    """
+
+    def __init__(self, path, compress=None, level=None, fsync=None, snapshot=None, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.compress = parse_compress(os.environ.get('M3U_COMPRESS') if compress is None else compress)
+        self.levels = parse_levels(os.environ.get('M3U_COMPRESS_LEVEL') if level is None else level)
+        self.fsync = _env_flag('M3U_FSYNC') if fsync is None else fsync
+        self.snapshot = _env_flag('M3U_SNAPSHOT') if snapshot is None else snapshot
+
+        self._pieces = []
+        self._pending = 0
+        self._hash = hashlib.sha256() if self.snapshot else None
+        self.source_hash = None
+        self._outputs = []  # [(目标路径, 临时路径, 文件对象, 压缩器或 None)]
+        self._closed = False
+
+        try:
+            self._outputs.append(self._open_temp(path) + (None,))
+            for fmt in self.compress:
+                target = f"{path}.{fmt}"
+                target, temp_path, f = self._open_temp(target)
+                try:
+                    sink = _SINKS[fmt](f, self.levels.get(fmt, DEFAULT_LEVELS[fmt]))
+                except ImportError:
+                    f.close()
+                    os.unlink(temp_path)
+                    print(f"警告: 未安装 {fmt} 压缩所需的模块，跳过 '{target}'", file=sys.stderr)
+                    continue
+                self._outputs.append((target, temp_path, f, sink))
+        except Exception:
+            self.abort()
+            raise
+
+    @staticmethod
+    def _open_temp(target):
+        target_dir = os.path.dirname(os.path.abspath(target))
+        suffix = os.path.splitext(target)[1] or '.m3u'
+        fd, temp_path = tempfile.mkstemp(dir=target_dir, suffix=suffix, prefix='.tmp_')
+        return target, temp_path, os.fdopen(fd, 'wb')
+
+    # --- 写入 ---
+    def write(self, text):
+        self._pieces.append(text)
+        self._pending += len(text)
+        if self._pending >= self.buffer_size:
+            self.flush()
+
+    def write_line(self, line):
+        self.write(line + '\n')
+
+    def write_lines(self, lines):
+        for line in lines:
+            self.write(line + '\n')
+
+    def write_bytes(self, data):
+        """写入已编码的字节"""
+        self.flush()
+        self._write_bytes(data)
+
+    def _write_bytes(self, data):
+        if self._hash is not None:
+            self._hash.update(data)
+        for _, _, f, sink in self._outputs:
+            if sink is None:
+                f.write(data)
+            else:
+                sink.write(data)
+
+    def flush(self):
+        if self._pieces:
+            data = ''.join(self._pieces).encode('utf-8')
+            self._pieces = []
+            self._pending = 0
+            self._write_bytes(data)
+
+    def copy_from(self, fileobj, chunk_size=DEFAULT_BUFFER_SIZE):
+        """从二进制流原样复制内容（如已编码的 M3U 文件）"""
+        self.flush()
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            self._write_bytes(chunk)
+
+    # --- 提交 / 放弃 ---
+    def commit(self):
+        """写完缓冲、关闭并原子替换所有目标文件"""
+        if self._closed:
+            return
+        try:
+            self.flush()
+            for _, _, f, sink in self._outputs:
+                if sink is not None:
+                    sink.close()
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                f.close()
+            for target, temp_path, _, _ in self._outputs:
+                if os.path.exists(target):
+                    shutil.copymode(target, temp_path)
+                else:
+                    os.chmod(temp_path, 0o666 & ~_UMASK)
+                os.replace(temp_path, target)
+            if self.fsync:
+                _fsync_dir(self.path)
+        except Exception:
+            self.abort()
+            raise
+        self._closed = True
+        if self._hash is not None:
+            self.source_hash = self._hash.digest()
+
+    def save_snapshot(self, playlist):
+        """
+        提交后把与写出内容一致的模型保存为旁路快照（未启用快照时不做任何事）
+        模型由调用方提供，这里只补上写入时算出的源哈希
+        """
+        if not self.snapshot or self.source_hash is None:
+            return False
+        from m3u_snapshot import save_snapshot, snapshot_path
+        playlist.source_hash = self.source_hash
+        try:
+            save_snapshot(playlist, snapshot_path(self.path))
+        except Exception as e:
+            print(f"警告: 无法生成解析快照: {e}", file=sys.stderr)
+            return False
+        return True
+
+    def abort(self):
+        """放弃写入，删除临时文件，目标文件保持不变"""
+        for _, temp_path, f, _ in self._outputs:
+            try:
+                f.close()
+            except Exception:
+                pass
+            if os.path.exists(temp_path):
+                try:
+                    os.unlink(temp_path)
+                except OSError:
+                    pass
+        self._outputs = []
+        self._closed = True
+
+    @property
+    def outputs(self):
+        """所有目标文件路径（含压缩副本）"""
+        return [target for target, _, _, _ in self._outputs]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+def write_lines(path, lines, **kwargs):
+    """按行写入（每行补换行符）"""
+    with M3UWriter(path, **kwargs) as writer:
+        writer.write_lines(lines)
+
+def write_text(path, text, **kwargs):
+    """原样写入整段文本"""
+    with M3UWriter(path, **kwargs) as writer:
+        writer.write(text)
+
+def main():
+    parser = argparse.ArgumentParser(description="为已有 M3U 文件生成压缩副本（.gz/.zst/.br）")
+    parser.add_argument('files', nargs='+', help='M3U 文件')
+    parser.add_argument('-c', '--compress', default='gz', help='压缩格式，逗号分隔 (默认: gz)')
+    parser.add_argument('-l', '--level', help='压缩级别，整数或 "gz=9,zst=19"')
+    parser.add_argument('--fsync', action='store_true', help='替换前 fsync')
+    args = parser.parse_args()
+
+    try:
+        formats = parse_compress(args.compress)
+        levels = parse_levels(args.level)
+    except ValueError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    failed = 0
+    for path in args.files:
+        try:
+            # 原文件本身也经写入器重写一遍，保证与压缩副本内容一致
+            with open(path, 'rb') as f, M3UWriter(path, compress=formats, level=levels, fsync=args.fsync or None) as writer:
+                writer.copy_from(f)
+            print(f"已生成: {', '.join(writer.outputs[1:]) or '(无)'}", file=sys.stderr)
+        except Exception as e:
+            print(f"处理 '{path}' 失败: {e}", file=sys.stderr)
+            failed += 1
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    run_main(main)
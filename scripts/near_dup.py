@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+近似重复频道检测
+频道名拆为特征（拉丁词 + 中文字符 n-gram），通过倒排索引生成候选，
+只对共享罕见特征的频道计算相似度（Dice 系数），避免两两比较。
+"""
+
+import argparse
+import re
+import sys
+import unicodedata
+from functools import lru_cache
+
+from m3u_profile import run_main
+
+_DIGITS_PATTERN = re.compile(r'\d+')
+_TOKEN_PATTERN = re.compile(r'[0-9A-Z]+|[^\W\d_A-Z]+')
+
+# 不区分频道的通用词：比较前去掉
+STOP_WORDS = {'TV', 'HD', 'SD', 'FHD', 'UHD', 'HDR', '4K', '720P', '1080P', '576P', 'BY', 'CHANNEL'}
+CJK_STOP_WORDS = ('电视台', '卫视', '频道', '超高清', '高清', '超清', '标清')
+# 默认相似度阈值（Dice 系数），m3u_merger 的 --fuzzy-threshold 共用；
+# 合并器可据此自动合并，取偏保守的值
+DEFAULT_THRESHOLD = 0.85
+# 比较特征缓存的条数上限（常驻进程中内存不无限增长）
+FEATURE_CACHE_SIZE = 1 << 16
+
+# --- 辅助函数：提取比较特征 ---
+@lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def name_features(name, n=2):
+    """
+    将频道名拆分为比较特征：拉丁字母/数字按整词，中文等按字符 n-gram
+    去掉通用词（TV、卫视、高清…）和中文词尾的'台'，结果会被缓存（LRU，最多 FEATURE_CACHE_SIZE 条）
+    """
+    text = unicodedata.normalize('NFKC', name or '').upper()
+    features = set()
+    for token in _TOKEN_PATTERN.findall(text):
+        if token.isascii():
+            if token not in STOP_WORDS:
+                features.add(token)
+            continue
+        for word in CJK_STOP_WORDS:
+            token = token.replace(word, '')
+        if token.endswith('台') and len(token) > 2:
+            token = token[:-1]
+        if len(token) < n:
+            if token:
+                features.add(token)
+        else:
+            features.update(token[i:i + n] for i in range(len(token) - n + 1))
+    return frozenset(features)
+
+def name_digits(name):
+    """频道名中的数字序列（台号等），数字不同的频道不视为近似"""
+    return tuple(_DIGITS_PATTERN.findall(unicodedata.normalize('NFKC', name or '')))
+
+def dice_similarity(features_a, features_b):
+    if not features_a or not features_b:
+        return 0.0
+    return 2.0 * len(features_a & features_b) / (len(features_a) + len(features_b))
+
+class NgramIndex:
+    """
+    特征倒排索引: 特征 -> [条目编号]
+    出现次数超过 max_postings 的特征（如 "PLUTO"、"CC"）不参与候选生成，
+    保证每次查询的开销与总条目数无关。
+    """
+
+    def __init__(self, max_postings=100):
+        self.max_postings = max_postings
+        self.postings = {}
+        self.features = []
+        self.digits = []
+
+    def add(self, features, digits):
+        """加入一个条目，返回其条目编号"""
+        item_id = len(self.features)
+        self.features.append(features)
+        self.digits.append(digits)
+        for feature in features:
+            self.postings.setdefault(feature, []).append(item_id)
+        return item_id
+
+    def best_match(self, features, digits, threshold):
+        """
+        返回相似度最高且不低于 threshold 的 (条目编号, 相似度)，没有则返回 None
+        台号等数字不同的频道（CCTV1 / CCTV10）直接排除
+        """
+        candidates = set()
+        for feature in features:
+            posting = self.postings.get(feature)
+            if posting and len(posting) <= self.max_postings:
+                candidates.update(posting)
+
+        best = None
+        for item_id in candidates:
+            if self.digits[item_id] != digits:
+                continue
+            score = dice_similarity(features, self.features[item_id])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (item_id, score)
+        return best
+
+def find_near_duplicates(names, threshold=DEFAULT_THRESHOLD, n=2, max_postings=100):
+    """
+    在 names 中查找近似重复（先到先得的代表聚类，不做传递合并）
+
+    每个名称只与已有的代表比较；命中则归入该代表，否则自己成为新代表。
+    :return: [(代表下标, 成员下标, 相似度)]，下标为 names 中的位置
+    """
+    index = NgramIndex(max_postings=max_postings)
+    representatives = []
+    pairs = []
+
+    for pos, name in enumerate(names):
+        features = name_features(name, n)
+        if not features:
+            continue
+        digits = name_digits(name)
+        match = index.best_match(features, digits, threshold)
+        if match:
+            item_id, score = match
+            pairs.append((representatives[item_id], pos, score))
+        else:
+            index.add(features, digits)
+            representatives.append(pos)
+
+    return pairs
+
+def group_pairs(pairs):
+    """将候选对按代表归组，返回 {代表下标: [(成员下标, 相似度)...]}"""
+    clusters = {}
+    for root, member, score in pairs:
+        clusters.setdefault(root, []).append((member, score))
+    return clusters
+
+def format_report(names, pairs):
+    """生成文本报告，每簇一行：代表名 <= 成员名 (相似度)"""
+    lines = []
+    for root, members in sorted(group_pairs(pairs).items()):
+        others = ', '.join(f"{names[m]} ({score:.2f})" for m, score in members)
+        lines.append(f"{names[root]} <= {others}")
+    return lines
+
+def read_channel_names(filepath):
+    """按出现顺序读取 M3U 中的频道显示名（去重）"""
+    names = []
+    seen = set()
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith('#EXTINF') and ',' in line:
+                name = line.rsplit(',', 1)[1].strip()
+                if name and name not in seen:
+                    seen.add(name)
+                    names.append(name)
+    return names
+
+def main():
+    parser = argparse.ArgumentParser(description="近似重复频道报告：基于特征倒排索引查找命名不一致的同一频道")
+    parser.add_argument('-i', '--input', nargs='+', required=True, help="一个或多个输入M3U文件")
+    parser.add_argument('-t', '--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"相似度阈值 (Dice 系数, 默认: {DEFAULT_THRESHOLD})")
+    parser.add_argument('-n', '--ngram', type=int, default=2, help="n-gram 长度 (默认: 2)")
+    parser.add_argument('--max-postings', type=int, default=100,
+                        help="出现次数超过该值的特征不参与候选生成 (默认: 100)")
+    args = parser.parse_args()
+
+    names = []
+    seen = set()
+    for filepath in args.input:
+        try:
+            for name in read_channel_names(filepath):
+                if name not in seen:
+                    seen.add(name)
+                    names.append(name)
+        except Exception as e:
+            print(f"错误：无法读取文件 {filepath}: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    pairs = find_near_duplicates(names, args.threshold, args.ngram, max_postings=args.max_postings)
+    for line in format_report(names, pairs):
+        print(line)
+
+    print(f"共 {len(names)} 个频道名，发现 {len(pairs)} 组近似重复候选", file=sys.stderr)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -1,19 +1,22 @@
-import requests
 import re
 import os
 import sys
-import tempfile
-import shutil
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 from urllib.parse import urljoin
 import argparse
 
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
 def get_final_url(url, max_redirects=10, timeout=5):
     """
     获取 URL 的最终重定向地址，并在获取到响应头后检查 Content-Type。
     如果检测到视频内容（包括HLS播放列表），则中止下载响应体。
     """
+    # 延迟导入：--help 和参数错误时不必加载 requests（约 80ms）
+    import requests
+
     current_url = url
     redirect_count = 0
 
@@ -132,52 +135,14 @@ def safe_write_output(lines, input_path, output_path):
     :param output_path: 输出文件路径
     :return: (success, temp_path) 成功返回(True, None)，失败返回(False, temp_path)
     """
-    # 获取绝对路径以判断是否为同一个文件
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
-    is_same_file = input_abs == output_abs
-    
-    temp_path = None
-    
     try:
-        # 如果是同一个文件，先写到临时文件
-        if is_same_file:
-            # 在与输出文件相同目录创建临时文件
-            output_dir = os.path.dirname(output_path) or '.'
-            fd, temp_path = tempfile.mkstemp(
-                dir=output_dir,
-                suffix='.m3u',
-                prefix='.tmp_',
-                text=True
-            )
-            
-            # 使用文件描述符打开文件
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            # 直接打开输出文件
-            out_f = open(output_path, 'w', encoding='utf-8')
-        
-        # 写入数据
-        with out_f:
-            out_f.write('\n'.join(lines))
-        
-        # 如果是同一个文件，进行原子替换
-        if is_same_file:
-            try:
-                # Python 3.3+ 推荐使用 os.replace 实现原子替换
-                os.replace(temp_path, output_path)
-                temp_path = None  # 替换成功，清除临时文件引用
-            except Exception as e:
-                # 如果 os.replace 失败，使用 shutil.move 作为备选
-                print(f"警告：原子替换失败，使用备选方案: {e}")
-                shutil.move(temp_path, output_path)
-                temp_path = None  # 移动成功，清除临时文件引用
-        
+        with M3UWriter(output_path) as writer:
+            writer.write('\n'.join(lines))
         return True, None
         
     except Exception as e:
         print(f"写入文件失败: {e}")
-        return False, temp_path
+        return False, None
 
 def validate_arguments(input_path, output_path):
     """
@@ -335,7 +300,7 @@ def parse_arguments():
     
     return parser.parse_args()
 
-if __name__ == "__main__":
+def main():
     args = parse_arguments()
     
     # 验证参数
@@ -353,3 +318,6 @@ if __name__ == "__main__":
     
     if not success:
         sys.exit(1)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,252 @@
+import argparse
+import json
+import sys
+import re
+import os
+
+from channel_alias import normalize_channel_name
+from m3u_snapshot import load_playlist
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+# 规则文件格式 (JSON):
+# {
+#   "channels": [
+#     {"name": "CCTV5", "url_keywords": ["CCTV-5%2B"], "rename": "CCTV5+"},
+#     {"name": "CCTV", "contains": true, "url_keywords": ["cctv5p"], "rename": "CCTV5+"}
+#   ],
+#   "groups": [
+#     {"name": "央视", "contains": true, "rename": "央视"}
+#   ]
+# }
+# - name: 频道名 / 组名。默认按别名索引归一化后的名称精确匹配（哈希索引，一次查找）
+# - contains: 为 true 时按子串匹配，不区分大小写（仅在精确索引未命中时依次检查）
+# - url_keywords: 可选，频道下任一 URL 包含任一关键字时规则才生效 (不区分大小写)
+# 子串和 URL 关键字的匹配方式与 url_sortergr 相同
+# - rename: 新名称
+
+# --- 辅助函数：名称归一化 ---
+def normalize_name(name):
+    """与频道别名索引共用归一化流水线，用作规则索引的 Key"""
+    return normalize_channel_name(name)
+
+# --- 辅助函数：读取单条规则 ---
+def _parse_rule(raw, kind, index):
+    name = str(raw.get("name", "")).strip()
+    rename = raw.get("rename")
+    if not name or not rename:
+        raise ValueError(f"{kind} 第 {index + 1} 条规则缺少 name 或 rename")
+
+    keywords = raw.get("url_keywords") or []
+    if isinstance(keywords, str):
+        keywords = keywords.split(',')
+    keywords = [k.strip().lower() for k in keywords if k and k.strip()]
+
+    return {
+        "id": f"{kind}[{index}]",
+        "name": name,
+        "key": normalize_name(name),
+        "name_lower": name.lower(),
+        "contains": bool(raw.get("contains", False)),
+        "url_keywords": keywords,
+        "rename": str(rename).strip(),
+    }
+
+def load_rules(rules_path):
+    """
+    读取规则文件并建立索引
+
+    :return: {"channels": (index, contains_rules), "groups": (index, contains_rules)}
+             index 结构: { 归一化名称: [rule, ...] }，保持规则文件中的先后顺序
+    """
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        raw_rules = json.load(f)
+
+    compiled = {}
+    for kind in ("channels", "groups"):
+        index = {}
+        contains_rules = []
+        for i, raw in enumerate(raw_rules.get(kind, [])):
+            rule = _parse_rule(raw, kind, i)
+            if rule["contains"]:
+                contains_rules.append(rule)
+            else:
+                index.setdefault(rule["key"], []).append(rule)
+        compiled[kind] = (index, contains_rules)
+    return compiled
+
+def _url_condition_met(rule, urls):
+    if not rule["url_keywords"]:
+        return True
+    return any(kw in url.lower() for url in urls for kw in rule["url_keywords"])
+
+def find_rule(compiled_kind, name, urls):
+    """先查精确索引（一次哈希查找），未命中再检查子串规则"""
+    index, contains_rules = compiled_kind
+    for rule in index.get(normalize_name(name), ()):
+        if _url_condition_met(rule, urls):
+            return rule
+    if contains_rules:
+        name_lower = name.lower()
+        for rule in contains_rules:
+            if rule["name_lower"] in name_lower and _url_condition_met(rule, urls):
+                return rule
+    return None
+
+# --- 辅助函数：改写 EXTINF ---
+def rename_inf(inf_line, name):
+    # 同步更新 tvg-name 属性
+    if 'tvg-name="' in inf_line:
+        inf_line = re.sub(r'tvg-name="[^"]*"', lambda m: f'tvg-name="{name}"', inf_line)
+    # 更新末尾显示名称
+    if ',' in inf_line:
+        parts = inf_line.rsplit(',', 1)
+        return f"{parts[0]},{name}"
+    return f"{inf_line},{name}"
+
+def regroup_inf(inf_line, group):
+    if 'group-title="' in inf_line:
+        return re.sub(r'group-title="[^"]*"', lambda m: f'group-title="{group}"', inf_line)
+    if ',' in inf_line:
+        parts = inf_line.rsplit(',', 1)
+        return f'{parts[0]} group-title="{group}",{parts[1]}'
+    return inf_line
+
+def apply_rename_rules(input_file, compiled):
+    """
+    单次遍历完成所有频道重命名和组重命名
+
+    :return: (output_lines, hit_counts, total_channels)，读取失败时 output_lines 为 None
+    """
+    try:
+        lines = [line.strip() for line in load_playlist(input_file).lines if line.strip()]
+    except Exception as e:
+        print(f"Error: 无法读取输入文件: {e}")
+        return None, {}, 0
+
+    output_lines = []
+    hit_counts = {}
+    total_channels = 0
+
+    def flush(inf, rest):
+        nonlocal total_channels
+        total_channels += 1
+        urls = [line for line in rest if "://" in line and not line.startswith('#')]
+
+        name = inf.rsplit(',', 1)[1].strip() if ',' in inf else ""
+        rule = find_rule(compiled["channels"], name, urls)
+        if rule:
+            inf = rename_inf(inf, rule["rename"])
+            hit_counts[rule["id"]] = hit_counts.get(rule["id"], 0) + 1
+
+        group_match = re.search(r'group-title="([^"]*)"', inf)
+        group = group_match.group(1).strip() if group_match else ""
+        new_group = None
+        if group:
+            rule = find_rule(compiled["groups"], group, urls)
+            if rule:
+                new_group = rule["rename"]
+                inf = regroup_inf(inf, new_group)
+                hit_counts[rule["id"]] = hit_counts.get(rule["id"], 0) + 1
+
+        output_lines.append(inf)
+        for line in rest:
+            if new_group and line.startswith('#EXTGRP:'):
+                line = f"#EXTGRP:{new_group}"
+            output_lines.append(line)
+
+    current_inf = None
+    current_rest = []
+    for line in lines:
+        if line.startswith('#EXTINF'):
+            if current_inf:
+                flush(current_inf, current_rest)
+            current_inf = line
+            current_rest = []
+        elif current_inf:
+            current_rest.append(line)
+        else:
+            # 文件头及首个频道之前的行原样保留
+            output_lines.append(line)
+    if current_inf:
+        flush(current_inf, current_rest)
+
+    return output_lines, hit_counts, total_channels
+
+def safe_write_output(lines, input_path, output_path):
+    """
+    安全地写入输出文件，支持同文件覆盖
+
+    :return: (success, temp_path) 成功返回(True, None)，失败返回(False, temp_path)
+    """
+    try:
+        with M3UWriter(output_path) as writer:
+            writer.write_lines(lines)
+        return True, None
+
+    except Exception as e:
+        print(f"写入文件失败: {e}")
+        return False, None
+
+def cleanup_temp_file(temp_path):
+    """
+    清理临时文件
+    """
+    if temp_path and os.path.exists(temp_path):
+        try:
+            os.unlink(temp_path)
+            print(f"已清理临时文件: {temp_path}")
+        except Exception as e:
+            print(f"警告：无法删除临时文件 {temp_path}: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(description="M3U 批量重命名工具：按规则文件一次完成频道名和频道组重命名")
+    parser.add_argument("-i", "--input", required=True, help="输入文件路径")
+    parser.add_argument("-o", "--output", required=True, help="输出文件路径")
+    parser.add_argument("-R", "--rules", required=True, help="重命名规则文件 (JSON)")
+    parser.add_argument("--force", action="store_true", help="强制覆盖输出文件（如果已存在且与输入不同）")
+
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.input):
+        print(f"错误：输入文件 '{args.input}' 不存在")
+        sys.exit(1)
+
+    input_abs = os.path.abspath(args.input)
+    output_abs = os.path.abspath(args.output)
+    if os.path.exists(args.output) and input_abs != output_abs and not args.force:
+        print(f"错误：输出文件 '{args.output}' 已存在")
+        print("使用 --force 参数强制覆盖，或指定不同的输出文件")
+        sys.exit(1)
+
+    try:
+        compiled = load_rules(args.rules)
+    except Exception as e:
+        print(f"错误：无法加载规则文件 '{args.rules}': {e}")
+        sys.exit(1)
+
+    output_lines, hit_counts, total_channels = apply_rename_rules(args.input, compiled)
+    if output_lines is None:
+        sys.exit(1)
+
+    success, temp_path = safe_write_output(output_lines, args.input, args.output)
+    if not success:
+        cleanup_temp_file(temp_path)
+        print("处理失败！")
+        sys.exit(1)
+
+    print(f"✅ 处理成功！")
+    print(f"   输入文件: {args.input}")
+    print(f"   输出文件: {args.output}")
+    print(f"   频道统计: {total_channels} 个频道")
+    for kind in ("channels", "groups"):
+        index, contains_rules = compiled[kind]
+        rules = [r for bucket in index.values() for r in bucket] + contains_rules
+        for rule in sorted(rules, key=lambda r: int(r["id"].split('[')[1][:-1])):
+            print(f"   {rule['id']} '{rule['name']}' -> '{rule['rename']}': 命中 {hit_counts.get(rule['id'], 0)} 次")
+
+    if input_abs == output_abs:
+        print(f"   注意: 已安全覆盖原文件")
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+本地上游替身服务器
+模拟直播源上游，用于在不访问真实主机的情况下测试 rdfinurl.py 等脚本的解析性能:
+    /<主机>/live/<编号>                 入口地址，按配置经过 0~N 次重定向（可跨主机）
+    /<主机>/hls/<编号>/master.m3u8      HLS 主播放列表（多码率）
+    /<主机>/hls/<编号>/<码率>/index.m3u8 直播媒体播放列表（滑动窗口）
+    /<主机>/hls/<编号>/<码率>/<序号>.ts  分片 (video/mp2t)
+    /_playlist.m3u?n=1000               生成指向本服务器的测试播放列表
+    /_stats[?reset=1]                   请求统计（JSON），reset=1 时同时清零
+
+每个主机可单独配置延迟分布、重定向次数、失败率、超时率和 429 限流率。
+同一路径第 k 次请求的行为只由 (种子, 路径, k) 决定，相同的请求序列得到相同的结果。
+
+配置文件 (JSON) 示例:
+    {
+      "hosts": 20,
+      "default": {"latency_ms": [10, 100], "redirects": [0, 3], "fail_rate": 0.02,
+                  "timeout_rate": 0.002, "throttle_rate": 0.01},
+      "overrides": {"h0": {"latency_ms": [80, 800]}, "h1": {"fail_rate": 0.2}}
+    }
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from m3u_profile import run_main
+
+DEFAULT_PROFILE = {
+    "latency_ms": [10, 100],    # [中位数, P99]，对数正态分布
+    "redirects": [0, 3],        # 每个入口地址的重定向次数范围
+    "cross_host": 0.5,          # 重定向跳到其他主机的概率
+    "fail_rate": 0.02,          # 失败概率（一半返回 503，一半直接断开连接）
+    "timeout_rate": 0.002,      # 挂起 hang 秒后才响应的概率
+    "throttle_rate": 0.01,      # 返回 429 的概率
+    "retry_after": 1,           # 429 的 Retry-After 秒数
+    "html_rate": 0.01,          # 最终地址返回 text/html（非视频）的概率
+    "hang": 30,
+    "variants": [800000, 2500000],
+    "segments": 6,              # 媒体播放列表窗口内的分片数
+    "segment_duration": 4,
+    "segment_size": 188 * 1000,
+}
+_Z99 = 2.3263  # 标准正态分布 99% 分位数
+
+def load_config(path=None, hosts=None, seed=0, **overrides):
+    """
+    读取配置文件（可选）并合并命令行参数
+    :param overrides: 覆盖 default 中的同名项（值为 None 的忽略）
+    """
+    config = {"hosts": 20, "seed": seed, "default": dict(DEFAULT_PROFILE), "overrides": {}}
+    if path:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        config["hosts"] = data.get("hosts", config["hosts"])
+        config["seed"] = data.get("seed", config["seed"])
+        config["default"].update(data.get("default", {}))
+        config["overrides"] = data.get("overrides", {})
+    if hosts is not None:
+        config["hosts"] = hosts
+    config["default"].update({key: value for key, value in overrides.items() if value is not None})
+    if config["hosts"] < 1:
+        raise ValueError("主机数必须为正整数")
+    return config
+
+def host_name(index):
+    return f"h{index}"
+
+def entry_url(base_url, index, hosts):
+    """第 index 个频道的入口地址（按编号轮流分配主机）"""
+    return f"{base_url.rstrip('/')}/{host_name(index % hosts)}/live/{index}"
+
+def _segment_body(size):
+    # 以 TS 同步字节 0x47 开头的 188 字节包
+    packet = b'\x47' + b'\xff' * 187
+    return (packet * (size // 188 + 1))[:size]
+
+class StandinState:
+    """服务器共享状态：主机配置、每个路径的请求次数、统计计数"""
+
+    def __init__(self, config):
+        self.config = config
+        self.hosts = config["hosts"]
+        self.seed = config["seed"]
+        self._profiles = {}
+        self._segments = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    def profile(self, host):
+        profile = self._profiles.get(host)
+        if profile is None:
+            profile = dict(self.config["default"], **self.config["overrides"].get(host, {}))
+            median, p99 = profile["latency_ms"]
+            profile["_sigma"] = math.log(max(p99, median) / median) / _Z99 if median > 0 else 0
+            self._profiles[host] = profile
+        return profile
+
+    def segment_body(self, size):
+        body = self._segments.get(size)
+        if body is None:
+            body = self._segments[size] = _segment_body(size)
+        return body
+
+    def next_rng(self, path):
+        """该路径第 k 次请求的随机数发生器"""
+        with self._lock:
+            attempt = self._attempts.get(path, 0)
+            self._attempts[path] = attempt + 1
+        digest = hashlib.blake2b(f"{self.seed}:{path}:{attempt}".encode('utf-8'), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, 'big'))
+
+    def path_rng(self, path):
+        """与请求次数无关的随机数发生器（重定向次数、跳转主机等每次相同的属性）"""
+        digest = hashlib.blake2b(f"{self.seed}:{path}".encode('utf-8'), digest_size=8).digest()
+        return random.Random(int.from_bytes(digest, 'big'))
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.stats[key] = self.stats.get(key, 0) + n
+
+    def snapshot(self, reset=False):
+        with self._lock:
+            data = dict(self.stats)
+            if reset:
+                self.stats = {}
+                self._attempts = {}
+        return data
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'standin'
+    disable_nagle_algorithm = True
+    state = None
+    quiet = True
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        parts = urlsplit(self.path)
+        if parts.path == '/_stats':
+            reset = parse_qs(parts.query).get('reset', ['0'])[0] not in ('', '0')
+            body = json.dumps(self.state.snapshot(reset), sort_keys=True).encode('utf-8') + b'\n'
+            return self._respond(200, body, 'application/json', send_body=send_body)
+        if parts.path == '/_playlist.m3u':
+            return self._serve_playlist(parse_qs(parts.query), send_body)
+
+        segments = parts.path.strip('/').split('/')
+        if len(segments) < 3:
+            return self._respond(404, b'not found\n', 'text/plain', send_body=send_body)
+        host, kind = segments[0], segments[1]
+        state = self.state
+        state.count('requests')
+        profile = state.profile(host)
+        rng = state.next_rng(parts.path)
+
+        median = profile["latency_ms"][0]
+        if median > 0:
+            delay = median * math.exp(profile["_sigma"] * rng.gauss(0, 1))
+            time.sleep(min(delay, profile["latency_ms"][1] * 5) / 1000)
+
+        roll = rng.random()
+        if roll < profile["timeout_rate"]:
+            state.count('hung')
+            time.sleep(profile["hang"])
+            # 客户端早已超时，不再响应
+            self.close_connection = True
+            return
+        roll -= profile["timeout_rate"]
+        if roll < profile["throttle_rate"]:
+            state.count('throttled')
+            return self._respond(429, b'too many requests\n', 'text/plain', send_body=send_body,
+                                 headers={'Retry-After': str(profile["retry_after"])})
+        roll -= profile["throttle_rate"]
+        if roll < profile["fail_rate"]:
+            if roll < profile["fail_rate"] / 2:
+                state.count('reset')
+                self.close_connection = True
+                return
+            state.count('failed')
+            return self._respond(503, b'service unavailable\n', 'text/plain', send_body=send_body)
+
+        if kind in ('live', 'r'):
+            return self._serve_redirect(host, segments, profile, send_body)
+        if kind == 'hls':
+            return self._serve_hls(segments, profile, send_body)
+        self._respond(404, b'not found\n', 'text/plain', send_body=send_body)
+
+    def _serve_redirect(self, host, segments, profile, send_body):
+        """/<主机>/live/<编号> 和 /<主机>/r/<编号>/<剩余跳数>"""
+        state = self.state
+        channel = segments[2]
+        if segments[1] == 'live':
+            low, high = profile["redirects"]
+            remaining = state.path_rng(f"/{host}/live/{channel}").randint(low, high)
+        else:
+            remaining = int(segments[3]) if len(segments) > 3 and segments[3].isdigit() else 0
+
+        if remaining <= 0:
+            state.count('finals')
+            if state.path_rng(f"/{channel}/html").random() < profile["html_rate"]:
+                return self._respond(200, b'<html><body>offline</body></html>\n', 'text/html; charset=utf-8',
+                                     send_body=send_body)
+            location = f"/{host}/hls/{channel}/master.m3u8"
+        else:
+            rng = state.path_rng(f"/{host}/r/{channel}/{remaining}")
+            target = host
+            if rng.random() < profile["cross_host"]:
+                target = host_name(rng.randrange(state.hosts))
+            location = f"/{target}/r/{channel}/{remaining - 1}"
+        state.count('redirects')
+        # 一半用绝对地址、一半用相对地址，覆盖 urljoin 路径
+        if channel.isdigit() and int(channel) % 2:
+            location = f"http://{self.headers.get('Host', 'localhost')}{location}"
+        self._respond(302, b'', None, send_body=send_body, headers={'Location': location})
+
+    def _serve_hls(self, segments, profile, send_body):
+        """master.m3u8 / <码率>/index.m3u8 / <码率>/<序号>.ts"""
+        state = self.state
+        channel = segments[2]
+        mpegurl = 'application/vnd.apple.mpegurl'
+        if len(segments) == 4 and segments[3] == 'master.m3u8':
+            state.count('playlists')
+            lines = ['#EXTM3U']
+            for bandwidth in profile["variants"]:
+                lines.append(f'#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},RESOLUTION={_resolution(bandwidth)}')
+                lines.append(f'{bandwidth}/index.m3u8')
+            return self._respond(200, ('\n'.join(lines) + '\n').encode('utf-8'), mpegurl, send_body=send_body)
+
+        if len(segments) == 5 and segments[4] == 'index.m3u8':
+            state.count('playlists')
+            duration = profile["segment_duration"]
+            sequence = int(time.time() // duration)
+            lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{duration}',
+                     f'#EXT-X-MEDIA-SEQUENCE:{sequence}']
+            for seq in range(sequence, sequence + profile["segments"]):
+                lines.append(f'#EXTINF:{duration:.3f},')
+                lines.append(f'{seq}.ts')
+            return self._respond(200, ('\n'.join(lines) + '\n').encode('utf-8'), mpegurl, send_body=send_body)
+
+        if len(segments) == 5 and segments[4].endswith('.ts'):
+            state.count('segments')
+            return self._respond(200, state.segment_body(profile["segment_size"]), 'video/mp2t',
+                                 send_body=send_body)
+        self._respond(404, b'not found\n', 'text/plain', send_body=send_body)
+
+    def _serve_playlist(self, query, send_body):
+        try:
+            count = int(query.get('n', ['1000'])[0])
+        except ValueError:
+            return self._respond(400, b'bad n\n', 'text/plain', send_body=send_body)
+        base = f"http://{self.headers.get('Host', 'localhost')}"
+        lines = ['#EXTM3U']
+        for index in range(count):
+            lines.append(f'#EXTINF:-1 group-title="替身",频道{index}')
+            lines.append(entry_url(base, index, self.state.hosts))
+        self._respond(200, ('\n'.join(lines) + '\n').encode('utf-8'), 'audio/x-mpegurl; charset=utf-8',
+                      send_body=send_body)
+
+    def _respond(self, status, body, content_type, send_body=True, headers=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header('Content-Type', content_type)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def _resolution(bandwidth):
+    return '1920x1080' if bandwidth >= 2000000 else '1280x720' if bandwidth >= 1000000 else '640x360'
+
+def make_server(config, host='127.0.0.1', port=0, quiet=True):
+    handler = type('Handler', (StandinHandler,), {'state': StandinState(config), 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="本地上游替身服务器：可配置的重定向链、延迟分布、失败/超时/429，以及 HLS 播放列表和分片",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址 (默认: 127.0.0.1)")
+    parser.add_argument('-p', '--port', type=int, default=8090, help="端口，0 表示随机 (默认: 8090)")
+    parser.add_argument('--config', help="JSON 配置文件（见模块说明）")
+    parser.add_argument('--hosts', type=int, help="模拟的主机数 (默认: 20)")
+    parser.add_argument('--latency', help="延迟中位数和 P99 毫秒，如 10,100")
+    parser.add_argument('--redirects', help="重定向次数范围，如 0-3")
+    parser.add_argument('--fail-rate', type=float, help="失败概率 (默认: 0.02)")
+    parser.add_argument('--timeout-rate', type=float, help="挂起概率 (默认: 0.002)")
+    parser.add_argument('--throttle-rate', type=float, help="429 概率 (默认: 0.01)")
+    parser.add_argument('--hang', type=float, help="挂起秒数 (默认: 30)")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="随机种子 (默认: 0)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出访问日志")
+    args = parser.parse_args()
+
+    try:
+        latency = [float(v) for v in args.latency.split(',')] if args.latency else None
+        if latency is not None and len(latency) != 2:
+            raise ValueError(f"无效的延迟 '{args.latency}'（示例: 10,100）")
+        redirects = None
+        if args.redirects:
+            low, _, high = args.redirects.partition('-')
+            redirects = [int(low), int(high or low)]
+        config = load_config(args.config, args.hosts, args.seed, latency_ms=latency,
+                             redirects=redirects,
+                             fail_rate=args.fail_rate, timeout_rate=args.timeout_rate,
+                             throttle_rate=args.throttle_rate, hang=args.hang)
+        server = make_server(config, args.host, args.port, quiet=not args.verbose)
+    except (OSError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"替身服务器已启动: http://{args.host}:{server.server_port}/ ({config['hosts']} 个主机)",
+          file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+按 EPG 自动补全 tvg-id
+从 XMLTV 频道列表建立一次归一化名称索引（见 epg_index.EpgIndex.name_index），
+逐行处理播放列表，为缺少 tvg-id 的频道按 tvg-name / 频道名做 O(1) 查找；
+可选模糊匹配：在 EPG 显示名的 n-gram 倒排索引上查找最相似的频道（见 near_dup.NgramIndex）。
+多个 EPG 频道归一化后同名时，只接受原始显示名完全相同的那一个，否则不补全并报告为歧义。
+"""
+
+import argparse
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+from epg_index import load_epg_index
+from m3u_writer import M3UWriter
+from near_dup import NgramIndex, name_digits, name_features
+from m3u_profile import run_main
+
+_TVG_ID_PATTERN = re.compile(r'tvg-id="([^"]*)"')
+_TVG_NAME_PATTERN = re.compile(r'tvg-name="([^"]*)"')
+_EXTINF_HEAD_PATTERN = re.compile(r'^(#EXTINF:[^\s,]*)')
+
+class TvgIdMatcher:
+    """
+    频道名 -> EPG 频道 ID
+    精确匹配走归一化名称字典；fuzzy_threshold 不为 None 时，精确匹配失败再做 n-gram 模糊匹配
+    """
+
+    def __init__(self, epg_index, fuzzy_threshold=None, max_postings=100):
+        self.epg_index = epg_index
+        self.fuzzy_threshold = fuzzy_threshold
+        self._ngram_index = None
+        self._ngram_ids = []
+        if fuzzy_threshold is not None:
+            self._build_ngram_index(max_postings)
+
+    def _build_ngram_index(self, max_postings):
+        self._ngram_index = NgramIndex(max_postings=max_postings)
+        for channel_id, channel in self.epg_index.channels.items():
+            for name in channel.names or [channel_id]:
+                features = name_features(name)
+                if features:
+                    self._ngram_index.add(features, name_digits(name))
+                    self._ngram_ids.append(channel_id)
+
+    def find_exact(self, name):
+        """
+        按归一化名称查找
+        :return: (频道 ID, 候选 ID 列表)；多个候选且没有原始显示名（或 ID）与 name 完全相同的唯一候选时频道 ID 为 None
+        """
+        ids = self.epg_index.find_by_name(name)
+        if len(ids) <= 1:
+            return (ids[0] if ids else None), ids
+        raw = name.strip()
+        channels = self.epg_index.channels
+        preferred = [channel_id for channel_id in ids if raw == channel_id or raw in channels[channel_id].names]
+        return (preferred[0] if len(preferred) == 1 else None), ids
+
+    def match(self, *names):
+        """
+        依次用各名称查找
+        :return: (频道 ID, 相似度, 是否精确匹配, 歧义候选 ID 列表)；未找到返回 (None, 0.0, False, [])，
+                 精确查找只得到歧义结果时返回 (None, 0.0, False, 候选)，此时不做模糊匹配
+        """
+        names = [name for name in names if name]
+        ambiguous = []
+        for name in names:
+            channel_id, ids = self.find_exact(name)
+            if channel_id is not None:
+                return channel_id, 1.0, True, []
+            if ids and not ambiguous:
+                ambiguous = ids
+        if ambiguous or self._ngram_index is None:
+            return None, 0.0, False, ambiguous
+
+        best = (None, 0.0, False, [])
+        for name in names:
+            features = name_features(name)
+            if not features:
+                continue
+            found = self._ngram_index.best_match(features, name_digits(name), self.fuzzy_threshold)
+            if found and found[1] > best[1]:
+                best = (self._ngram_ids[found[0]], found[1], False, [])
+        return best
+
+def set_tvg_id(extinf, tvg_id):
+    """设置 EXTINF 行的 tvg-id：已有属性则替换，否则插在时长之后"""
+    if _TVG_ID_PATTERN.search(extinf):
+        return _TVG_ID_PATTERN.sub(lambda _: f'tvg-id="{tvg_id}"', extinf, count=1)
+    return _EXTINF_HEAD_PATTERN.sub(lambda m: f'{m.group(1)} tvg-id="{tvg_id}"', extinf, count=1)
+
+def assign_tvg_ids(input_path, output_path, matcher, replace_invalid=False):
+    """
+    单次遍历播放列表并写出
+    :param replace_invalid: 已有 tvg-id 但 EPG 中不存在时也重新匹配
+    :return: 统计 {"channels", "kept", "exact", "fuzzy", "ambiguous", "unmatched"}，
+             以及 (频道名, 频道 ID, 相似度) 的模糊匹配列表、(频道名, 候选 ID 列表) 的歧义列表和未匹配频道名列表
+    """
+    stats = {"channels": 0, "kept": 0, "exact": 0, "fuzzy": 0, "ambiguous": 0, "unmatched": 0}
+    fuzzy = []
+    ambiguous = []
+    unmatched = []
+    epg_index = matcher.epg_index
+
+    with open(input_path, 'r', encoding='utf-8') as in_f, M3UWriter(output_path) as writer:
+        for line in in_f:
+            line = line.rstrip('\r\n')
+            if not line.strip().startswith('#EXTINF'):
+                writer.write_line(line)
+                continue
+
+            stats["channels"] += 1
+            match = _TVG_ID_PATTERN.search(line)
+            current = match.group(1).strip() if match else ''
+            if current and (not replace_invalid or current in epg_index):
+                stats["kept"] += 1
+                writer.write_line(line)
+                continue
+
+            tvg_name = _TVG_NAME_PATTERN.search(line)
+            name = line.rsplit(',', 1)[1].strip() if ',' in line else ''
+            channel_id, score, exact, candidates = matcher.match(tvg_name.group(1).strip() if tvg_name else '', name)
+            if candidates:
+                stats["ambiguous"] += 1
+                ambiguous.append((name, candidates))
+            elif channel_id is None:
+                stats["unmatched"] += 1
+                unmatched.append(name)
+            else:
+                stats["exact" if exact else "fuzzy"] += 1
+                if not exact:
+                    fuzzy.append((name, channel_id, score))
+                line = set_tvg_id(line, channel_id)
+            writer.write_line(line)
+    return stats, fuzzy, ambiguous, unmatched
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="按 EPG 频道列表为播放列表补全 tvg-id",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument('-e', '--epg', required=True, help="EPG（.xml / .xml.gz / http 地址）或 epg_index.py 保存的 .json")
+    parser.add_argument('-i', '--input', required=True, help="输入 M3U 文件")
+    parser.add_argument('-o', '--output', required=True, help="输出 M3U 文件（可与输入相同）")
+    parser.add_argument('-f', '--fuzzy', nargs='?', type=float, const=0.6, default=None, metavar='THRESHOLD',
+                        help="精确匹配失败时做模糊匹配，可指定相似度阈值 (默认: 0.6)")
+    parser.add_argument('-r', '--replace-invalid', action='store_true', help="已有 tvg-id 但 EPG 中不存在时也重新匹配")
+    parser.add_argument('-v', '--verbose', action='store_true', help="列出模糊匹配、歧义和未匹配的频道")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        epg_index = load_epg_index(args.epg)
+    except (OSError, ET.ParseError, ValueError) as e:
+        print(f"错误：无法读取 EPG '{args.epg}': {e}", file=sys.stderr)
+        sys.exit(1)
+    matcher = TvgIdMatcher(epg_index, args.fuzzy)
+
+    try:
+        stats, fuzzy, ambiguous, unmatched = assign_tvg_ids(args.input, args.output, matcher, args.replace_invalid)
+    except OSError as e:
+        print(f"错误: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    total = stats["channels"]
+    matched = stats["kept"] + stats["exact"] + stats["fuzzy"]
+    print(f"{total} 个频道: 保留原 tvg-id {stats['kept']}，精确匹配 {stats['exact']}，模糊匹配 {stats['fuzzy']}，"
+          f"歧义 {stats['ambiguous']}，未匹配 {stats['unmatched']} (匹配率 {matched / total * 100 if total else 0:.1f}%)，"
+          f"耗时 {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    if args.verbose:
+        for name, channel_id, score in fuzzy:
+            print(f"~ {name} -> {channel_id} ({score:.2f})")
+        for name, candidates in ambiguous:
+            print(f"! {name}: {' / '.join(candidates)}")
+        for name in unmatched:
+            print(f"? {name}")
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+TXT 转 M3U（txt2m3u.js 的 Python 流式实现）
+输入格式:
+    央视,#genre#
+    CCTV-1 综合,http://a/1.m3u8
+    CCTV-2 财经,http://a/2.m3u8#http://b/2.m3u8     <- '#' 分隔同一频道的多个 URL
+逐行读取、逐条写出，内存占用与文件大小无关。
+"""
+
+import argparse
+import re
+import sys
+
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+DEFAULT_HEADER = '#EXTM3U x-tvg-url="https://gh-proxy.org/raw.githubusercontent.com/sparkssssssssss/epg/main/pp.xml"'
+
+# CCTV-1 综合 -> CCTV1，与 txt2m3u.js 一致
+_TVG_NAME_PATTERN = re.compile(r'(CCTV|CETV)-(\d+).*')
+# 只在 '#' 后紧跟新的 URL 协议头时才视为分隔符，URL 自身的 #fragment 不受影响
+_URL_SEPARATOR = re.compile(r'#(?=[A-Za-z][A-Za-z0-9+.-]*://)')
+
+def iter_txt_channels(lines):
+    """
+    逐行解析 TXT，产出频道记录 {"name", "tvg_name", "group", "urls", "line"}
+    line 为频道所在行号（从 1 开始）；没有 URL 的行被跳过
+    """
+    current_group = None
+    for line_no, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if '#genre#' in line:
+            current_group = line.replace(',#genre#', '', 1).strip()
+            continue
+
+        parts = [part.strip() for part in line.split(',')]
+        if len(parts) < 2 or not parts[1]:
+            continue
+        name = parts[0]
+        urls = [url.strip() for url in _URL_SEPARATOR.split(parts[1]) if url.strip()]
+        yield {
+            "name": name,
+            "tvg_name": _TVG_NAME_PATTERN.sub(r'\1\2', name, count=1),
+            "group": current_group,
+            "urls": urls,
+            "line": line_no,
+        }
+
+def channel_extinf(record):
+    extinf = f'#EXTINF:-1 tvg-name="{record["tvg_name"]}"'
+    if record["group"]:
+        extinf += f' group-title="{record["group"]}"'
+    return f'{extinf},{record["name"]}'
+
+def iter_m3u_lines(records, header=DEFAULT_HEADER):
+    """将频道记录转为 M3U 行"""
+    if header:
+        yield header
+    for record in records:
+        yield channel_extinf(record)
+        yield from record["urls"]
+
+def convert_txt_to_m3u(input_path, output_path, header=DEFAULT_HEADER):
+    """
+    流式转换 TXT 为 M3U
+
+    :return: (频道数, URL 数)
+    """
+    channels = 0
+    urls = 0
+    with open(input_path, 'r', encoding='utf-8') as in_f, M3UWriter(output_path) as writer:
+        if header:
+            writer.write_line(header)
+        for record in iter_txt_channels(in_f):
+            writer.write_line(channel_extinf(record))
+            writer.write_lines(record["urls"])
+            channels += 1
+            urls += len(record["urls"])
+    return channels, urls
+
+def main():
+    parser = argparse.ArgumentParser(description="TXT 转 M3U：支持 '分组,#genre#' 和 '频道名,URL1#URL2' 格式")
+    parser.add_argument('-i', '--input', required=True, help="输入 TXT 文件")
+    parser.add_argument('-o', '--output', required=True, help="输出 M3U 文件")
+    parser.add_argument('--header', default=DEFAULT_HEADER, help="M3U 文件头 (默认带 x-tvg-url)")
+    args = parser.parse_args()
+
+    try:
+        channels, urls = convert_txt_to_m3u(args.input, args.output, args.header)
+    except Exception as e:
+        print(f"错误：转换失败: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"已转换 {channels} 个频道，{urls} 个URL -> '{args.output}'", file=sys.stderr)
+
+if __name__ == "__main__":
+    run_main(main)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+URL 规范化
+去掉时间戳、签名、客户端 IP 等易变查询参数，得到稳定的规范 Key，
+使同一路流在不同运行、不同镜像下的 URL 能够被识别为重复。
+"""
+
+import argparse
+import json
+import sys
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from m3u_profile import run_main
+
+# 默认丢弃的易变参数（不区分大小写）
+DEFAULT_DROP_PARAMS = [
+    'timestamp', 'msisdn', 'encrypt', 'client_ip', 'securitykey',
+    'wstime', 'wssecret', 'txsecret', 'txtime', 'expires', 'signature',
+]
+
+# 按主机配置：keep 为白名单（只保留列出的参数），drop 为额外丢弃的参数
+# 主机按域名后缀匹配，如 "miguvideo.com" 匹配 "hlszymgsplive.miguvideo.com"
+DEFAULT_HOST_RULES = {
+    'miguvideo.com': {'keep': ['ProgramID']},
+}
+
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+# 规范 Key 缓存的默认条数上限
+DEFAULT_CACHE_SIZE = 1 << 16
+
+class UrlCanonicalizer:
+    """
+    计算 URL 的规范 Key，结果按原始 URL 缓存（LRU，最多 cache_size 条）
+    缓存有上限，流式去重和常驻进程中内存不随处理过的 URL 数增长
+    """
+
+    def __init__(self, drop_params=None, host_rules=None, cache_size=DEFAULT_CACHE_SIZE):
+        self.drop_params = {p.lower() for p in (DEFAULT_DROP_PARAMS if drop_params is None else drop_params)}
+        self.host_rules = {}
+        for host, rule in (DEFAULT_HOST_RULES if host_rules is None else host_rules).items():
+            self.host_rules[host.lower()] = {
+                'keep': {p.lower() for p in rule['keep']} if rule.get('keep') is not None else None,
+                'drop': {p.lower() for p in rule.get('drop', [])},
+            }
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+
+    def _host_rule(self, host):
+        # 逐级去掉最左侧标签查找，开销与域名层级数成正比
+        while host:
+            rule = self.host_rules.get(host)
+            if rule is not None:
+                return rule
+            _, _, host = host.partition('.')
+        return None
+
+    def canonical(self, url):
+        """返回 URL 的规范 Key；无法解析的 URL 原样返回"""
+        key = self._cache.get(url)
+        if key is not None:
+            self._cache.move_to_end(url)
+            return key
+        key = self._canonical(url)
+        if self._cache_size > 0:
+            self._cache[url] = key
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return key
+
+    def _canonical(self, url):
+        try:
+            parts = urlsplit(url.strip())
+            scheme = parts.scheme.lower()
+            host = (parts.hostname or '').lower()
+            port = parts.port
+        except ValueError:
+            return url
+
+        if not scheme or not host:
+            return url
+
+        netloc = host
+        if port and port != _DEFAULT_PORTS.get(scheme):
+            netloc = f"{host}:{port}"
+
+        rule = self._host_rule(host)
+        params = []
+        for name, value in parse_qsl(parts.query, keep_blank_values=True):
+            lname = name.lower()
+            if rule and rule['keep'] is not None:
+                if lname not in rule['keep']:
+                    continue
+            elif lname in self.drop_params or (rule and lname in rule['drop']):
+                continue
+            params.append((name, value))
+        params.sort()
+
+        key = f"{scheme}://{netloc}{parts.path or '/'}"
+        if params:
+            key += '?' + urlencode(params)
+        return key
+
+def load_canonicalizer(rules_path=None):
+    """
+    加载规范化规则 (JSON):
+    {"drop_params": [...], "hosts": {"example.com": {"keep": [...]}, "cdn.example.net": {"drop": [...]}}}
+    未指定文件时使用内置默认规则；文件中未给出的部分也沿用默认值
+    """
+    if not rules_path:
+        return UrlCanonicalizer()
+
+    with open(rules_path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+
+    host_rules = dict(DEFAULT_HOST_RULES)
+    host_rules.update(rules.get('hosts', {}))
+    return UrlCanonicalizer(rules.get('drop_params'), host_rules)
+
+def add_canon_argument(parser):
+    """为各脚本统一添加 --canon-urls 参数：不带值时使用内置规则"""
+    parser.add_argument('--canon-urls', nargs='?', const='', default=None, metavar='FILE',
+                        help='按规范化 URL 去重，忽略时间戳/签名等易变参数（可指定规则 JSON）')
+
+def main():
+    parser = argparse.ArgumentParser(description="URL 规范化：输出 URL 对应的规范 Key")
+    parser.add_argument('urls', nargs='+', help='URL')
+    parser.add_argument('-R', '--rules', help='规范化规则 JSON')
+    args = parser.parse_args()
+
+    try:
+        canonicalizer = load_canonicalizer(args.rules)
+    except Exception as e:
+        print(f"错误：无法加载规范化规则: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for url in args.urls:
+        print(canonicalizer.canonical(url))
+
+if __name__ == "__main__":
+    run_main(main)
@@ -2,47 +2,36 @@ import argparse
 import sys
 import re
 import os
-import tempfile
-import shutil
 
-def sort_m3u_urls(input_file, output_file, keywords_str, reverse_mode=False, target_channels_str=None, new_name=None, force=False):
+from channel_alias import add_alias_argument, load_alias_index
+from m3u_snapshot import load_playlist
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
+def sort_m3u_urls(input_file, output_file, keywords_str, reverse_mode=False, target_channels_str=None, new_name=None, force=False, key_func=None):
     # 1. 参数解析与标准化
     keywords = [k.strip() for k in keywords_str.split(',') if k.strip()]
     target_channels = [c.strip() for c in target_channels_str.split(',') if c.strip()] if target_channels_str else None
+    # 启用别名索引时，-ch 按规范频道 ID 精确匹配（而非 EXTINF 子串）
+    target_ids = {key_func(c) for c in target_channels} if (target_channels and key_func) else None
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        playlist = load_playlist(input_file)
     except Exception as e:
         print(f"Error: 无法读取输入文件: {e}")
         return False
+    lines = playlist.lines
 
-    # 2. 结构化解析
+    # 2. 结构化解析（频道边界由解析模型给出，有快照时无需逐行扫描）
     processed_content = []
-    start_index = 0
     # 兼容处理首行（BOM 或 空格）
     if lines and '#EXTM3U' in lines[0]:
         processed_content.append(lines[0].strip())
-        start_index = 1
 
     channels_data = []
-    current_inf = None
-    current_urls = []
-
-    for line in lines[start_index:]:
-        line = line.strip()
-        if not line: continue
-        if line.startswith('#EXTINF'):
-            if current_inf:
-                channels_data.append({"inf": current_inf, "urls": current_urls})
-            current_inf = line
-            current_urls = []
-        else:
-            current_urls.append(line)
-    
-    # 存入最后一个频道组
-    if current_inf:
-        channels_data.append({"inf": current_inf, "urls": current_urls})
+    for _, start, end in playlist.channel_ranges():
+        current_urls = [line.strip() for line in lines[start + 1:end] if line.strip()]
+        channels_data.append({"inf": lines[start].strip(), "urls": current_urls})
 
     # 排序得分函数
     def get_sort_score(item):
@@ -75,7 +64,11 @@ def sort_m3u_urls(input_file, output_file, keywords_str, reverse_mode=False, tar
     
     for ch in channels_data:
         # 条件 A: 频道名匹配（命中 -ch）
-        name_match = any(tc in ch["inf"] for tc in target_channels) if target_channels else False
+        if target_ids is not None:
+            display_name = ch["inf"].rsplit(',', 1)[1].strip() if ',' in ch["inf"] else ""
+            name_match = key_func(display_name) in target_ids
+        else:
+            name_match = any(tc in ch["inf"] for tc in target_channels) if target_channels else False
         
         # 条件 B: 旗下 URL 匹配（命中 -k）
         url_match = any(any(kw in url for kw in keywords) for url in ch["urls"])
@@ -110,53 +103,14 @@ def safe_write_output(lines, input_path, output_path):
     :param output_path: 输出文件路径
     :return: (success, temp_path) 成功返回(True, None)，失败返回(False, temp_path)
     """
-    # 获取绝对路径以判断是否为同一个文件
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
-    is_same_file = input_abs == output_abs
-    
-    temp_path = None
-    
     try:
-        # 如果是同一个文件，先写到临时文件
-        if is_same_file:
-            # 在与输出文件相同目录创建临时文件
-            output_dir = os.path.dirname(output_path) or '.'
-            fd, temp_path = tempfile.mkstemp(
-                dir=output_dir,
-                suffix='.m3u',
-                prefix='.tmp_',
-                text=True
-            )
-            
-            # 使用文件描述符打开文件
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            # 直接打开输出文件
-            out_f = open(output_path, 'w', encoding='utf-8')
-        
-        # 写入数据
-        with out_f:
-            for line in lines:
-                out_f.write(line + '\n')
-        
-        # 如果是同一个文件，进行原子替换
-        if is_same_file:
-            try:
-                # Python 3.3+ 推荐使用 os.replace 实现原子替换
-                os.replace(temp_path, output_path)
-                temp_path = None  # 替换成功，清除临时文件引用
-            except Exception as e:
-                # 如果 os.replace 失败，使用 shutil.move 作为备选
-                print(f"警告：原子替换失败，使用备选方案: {e}")
-                shutil.move(temp_path, output_path)
-                temp_path = None  # 移动成功，清除临时文件引用
-        
+        with M3UWriter(output_path) as writer:
+            writer.write_lines(lines)
         return True, None
         
     except Exception as e:
         print(f"写入文件失败: {e}")
-        return False, temp_path
+        return False, None
 
 def validate_arguments(input_path, output_path):
     """
@@ -220,6 +174,7 @@ def main():
     parser.add_argument("-ch", "--channels", help="目标频道名关键字，逗号分隔")
     parser.add_argument("-rn", "--rename", help="重命名 (仅在满足 -ch 且包含 -k 时生效)")
     parser.add_argument("--force", action="store_true", help="强制覆盖输出文件（如果已存在且与输入不同）")
+    add_alias_argument(parser)
     
     args = parser.parse_args()
     
@@ -239,9 +194,10 @@ def main():
     
     # 处理M3U文件
     try:
+        key_func = load_alias_index(args.alias or None).resolve if args.alias is not None else None
         output_lines, rename_count, sort_count, total_channels = sort_m3u_urls(
             args.input, args.output, args.keywords, args.reverse, 
-            args.channels, args.rename, args.force
+            args.channels, args.rename, args.force, key_func
         )
         
         if output_lines is False:  # 如果sort_m3u_urls返回False表示失败
@@ -282,4 +238,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
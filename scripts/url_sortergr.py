@@ -2,11 +2,12 @@ import argparse
 import sys
 import re
 import os
-import tempfile
-import shutil
-import traceback
 from typing import List, Dict, Optional, Tuple, Set
 
+from m3u_snapshot import load_playlist
+from m3u_writer import M3UWriter
+from m3u_profile import run_main
+
 # ==================== 调试和错误处理配置 ====================
 DEBUG_MODE = os.environ.get('DEBUG', 'false').lower() == 'true'
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'info').lower()
@@ -31,6 +32,7 @@ def log_exception(e: Exception, context: str = ""):
     """记录异常详细信息"""
     debug_log(f"{context}发生异常: {type(e).__name__}: {e}", 'error')
     if DEBUG_MODE:
+        import traceback
         print("异常堆栈跟踪:")
         traceback.print_exc()
 
@@ -271,8 +273,7 @@ def sort_m3u_urls(input_file: str, output_file: str, keywords_str: str,
     
     try:
         debug_log(f"正在读取文件: {input_file}", 'info')
-        with open(input_file, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
+        lines = load_playlist(input_file).lines
         debug_log(f"读取成功，共 {len(lines)} 行", 'info')
     except Exception as e:
         log_exception(e, "读取输入文件")
@@ -280,7 +281,7 @@ def sort_m3u_urls(input_file: str, output_file: str, keywords_str: str,
     
     # 2. 结构化解析
     try:
-        channels_data, header_lines = parse_m3u_file([line.rstrip('\n') for line in lines])
+        channels_data, header_lines = parse_m3u_file(lines)
         debug_log(f"解析出 {len(channels_data)} 个频道", 'info')
     except Exception as e:
         log_exception(e, "解析M3U文件")
@@ -509,52 +510,16 @@ def safe_write_output(lines: List[str], input_path: str, output_path: str) -> Tu
     debug_log(f"安全写入输出文件: {output_path}", 'info')
     debug_log(f"输入路径: {input_path}", 'debug')
     
-    input_abs = os.path.abspath(input_path)
-    output_abs = os.path.abspath(output_path)
-    is_same_file = input_abs == output_abs
-    
-    debug_log(f"是否为同一文件: {is_same_file}", 'debug')
-    
-    temp_path = None
-    
     try:
-        if is_same_file:
-            output_dir = os.path.dirname(output_path) or '.'
-            fd, temp_path = tempfile.mkstemp(
-                dir=output_dir,
-                suffix='.m3u',
-                prefix='.tmp_',
-                text=True
-            )
-            debug_log(f"创建临时文件: {temp_path}", 'debug')
-            
-            out_f = os.fdopen(fd, 'w', encoding='utf-8')
-        else:
-            out_f = open(output_path, 'w', encoding='utf-8')
-            debug_log(f"直接打开输出文件: {output_path}", 'debug')
-        
-        with out_f:
-            for line in lines:
-                out_f.write(line + '\n')
+        with M3UWriter(output_path) as writer:
+            writer.write_lines(lines)
         
         debug_log(f"写入完成，共 {len(lines)} 行", 'info')
-        
-        if is_same_file:
-            try:
-                os.replace(temp_path, output_path)
-                temp_path = None
-                debug_log("原子替换原文件成功", 'info')
-            except Exception as e:
-                debug_log(f"原子替换失败，使用备选方案: {e}", 'warn')
-                shutil.move(temp_path, output_path)
-                temp_path = None
-                debug_log("移动临时文件成功", 'info')
-        
         return True, None
         
     except Exception as e:
         log_exception(e, "写入输出文件")
-        return False, temp_path
+        return False, None
 
 def cleanup_temp_file(temp_path: Optional[str]) -> None:
     """清理临时文件"""
@@ -625,14 +590,15 @@ def main():
         
         args = parser.parse_args()
         
-        # 处理调试参数
+        # 处理调试参数（环境变量在每次运行时重新读取，常驻 worker 中按客户端环境生效）
+        global DEBUG_MODE, LOG_LEVEL
+        DEBUG_MODE = os.environ.get('DEBUG', 'false').lower() == 'true'
+        LOG_LEVEL = os.environ.get('LOG_LEVEL', 'info').lower()
         if args.debug:
-            global DEBUG_MODE
             DEBUG_MODE = True
             debug_log("通过 --debug 参数启用调试模式", 'info')
         
         if args.verbose:
-            global LOG_LEVEL
             LOG_LEVEL = 'debug'
             debug_log("通过 --verbose 参数启用详细输出", 'info')
         
@@ -746,4 +712,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
+    run_main(main)
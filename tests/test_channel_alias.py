@@ -0,0 +1,46 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from channel_alias import load_alias_index, normalize_channel_name
+
+
+def test_generic_descriptors_are_stripped():
+    for name in ('CCTV4', 'CCTV-4 中文国际', 'CCTV4中文国际', 'cctv4 HD'):
+        assert normalize_channel_name(name) == 'CCTV4'
+    assert normalize_channel_name('CCTV-5+ 体育赛事') == 'CCTV5+'
+    assert normalize_channel_name('CCTV5+体育赛事') == 'CCTV5+'
+
+
+def test_regional_feeds_stay_distinct():
+    europe = normalize_channel_name('CCTV4欧洲')
+    america = normalize_channel_name('CCTV4美洲')
+    assert europe == 'CCTV4-欧洲'
+    assert america == 'CCTV4-美洲'
+    assert len({europe, america, normalize_channel_name('CCTV4')}) == 3
+    assert normalize_channel_name('CCTV-4 中文国际 欧洲') == europe
+
+
+def test_regional_feed_synonyms_from_alias_file():
+    index = load_alias_index()
+    assert index.resolve('CCTV4 Europe') == index.resolve('CCTV4欧洲') == 'CCTV4-欧洲'
+    assert index.resolve('CCTV4 America') == index.resolve('CCTV4美洲') == 'CCTV4-美洲'
+    assert index.resolve('CCTV4 Europe') != index.resolve('CCTV4')
+
+
+def test_version_qualifiers_are_kept():
+    assert normalize_channel_name('CCTV16-4K') == 'CCTV16-4K'
+    assert normalize_channel_name('CCTV-16 奥林匹克') == 'CCTV16'
+    assert normalize_channel_name('CCTV-4K') == 'CCTV4K'
+    assert normalize_channel_name('CCTV8K超高清') == 'CCTV8K'
+
+
+def test_url_encoded_plus():
+    assert normalize_channel_name('CCTV-5%2B') == 'CCTV5+'
+
+
+def test_latin_quality_suffix_needs_boundary():
+    assert normalize_channel_name('NASD') == 'NASD'
+    assert normalize_channel_name('ESPN HD') == 'ESPN'
+    assert normalize_channel_name('湖南卫视HD') == '湖南卫视'
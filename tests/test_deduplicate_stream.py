@@ -0,0 +1,47 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from deduplicate import deduplicate_m3u_stream
+from url_canon import UrlCanonicalizer
+
+TEXT = (
+    '#EXTM3U\n'
+    '#EXTINF:-1 group-title="央视",CCTV1\n'
+    'http://a.example.com/cctv1.m3u8?wsSecret=1\n'
+    '#EXTINF:-1 group-title="央视",CCTV2\n'
+    'http://a.example.com/cctv2.m3u8\n'
+    '#EXTINF:-1 group-title="央视",CCTV1\n'
+    'http://a.example.com/cctv1.m3u8?wsSecret=2\n'
+    'http://b.example.com/cctv1.m3u8\n'
+)
+
+
+def run(tmp_path, **kwargs):
+    source = tmp_path / 'in.m3u'
+    output = tmp_path / 'out.m3u'
+    source.write_text(TEXT, encoding='utf-8')
+    result = deduplicate_m3u_stream(str(source), str(output), **kwargs)
+    return result, output.read_text(encoding='utf-8')
+
+
+def test_name_mode_keeps_first_record(tmp_path):
+    (kept, dropped, _), text = run(tmp_path)
+    assert (kept, dropped) == (2, 1)
+    assert 'b.example.com' not in text
+    assert text.count('#EXTINF') == 2
+
+
+def test_url_mode_with_canonical_keys(tmp_path):
+    # 只有 wsSecret 不同的 URL 视为重复，同一记录中的新 URL 保留
+    canon = UrlCanonicalizer(cache_size=1)
+    (kept, dropped, key_count), text = run(tmp_path, key_mode='url', url_key_func=canon.canonical)
+    assert (kept, dropped, key_count) == (3, 0, 3)
+    assert 'wsSecret=2' not in text
+    assert 'http://b.example.com/cctv1.m3u8' in text
+
+
+def test_without_canonical_keys_token_change_is_new_url(tmp_path):
+    (kept, dropped, key_count), _ = run(tmp_path, key_mode='url')
+    assert (kept, dropped, key_count) == (3, 0, 4)
@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from m3u_diff import diff_playlists, has_changes, header_attributes, index_playlist
+from m3u_snapshot import parse_playlist
+from url_canon import load_canonicalizer
+
+BASE = (
+    '#EXTM3U x-tvg-url="http://epg.example.com/e.xml"\n'
+    '#EXTINF:-1 group-title="央视",CCTV1\n'
+    '#EXTVLCOPT:http-referrer=http://a.example.com/\n'
+    '#EXTVLCOPT:http-user-agent=Player\n'
+    'http://a.example.com/cctv1.m3u8?wsSecret=111\n'
+    'http://b.example.com/cctv1.m3u8\n'
+    '#EXTINF:-1 group-title="央视",CCTV2\n'
+    'http://a.example.com/cctv2.m3u8\n'
+    '#EXTINF:-1 group-title="卫视",湖南卫视\n'
+    'http://a.example.com/hunan.m3u8\n'
+)
+
+
+def diff(old_text, new_text, canon=True):
+    url_key = load_canonicalizer().canonical if canon else None
+    old = parse_playlist(old_text)
+    new = parse_playlist(new_text)
+    return diff_playlists(index_playlist(old, url_key_func=url_key), index_playlist(new, url_key_func=url_key),
+                          header_attributes(old), header_attributes(new))
+
+
+def test_identical_and_token_rotation_are_not_changes():
+    assert not has_changes(diff(BASE, BASE))
+    assert not has_changes(diff(BASE, BASE.replace('wsSecret=111', 'wsSecret=222')))
+
+
+def test_config_line_order_is_ignored():
+    swapped = BASE.replace('#EXTVLCOPT:http-referrer=http://a.example.com/\n#EXTVLCOPT:http-user-agent=Player\n',
+                           '#EXTVLCOPT:http-user-agent=Player\n#EXTVLCOPT:http-referrer=http://a.example.com/\n')
+    assert not has_changes(diff(BASE, swapped))
+
+
+def test_url_order_is_a_change():
+    reordered = BASE.replace('http://a.example.com/cctv1.m3u8?wsSecret=111\nhttp://b.example.com/cctv1.m3u8\n',
+                             'http://b.example.com/cctv1.m3u8\nhttp://a.example.com/cctv1.m3u8?wsSecret=111\n')
+    result = diff(BASE, reordered)
+    assert has_changes(result)
+    assert [(change[0], change[5]) for change in result["changed"]] == [(('央视', 'CCTV1'), True)]
+
+
+def test_group_and_channel_order_are_changes():
+    lines = BASE.splitlines(keepends=True)
+    header, cctv1, cctv2, hunan = lines[0], lines[1:6], lines[6:8], lines[8:10]
+    groups_swapped = ''.join([header] + hunan + cctv1 + cctv2)
+    channels_swapped = ''.join([header] + cctv2 + cctv1 + hunan)
+    assert [group for group, _, _ in diff(BASE, groups_swapped)["order"]] == [None]
+    assert [group for group, _, _ in diff(BASE, channels_swapped)["order"]] == ['央视']
+
+
+def test_header_attribute_change():
+    result = diff(BASE, BASE.replace('e.xml', 'tv_epg.xml'))
+    assert result["header"] == [('x-tvg-url', 'http://epg.example.com/e.xml', 'http://epg.example.com/tv_epg.xml')]
+
+
+def run_diff(tmp_path, old_text, new_text, *args):
+    old_path = tmp_path / 'old.m3u'
+    new_path = tmp_path / 'new.m3u'
+    old_path.write_text(old_text, encoding='utf-8')
+    new_path.write_text(new_text, encoding='utf-8')
+    env = dict(os.environ, M3U_SNAPSHOT='0')
+    return subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'm3u_diff.py'), str(old_path), str(new_path),
+                           '-q'] + list(args), capture_output=True, env=env).returncode
+
+
+def test_exit_codes(tmp_path):
+    assert run_diff(tmp_path, BASE, BASE.replace('wsSecret=111', 'wsSecret=222'), '--canon-urls') == 0
+    assert run_diff(tmp_path, BASE, BASE.replace('CCTV2\n', 'CCTV2 高清\n')) == 1
+    assert run_diff(tmp_path, BASE, BASE.replace('e.xml', 'tv_epg.xml')) == 1
+    assert subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'm3u_diff.py'), str(tmp_path / 'missing.m3u'),
+                           str(tmp_path / 'new.m3u'), '-q'], capture_output=True).returncode == 2
@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+MERGER = os.path.join(SCRIPTS_DIR, 'm3u_merger.py')
+ENV = dict(os.environ, M3U_SNAPSHOT='0', M3U_COMPRESS='', M3U_FSYNC='0')
+
+
+def playlist(*channels):
+    lines = ['#EXTM3U']
+    for group, name, urls in channels:
+        lines.append(f'#EXTINF:-1 group-title="{group}",{name}')
+        lines.extend(urls)
+    return '\n'.join(lines) + '\n'
+
+
+A = playlist(('央视', 'CCTV1', ['http://a/1']), ('央视', 'CCTV2', ['http://a/2']), ('卫视', '湖南卫视', ['http://a/hn']))
+B = playlist(('央视', 'CCTV1', ['http://b/1']), ('央视', 'CCTV5', ['http://b/5']), ('卫视', '浙江卫视', ['http://b/zj']))
+# B 改为新增一个排在最前的分组、并把 CCTV5 挪到 CCTV1 之前
+B2 = playlist(('体育', 'ESPN', ['http://b/espn']), ('央视', 'CCTV5', ['http://b/5']), ('央视', 'CCTV1', ['http://b/1']),
+              ('卫视', '浙江卫视', ['http://b/zj2']))
+C = playlist(('少儿', '卡酷', ['http://c/kk']), ('央视', 'CCTV2', ['http://c/2']), ('央视', 'CCTV3', ['http://c/3']))
+
+
+def merge(inputs, output, *extra):
+    proc = subprocess.run([sys.executable, MERGER, '-i'] + [str(p) for p in inputs] + ['-o', str(output)] + list(extra),
+                          capture_output=True, env=ENV)
+    assert proc.returncode == 0, proc.stderr.decode('utf-8', 'replace')
+    return output.read_bytes()
+
+
+def full(tmp_path, inputs):
+    output = tmp_path / 'full.m3u'
+    if output.exists():
+        output.unlink()
+    return merge(inputs, output)
+
+
+def test_incremental_output_matches_full_rebuild(tmp_path):
+    a, b, c = tmp_path / 'a.m3u', tmp_path / 'b.m3u', tmp_path / 'c.m3u'
+    a.write_text(A, encoding='utf-8')
+    b.write_text(B, encoding='utf-8')
+    c.write_text(C, encoding='utf-8')
+    incremental = tmp_path / 'inc.m3u'
+
+    # 首次运行；之后对自己的输出重复运行不需要 --force
+    assert merge([a, b], incremental, '--incremental') == full(tmp_path, [a, b])
+    assert merge([a, b], incremental, '--incremental') == full(tmp_path, [a, b])
+
+    # 修改一个来源
+    b.write_text(B2, encoding='utf-8')
+    assert merge([a, b], incremental, '--incremental') == full(tmp_path, [a, b])
+
+    # 新增一个来源
+    assert merge([a, b, c], incremental, '--incremental') == full(tmp_path, [a, b, c])
+
+    # 移除一个来源，再加回来
+    assert merge([a, c], incremental, '--incremental') == full(tmp_path, [a, c])
+    assert merge([a, b, c], incremental, '--incremental') == full(tmp_path, [a, b, c])
+
+
+def test_existing_foreign_output_still_needs_force(tmp_path):
+    a = tmp_path / 'a.m3u'
+    a.write_text(A, encoding='utf-8')
+    output = tmp_path / 'out.m3u'
+    output.write_text('#EXTM3U\n', encoding='utf-8')
+    proc = subprocess.run([sys.executable, MERGER, '-i', str(a), '-o', str(output), '--incremental'],
+                          capture_output=True, env=ENV)
+    assert proc.returncode == 1
+    assert output.read_text(encoding='utf-8') == '#EXTM3U\n'
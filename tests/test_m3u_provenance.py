@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from m3u_provenance import ProvenanceIndex, ProvenanceWriter
+
+ENV = dict(os.environ, M3U_SNAPSHOT='0', M3U_COMPRESS='', M3U_FSYNC='0')
+
+
+def test_url_index_matches_output_lines(tmp_path):
+    a = tmp_path / 'a.m3u'
+    b = tmp_path / 'b.m3u'
+    a.write_text('#EXTM3U\n#EXTINF:-1 group-title="央视",CCTV1\nhttp://a/1\n'
+                 '#EXTINF:-1 group-title="央视",CCTV2\nhttp://a/2\n', encoding='utf-8')
+    b.write_text('#EXTM3U\n#EXTINF:-1 group-title="央视",CCTV1\nhttp://b/1\nhttp://a/2\n', encoding='utf-8')
+    output = tmp_path / 'out.m3u'
+    proc = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'm3u_merger.py'), '-i', str(a), str(b),
+                           '-o', str(output), '--provenance'], capture_output=True, env=ENV)
+    assert proc.returncode == 0, proc.stderr.decode('utf-8', 'replace')
+
+    lines = output.read_text(encoding='utf-8').split('\n')
+    with ProvenanceIndex(str(output) + '.prov') as index:
+        assert index.url_count == 4  # http://a/2 同时出现在 CCTV1 和 CCTV2 下
+        for url in ('http://a/1', 'http://b/1', 'http://a/2'):
+            expected = [n for n, line in enumerate(lines, 1) if line == url]
+            assert index.lookup_url(url) == expected
+            assert index.lookup(expected[0])[0] in (str(a), str(b))
+        assert index.lookup_url('http://missing/') == []
+
+
+def test_duplicate_urls_are_all_listed(tmp_path):
+    writer = ProvenanceWriter()
+    writer.add(None)
+    for line_no, url in enumerate(['http://x/1', 'http://x/2', 'http://x/1'], 2):
+        writer.add(('in.m3u', line_no), url=url)
+    path = tmp_path / 'x.prov'
+    writer.save(str(path))
+    with ProvenanceIndex(str(path)) as index:
+        assert index.lookup_url(' http://x/1 ') == [2, 4]
+        assert index.lookup_url('http://x/2') == [3]
+        assert index.lookup(1) is None
+        assert index.lookup(3) == ('in.m3u', 3)
@@ -0,0 +1,72 @@
+import gzip
+import http.client
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from m3u_server import PlaylistCache, PlaylistHandler, accepts_gzip, etag_matches
+
+TEXT = '#EXTM3U\n' + ''.join(f'#EXTINF:-1 group-title="央视",CCTV{i}\nhttp://example.com/{i}.m3u8\n'
+                             for i in range(100))
+
+
+def start_server(root):
+    handler = type('Handler', (PlaylistHandler,), {'cache': PlaylistCache(str(root)), 'quiet': True})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def request(server, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_port, timeout=5)
+    try:
+        conn.request('GET', '/a.m3u', headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+
+def test_etag_matching():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc"', '"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches('*', '"abc"')
+    assert not etag_matches('', '"abc"')
+    assert not etag_matches('"abc"', '"abc-gz"')
+
+
+def test_accepts_gzip_quality_values():
+    assert accepts_gzip('gzip, deflate')
+    assert not accepts_gzip('gzip;q=0')
+    assert accepts_gzip('*;q=0.5')
+    assert not accepts_gzip('identity')
+
+
+def test_gzip_variant_has_its_own_etag(tmp_path):
+    (tmp_path / 'a.m3u').write_text(TEXT, encoding='utf-8')
+    server = start_server(tmp_path)
+    try:
+        status, headers, body = request(server)
+        assert status == 200 and body.decode('utf-8') == TEXT
+        plain_etag = headers['ETag']
+
+        status, headers, body = request(server, {'Accept-Encoding': 'gzip'})
+        assert status == 200 and headers['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(body).decode('utf-8') == TEXT
+        gzip_etag = headers['ETag']
+        assert gzip_etag != plain_etag
+
+        assert request(server, {'If-None-Match': plain_etag})[0] == 304
+        assert request(server, {'If-None-Match': 'W/' + plain_etag})[0] == 304
+        assert request(server, {'If-None-Match': '*'})[0] == 304
+        assert request(server, {'If-None-Match': gzip_etag, 'Accept-Encoding': 'gzip'})[0] == 304
+        # 持有 gzip 变体的缓存不能拿到未压缩请求的 304
+        assert request(server, {'If-None-Match': gzip_etag})[0] == 200
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,67 @@
+import hashlib
+import os
+import subprocess
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+from m3u_snapshot import load_playlist, parse_playlist, read_snapshot, snapshot_path, write_snapshot_for
+
+TEXT = (
+    '#EXTM3U x-tvg-url="http://epg.example.com/e.xml"\n'
+    '#EXTINF:-1 tvg-id="CCTV1" group-title="央视",CCTV1\n'
+    'http://a.example.com/cctv1.m3u8\n'
+    '#EXTINF:-1 group-title="卫视",湖南卫视\n'
+    'http://a.example.com/hunan.m3u8\n'
+)
+
+
+def fields(playlist):
+    return (playlist.lines, playlist.trailing_newline, list(playlist.channel_starts),
+            playlist.names, playlist.groups, playlist.tvg_ids)
+
+
+def test_round_trip(tmp_path):
+    path = tmp_path / 'a.m3u'
+    path.write_text(TEXT, encoding='utf-8')
+    write_snapshot_for(str(path))
+    snap = read_snapshot(snapshot_path(str(path)), hashlib.sha256(TEXT.encode('utf-8')).digest())
+    assert snap is not None
+    assert fields(snap) == fields(parse_playlist(TEXT))
+    assert snap.text() == TEXT
+
+
+def test_stale_snapshot_is_ignored(tmp_path):
+    path = tmp_path / 'a.m3u'
+    path.write_text(TEXT, encoding='utf-8')
+    write_snapshot_for(str(path))
+    changed = TEXT.replace('湖南卫视', '浙江卫视')
+    path.write_text(changed, encoding='utf-8')
+    assert read_snapshot(snapshot_path(str(path)), hashlib.sha256(changed.encode('utf-8')).digest()) is None
+    assert load_playlist(str(path)).names == ['CCTV1', '浙江卫视']
+
+
+def test_corrupt_snapshot_is_ignored(tmp_path):
+    path = tmp_path / 'a.m3u'
+    path.write_text(TEXT, encoding='utf-8')
+    write_snapshot_for(str(path))
+    snap = snapshot_path(str(path))
+    with open(snap, 'r+b') as f:
+        f.truncate(os.path.getsize(snap) - 4)
+    assert read_snapshot(snap) is None
+    assert fields(load_playlist(str(path))) == fields(parse_playlist(TEXT))
+
+
+def test_merger_saves_snapshot_of_its_own_model(tmp_path):
+    source = tmp_path / 'in.m3u'
+    source.write_text(TEXT, encoding='utf-8')
+    output = tmp_path / 'out.m3u'
+    env = dict(os.environ, M3U_SNAPSHOT='1', M3U_COMPRESS='', M3U_FSYNC='0')
+    proc = subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, 'm3u_merger.py'), '-i', str(source),
+                           '-o', str(output)], capture_output=True, env=env)
+    assert proc.returncode == 0, proc.stderr.decode('utf-8', 'replace')
+    raw = output.read_bytes()
+    snap = read_snapshot(snapshot_path(str(output)), hashlib.sha256(raw).digest())
+    assert snap is not None
+    assert fields(snap) == fields(parse_playlist(raw.decode('utf-8')))
@@ -0,0 +1,69 @@
+import gzip
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from m3u_writer import M3UWriter, parse_compress, parse_levels
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if name.startswith('.tmp_')]
+
+
+def test_commit_replaces_target_atomically(tmp_path):
+    path = tmp_path / 'out.m3u'
+    path.write_text('old\n', encoding='utf-8')
+    with M3UWriter(str(path), compress=[], fsync=False) as writer:
+        writer.write_line('#EXTM3U')
+        # 提交前目标文件保持原样
+        assert path.read_text(encoding='utf-8') == 'old\n'
+    assert path.read_text(encoding='utf-8') == '#EXTM3U\n'
+    assert leftovers(tmp_path) == []
+
+
+def test_error_keeps_original(tmp_path):
+    path = tmp_path / 'out.m3u'
+    path.write_text('old\n', encoding='utf-8')
+    with pytest.raises(RuntimeError):
+        with M3UWriter(str(path), compress=['gz'], fsync=False) as writer:
+            writer.write_line('#EXTM3U')
+            raise RuntimeError
+    assert path.read_text(encoding='utf-8') == 'old\n'
+    assert not (tmp_path / 'out.m3u.gz').exists()
+    assert leftovers(tmp_path) == []
+
+
+def test_compressed_copy_matches_output(tmp_path):
+    path = tmp_path / 'out.m3u'
+    text = '#EXTM3U\n' + ''.join(f'#EXTINF:-1,频道{i}\nhttp://example.com/{i}.m3u8\n' for i in range(2000))
+    with M3UWriter(str(path), compress='gz', fsync=False, buffer_size=1024) as writer:
+        writer.write(text)
+    assert writer.outputs == [str(path), str(path) + '.gz']
+    assert path.read_text(encoding='utf-8') == text
+    assert gzip.decompress((tmp_path / 'out.m3u.gz').read_bytes()).decode('utf-8') == text
+
+    # 内容相同则压缩副本逐字节相同（gzip 头不含时间戳）
+    first = (tmp_path / 'out.m3u.gz').read_bytes()
+    with M3UWriter(str(path), compress='gz', fsync=False) as writer:
+        writer.write(text)
+    assert (tmp_path / 'out.m3u.gz').read_bytes() == first
+
+
+def test_existing_mode_is_kept(tmp_path):
+    path = tmp_path / 'out.m3u'
+    path.write_text('old\n', encoding='utf-8')
+    os.chmod(path, 0o640)
+    with M3UWriter(str(path), compress=[], fsync=False) as writer:
+        writer.write_line('new')
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+
+def test_option_parsing():
+    assert parse_compress('gz, .zst,gz') == ['gz', 'zst']
+    with pytest.raises(ValueError):
+        parse_compress('xz')
+    assert parse_levels('gz=6')['gz'] == 6
+    assert parse_levels('3') == {'gz': 3, 'zst': 3, 'br': 3}
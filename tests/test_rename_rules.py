@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from rename_rules import apply_rename_rules, load_rules
+
+TEXT = (
+    '#EXTM3U\n'
+    '#EXTINF:-1 group-title="cctv 频道",cctv5 plus\n'
+    'http://example.com/CCTV5P.m3u8\n'
+    '#EXTINF:-1 group-title="地方",Hunan TV\n'
+    'http://example.com/hunan.m3u8\n'
+)
+
+
+def run(tmp_path, rules):
+    rules_path = tmp_path / 'rules.json'
+    rules_path.write_text(json.dumps(rules, ensure_ascii=False), encoding='utf-8')
+    source = tmp_path / 'in.m3u'
+    source.write_text(TEXT, encoding='utf-8')
+    return apply_rename_rules(str(source), load_rules(str(rules_path)))
+
+
+def test_contains_and_url_keywords_ignore_case(tmp_path):
+    lines, hits, total = run(tmp_path, {
+        "channels": [{"name": "CCTV", "contains": True, "url_keywords": ["cctv5p"], "rename": "CCTV5+"}],
+        "groups": [{"name": "CCTV", "contains": True, "rename": "央视"},
+                   {"name": "hunan", "contains": True, "rename": "不应命中"}],
+    })
+    assert total == 2
+    assert lines[1] == '#EXTINF:-1 group-title="央视",CCTV5+'
+    assert lines[3] == '#EXTINF:-1 group-title="地方",Hunan TV'
+    assert hits == {'channels[0]': 1, 'groups[0]': 1}
+
+
+def test_url_keyword_condition_still_applies(tmp_path):
+    lines, hits, _ = run(tmp_path, {
+        "channels": [{"name": "TV", "contains": True, "url_keywords": ["HUNAN"], "rename": "湖南卫视"}],
+    })
+    assert lines[1].endswith(',cctv5 plus')
+    assert lines[3].endswith(',湖南卫视')
+    assert hits == {'channels[0]': 1}
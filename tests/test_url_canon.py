@@ -0,0 +1,26 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+from url_canon import UrlCanonicalizer
+
+
+def test_volatile_params_and_default_port_are_dropped():
+    canon = UrlCanonicalizer()
+    assert canon.canonical('HTTP://Example.com:80/live.m3u8?b=2&wsSecret=x&a=1') == 'http://example.com/live.m3u8?a=1&b=2'
+    assert canon.canonical('not a url') == 'not a url'
+
+
+def test_host_keep_rule():
+    canon = UrlCanonicalizer()
+    url = 'http://hlszymgsplive.miguvideo.com/x.m3u8?ProgramID=1&userid=2'
+    assert canon.canonical(url) == 'http://hlszymgsplive.miguvideo.com/x.m3u8?ProgramID=1'
+
+
+def test_cache_is_bounded():
+    canon = UrlCanonicalizer(cache_size=4)
+    for i in range(100):
+        canon.canonical(f'http://example.com/{i}.m3u8')
+    assert len(canon._cache) == 4
+    assert canon.canonical('http://example.com/0.m3u8?wsSecret=1') == 'http://example.com/0.m3u8'